@@ -0,0 +1,139 @@
+"""
+datagen.py
+Synthetic restaurant data for the benchmarks.
+
+Orders are drawn from the real menu (MENU_DATA and data/menu_items.txt) and
+about one in five carries a promo from data/promo_codes.txt, resolved the same
+way the cashier screen resolves it. Everything is written through the storage
+engine into the current working directory's data/ folder, so run it from a
+scratch directory (benchmarks.run does this).
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from data.menu_data import MENU_DATA
+from utils.helpers import load_file
+from utils.storage import get_storage
+
+DISCOUNT_RATE = 0.2
+CARTS_LIMIT = 1000
+PAYMENT_METHODS = ("Cash", "Card", "Touch 'N Go")
+ORDER_TYPES = ("Dine-In", "Takeaway")
+
+
+def parse_size(text):
+    """'1k' -> 1000, '100k' -> 100000, '1m' -> 1000000."""
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def user_count(n):
+    return max(10, n // 20)
+
+
+def _discount(rng, items, promo_codes, menu_items):
+    code = rng.choice(list(promo_codes))
+    promo = promo_codes[code]
+    if promo['apply_to'] == 'specific_item':
+        qty = sum(q for c, q in items if c == promo['item_code'])
+        base = menu_items[promo['item_code']]['price'] * qty
+    else:
+        base = sum(menu_items[c]['price'] * q for c, q in items)
+    if base <= 0:
+        return None
+    amount = min(base * promo['value'] / 100 if promo['type'] == 'percentage' else promo['value'], base)
+    discount = {
+        "type": promo['type'],
+        "value": promo['value'],
+        "amount": amount,
+        "description": promo['description'],
+        "apply_to": promo['apply_to'],
+        "promo_code": code
+    }
+    if promo['apply_to'] == 'specific_item':
+        discount['item_code'] = promo['item_code']
+    return discount
+
+
+def make_order(rng, codes, promo_codes, menu_items, timestamp):
+    items = [[rng.choice(codes), rng.randint(1, 3)] for _ in range(rng.randint(1, 4))]
+    order = {
+        "items": items,
+        "status": "Preparing",
+        "type": rng.choice(ORDER_TYPES),
+        "table_number": rng.randint(1, 30),
+        "display_name": f"Customer {rng.randint(1, 999)}",
+        "discounts": [],
+        "remarks": "",
+        "timestamp": timestamp
+    }
+    if rng.random() < DISCOUNT_RATE:
+        discount = _discount(rng, items, promo_codes, menu_items)
+        if discount:
+            order["discounts"].append(discount)
+    return order
+
+
+def generate(n, seed=0):
+    """Write n active orders, n transactions (over the past year) and n customer orders.
+
+    Returns {"active_orders", "transactions", "orders", "users"} for the
+    benchmarks to pick samples from.
+    """
+    rng = random.Random(seed)
+    menu_items = load_file("menu_items.txt")
+    promo_codes = load_file("promo_codes.txt")
+    codes = [code for code in MENU_DATA if code in menu_items]
+    now = datetime.now()
+    users = [f"user{i:06d}" for i in range(user_count(n))]
+
+    def timestamp(days_back):
+        moment = now - timedelta(days=days_back, seconds=rng.randint(0, 86399))
+        return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+    active_orders = {
+        f"A{i:07d}": make_order(rng, codes, promo_codes, menu_items, timestamp(0))
+        for i in range(n)
+    }
+
+    transactions = {}
+    for i, days_back in enumerate(sorted((rng.randint(0, 364) for _ in range(n)), reverse=True)):
+        order = make_order(rng, codes, promo_codes, menu_items, timestamp(days_back))
+        subtotal = sum(menu_items[c]['price'] * q for c, q in order["items"])
+        transactions[f"T{i:07d}"] = {
+            "type": order["type"],
+            "items": order["items"],
+            "discounts": order["discounts"],
+            "subtotal": subtotal,
+            "total": subtotal - sum(d['amount'] for d in order["discounts"]),
+            "payment_method": rng.choice(PAYMENT_METHODS),
+            "timestamp": order["timestamp"]
+        }
+
+    orders = {}
+    for i, days_back in enumerate(sorted((rng.randint(0, 364) for _ in range(n)), reverse=True)):
+        order = make_order(rng, codes, promo_codes, menu_items, timestamp(days_back))
+        order["system_user"] = rng.choice(users)
+        del order["discounts"]
+        orders[f"D{i:07d}"] = order
+
+    accounts = {user: {"password": "benchmark", "role": "customer"} for user in users}
+    accounts.update({"manager": {"password": "benchmark", "role": "manager"},
+                     "cashier": {"password": "benchmark", "role": "cashier"}})
+
+    carts = {
+        user: [{"id": code, "name": menu_items[code]['name'], "quantity": qty,
+                "price": menu_items[code]['price'], "remarks": ""}
+               for code, qty in make_order(rng, codes, promo_codes, menu_items, "")["items"]]
+        for user in users[:CARTS_LIMIT]
+    }
+
+    storage = get_storage()
+    storage.replace("active_orders", active_orders)
+    storage.replace("transactions", transactions)
+    storage.replace("orders", orders)
+    storage.replace("accounts", accounts)
+    storage.replace("carts", carts)
+    return {"active_orders": active_orders, "transactions": transactions, "orders": orders, "users": users}
@@ -0,0 +1,188 @@
+"""
+run.py
+Time the hot paths of the restaurant system on synthetic data.
+
+    python -m benchmarks.run [size ...]                 # default: 1k 100k
+    python -m benchmarks.run compare BASELINE [RESULTS]
+
+Sizes are order/transaction counts such as 1k, 100k or 1m. Each size gets a
+fresh scratch directory holding only the menu and promo codes plus generated
+data (see datagen.py), so the real data/ folder is never touched. Results go
+to bench_results.json; compare reports every benchmark whose median got more
+than THRESHOLD slower than the baseline and exits with status 1 if any did.
+"""
+
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import datagen
+from customer_functions import order_tracking
+from data.menu_index import get_menu_index
+from utils import carts, file_cache, kitchen, pricing, storage
+from utils.services import ReportService
+from utils.helpers import calculate_order_total, generate_receipt_lines, load_file, save_to_file
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FILE = "bench_results.json"
+DEFAULT_SIZES = ("1k", "100k")
+REPEAT = 5
+TIME_BUDGET = 10.0  # Seconds per benchmark before the remaining repeats are skipped
+SAMPLE = 1000
+THRESHOLD = 0.25
+NOISE_FLOOR = 0.001  # Differences below a millisecond are never regressions
+SEED_FILES = ("menu_items.txt", "promo_codes.txt")
+
+
+def measure(fn, setup=None, ops=1):
+    """Run fn up to REPEAT times (within TIME_BUDGET) and summarize the timings."""
+    times = []
+    started = time.perf_counter()
+    while len(times) < REPEAT and (not times or time.perf_counter() - started < TIME_BUDGET):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    median = statistics.median(times)
+    return {"median": median, "min": min(times), "runs": len(times), "ops": ops, "per_op": median / ops}
+
+
+def _reset_state():
+    file_cache.invalidate()
+    pricing.invalidate()
+    storage.set_storage(None)
+
+
+def run_size(label, seed=0):
+    n = datagen.parse_size(label)
+    workdir = tempfile.mkdtemp(prefix=f"bench-{label}-")
+    cwd = os.getcwd()
+    try:
+        os.makedirs(os.path.join(workdir, "data"))
+        for name in SEED_FILES:
+            shutil.copy(os.path.join(REPO_DIR, "data", name), os.path.join(workdir, "data", name))
+        os.chdir(workdir)
+        _reset_state()
+
+        t = time.perf_counter()
+        data = datagen.generate(n, seed)
+        print(f"[{label}] generated {n} records in {time.perf_counter() - t:.1f}s")
+
+        rng = random.Random(seed)
+        menu_items = get_menu_index().items
+        active = load_file("current_active_orders.txt")
+        order_sample = rng.sample(list(active), min(SAMPLE, len(active)))
+        user_sample = rng.sample(data["users"], min(100, len(data["users"])))
+        cart_users = data["users"][:min(100, datagen.CARTS_LIMIT)]
+        transactions = storage.get_storage().load("transactions")
+
+        def price_sample():
+            for order_id in order_sample:
+                calculate_order_total(order_id, active, menu_items)
+
+        def receipts():
+            for order_id in order_sample:
+                generate_receipt_lines(order_id, active[order_id], "Card", menu_items)
+
+        def carts_round_trip():
+            for user in cart_users:
+                cart = carts.load_cart(user)
+                carts.save_cart(user, cart)
+            carts.flush_carts()
+
+        def user_orders():
+            for user in user_sample:
+                order_tracking.load_orders(user, 10)
+
+        def accounts():
+            from main import load_accounts
+            load_accounts()
+
+        demand_table = kitchen.DemandTable(active)
+
+        def kitchen_demand():
+            for code in menu_items:
+                demand_table.demand(code)
+
+        results = {
+            "load_file_cold": measure(lambda: load_file("current_active_orders.txt"), setup=file_cache.invalidate),
+            "load_file_warm": measure(lambda: load_file("current_active_orders.txt")),
+            "save_to_file": measure(lambda: save_to_file(active, "current_active_orders.txt")),
+            "calculate_order_total_cold": measure(price_sample, setup=pricing.invalidate, ops=len(order_sample)),
+            "calculate_order_total_warm": measure(price_sample, ops=len(order_sample)),
+            "generate_receipt_lines": measure(receipts, ops=len(order_sample)),
+            "calculate_report_data": measure(lambda: ReportService().summarize(transactions)),
+            "load_save_cart": measure(carts_round_trip, ops=len(cart_users)),
+            "load_orders": measure(user_orders, ops=len(user_sample)),
+            "load_accounts_cold": measure(accounts, setup=file_cache.invalidate),
+            "kitchen_demand_build": measure(lambda: kitchen.DemandTable(active).close()),
+            "kitchen_demand_query": measure(kitchen_demand, ops=len(menu_items)),
+        }
+        demand_table.close()
+        for name, result in results.items():
+            print(f"[{label}] {name:<28} median {result['median'] * 1000:>10.2f} ms"
+                  f"  ({result['per_op'] * 1e6:.1f} us/op, {result['runs']} runs)")
+        return results
+    finally:
+        os.chdir(cwd)
+        _reset_state()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(sizes):
+    report = {
+        "meta": {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": os.environ.get("RESTAURANT_STORAGE", "flat"),
+        },
+        "results": {label: run_size(label) for label in sizes}
+    }
+    with open(RESULTS_FILE, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {RESULTS_FILE}")
+    return report
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """Return [(size, benchmark, baseline median, current median, ratio)] of regressions."""
+    regressions = []
+    for size, benchmarks in current["results"].items():
+        for name, result in benchmarks.items():
+            before = baseline["results"].get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = result["median"] / before["median"] if before["median"] else float("inf")
+            flag = ratio > 1 + threshold and result["median"] - before["median"] > NOISE_FLOOR
+            print(f"{size:>6} {name:<28} {before['median'] * 1000:>10.2f} ms -> "
+                  f"{result['median'] * 1000:>10.2f} ms  x{ratio:.2f}{'  REGRESSION' if flag else ''}")
+            if flag:
+                regressions.append((size, name, before["median"], result["median"], ratio))
+    return regressions
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["compare"] and len(sys.argv) >= 3:
+        baseline = _load(sys.argv[2])
+        current = _load(sys.argv[3] if len(sys.argv) > 3 else RESULTS_FILE)
+        regressions = compare(current, baseline)
+        print(f"{len(regressions)} regression(s) over {THRESHOLD:.0%}")
+        sys.exit(1 if regressions else 0)
+    elif sys.argv[1:2] == ["compare"]:
+        print("Usage: python -m benchmarks.run compare BASELINE [RESULTS]")
+    else:
+        run(sys.argv[1:] or DEFAULT_SIZES)
@@ -0,0 +1,319 @@
+"""
+simulate.py
+Headless lunch-rush simulator: many customer and cashier terminals at once.
+
+    python -m benchmarks.simulate [terminals] [seconds]     # default: 8 terminals, 20 s
+
+Every terminal is a separate process working on one shared scratch data
+directory (seeded by datagen.py). Terminals drive the real menu functions by
+replacing input() with a scripted responder: menu choices come from a script,
+detail questions (quantities, combo drinks, extra ingredients, table numbers)
+are answered at random, like a person would.
+
+- Customers register, add items (combos are customized through
+  customize_item), and check out.
+- Cashiers apply promo codes to active orders and check them out.
+
+At the end the shared data is checked against what every terminal believes it
+did. The report lists throughput, p50/p99 latency per operation, errors by
+type, and lost updates: registrations, orders, transactions, promos or receipts
+that a terminal completed but that are missing or wrong on disk, and lock
+contention: how often each lock was taken, how often a terminal had to wait
+for it (and for how long), and how many optimistic order updates had to be
+retried because another terminal changed the order first.
+"""
+
+import builtins
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import datagen
+from customer_functions import cart_management
+from customer_functions.customer_acc import customer_account_management
+from data.menu_index import get_menu_index
+from utils import file_cache, locking, receipt_pack
+from utils.helpers import load_file
+from utils.order_management import handle_order_actions
+from utils.storage import get_storage
+
+RESULTS_FILE = "sim_results.json"
+DEFAULT_TERMINALS = 8
+DEFAULT_SECONDS = 20
+SEED_ORDERS = 2000
+CUSTOMER_SHARE = 0.6
+ORDER_PROMOS = ("BIGSPENDER", "LUCKY7", "WEEKENDWOW")
+
+
+class UnexpectedPrompt(Exception):
+    """A menu asked for something the session script did not plan for."""
+
+
+# ==============================================
+# SCRIPTED INPUT
+# ==============================================
+
+def _drink(rng):
+    drinks = [code for code, _ in get_menu_index().category_items('Drinks')]
+    return rng.choice(drinks) if rng.random() < 0.4 else "keep"
+
+
+# Detail questions answered on the fly: (prompt pattern, answer)
+DETAIL_PROMPTS = (
+    (r"Enter quantity for", lambda rng: str(rng.randint(1, 3))),
+    (r"How many burgers to customize", lambda rng: str(rng.randint(0, 1))),
+    (r"Add .*\(y/n\)", lambda rng: rng.choice("yn")),
+    (r"Enter drink ID or 'keep'", _drink),
+    (r"How many .*\? \(1-\d+\)", lambda rng: "1"),
+    (r"Special instructions", lambda rng: rng.choice(["", "", "no onions"])),
+    (r"Order type \(1 for Dine-In", lambda rng: rng.choice("12")),
+    (r"Enter table number", lambda rng: str(rng.randint(1, 30))),
+    (r"Enter order remarks", lambda rng: ""),
+    (r"Enter your name", lambda rng: "Simulated Guest"),
+    (r"Press Enter", lambda rng: ""),
+)
+
+
+class ScriptedInput:
+    def __init__(self, rng):
+        self.rng = rng
+        self.script = []
+
+    def __call__(self, prompt=""):
+        for pattern, answer in DETAIL_PROMPTS:
+            if re.search(pattern, prompt):
+                return answer(self.rng)
+        if self.script:
+            return self.script.pop(0)
+        raise UnexpectedPrompt(prompt.strip())
+
+
+# ==============================================
+# TERMINAL SESSIONS
+# ==============================================
+
+class Terminal:
+    def __init__(self, number, deadline, seed):
+        self.number = number
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.input = ScriptedInput(self.rng)
+        self.latencies = {}  # operation -> [seconds]
+        self.errors = {}  # "operation: ErrorType" -> count
+        self.log = {"accounts": [], "orders": [], "checkouts": [], "promos": []}
+        self.output = ""  # What the last operation printed
+
+    def op(self, name, script, fn, *args):
+        """Run one scripted operation and record its latency or error."""
+        self.input.script = list(script)
+        started = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                result = fn(*args)
+        except Exception as e:
+            key = f"{name}: {type(e).__name__}"
+            self.errors[key] = self.errors.get(key, 0) + 1
+            return None, False
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+        self.output = out.getvalue()
+        return result, True
+
+    def customer_session(self):
+        username = f"sim{self.number}_{len(self.log['accounts'])}"
+        user, ok = self.op("register", ["1", username, "pw" + username], customer_account_management, None)
+        if not ok or user != username:
+            return
+        self.log["accounts"].append(username)
+
+        menu = get_menu_index()
+        for _ in range(self.rng.randint(1, 3)):
+            code = self.rng.choice(list(menu.items))
+            self.op("add_item", ["1", code, "5"], cart_management.cart_management, username, None)
+
+        _, ok = self.op("customer_checkout", ["4"], cart_management.cart_management, username, None)
+        if ok:
+            latest, ok = self.op("order_lookup", [], get_storage().latest_for_user, "orders", username, 1)
+            if ok and latest:
+                self.log["orders"].append([latest[0][0], username])
+
+    def cashier_session(self):
+        current_orders = load_file('current_active_orders.txt')
+        if not current_orders:
+            return
+        order_id = self.rng.choice(list(current_orders))
+        today = datetime.now().strftime("%Y-%m-%d")
+        transactions = get_storage().transactions_between(today, today)
+        menu_items = get_menu_index().items
+
+        if self.rng.random() < 0.5:
+            promo = self.rng.choice(ORDER_PROMOS)
+            _, ok = self.op("apply_promo", ["1", "1", "3", promo, "3", "5"], handle_order_actions,
+                            order_id, current_orders[order_id], current_orders, menu_items, transactions)
+            discounts = current_orders.get(order_id, {}).get("discounts", [])
+            if ok and any(d.get("promo_code") == promo for d in discounts):
+                description = load_file('promo_codes.txt')[promo]['description']
+                self.log["promos"].append([order_id, description, time.time()])
+
+        current_orders = load_file('current_active_orders.txt')
+        if order_id not in current_orders:
+            return  # Another cashier got there first
+        payment = self.rng.choice("123")
+        _, ok = self.op("cashier_checkout", ["3", payment], handle_order_actions,
+                        order_id, current_orders[order_id], current_orders, menu_items, transactions)
+        # The menu reports a refused checkout (e.g. another cashier closed the order) and returns
+        if ok and "Transaction successful!" in self.output:
+            self.log["checkouts"].append([order_id, time.time()])
+
+    def run(self):
+        builtins.input = self.input
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            while time.time() < self.deadline:
+                if self.rng.random() < CUSTOMER_SHARE:
+                    self.customer_session()
+                else:
+                    self.cashier_session()
+                out.seek(0)
+                out.truncate()  # Keep the discarded screen output from piling up
+        return {"latencies": self.latencies, "errors": self.errors, "log": self.log, "locks": locking.stats()}
+
+
+def _terminal(args):
+    workdir, number, deadline, seed = args
+    os.chdir(workdir)
+    return Terminal(number, deadline, seed).run()
+
+
+# ==============================================
+# VERIFICATION AND REPORT
+# ==============================================
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def verify(results):
+    """Compare what the terminals did with what is on disk."""
+    file_cache.invalidate()  # This process last read the files before the terminals started
+    storage = get_storage()
+    accounts = storage.load("accounts")
+    orders = storage.load("orders")
+    transactions = storage.load("transactions")
+    logs = [result["log"] for result in results]
+    lost = {"accounts": 0, "orders": 0, "transactions": 0, "promos": 0, "receipts": 0, "double_checkouts": 0}
+
+    for log in logs:
+        lost["accounts"] += sum(1 for user in log["accounts"] if user not in accounts)
+        lost["orders"] += sum(
+            1 for order_id, user in log["orders"]
+            if orders.get(order_id, {}).get("system_user") != user
+        )
+
+    checkouts = {}
+    for log in logs:
+        for order_id, at in log["checkouts"]:
+            checkouts.setdefault(order_id, []).append(at)
+    lost["double_checkouts"] = sum(len(times) - 1 for times in checkouts.values())
+    for order_id in checkouts:
+        if order_id not in transactions:
+            lost["transactions"] += 1
+        date = transactions.get(order_id, {}).get("timestamp", "")[:10] or None
+        receipt = receipt_pack.read_receipt(order_id, date)
+        if receipt is None or order_id not in receipt:
+            lost["receipts"] += 1
+
+    for log in logs:
+        for order_id, description, applied_at in log["promos"]:
+            if order_id not in checkouts or max(checkouts[order_id]) < applied_at:
+                continue  # Not checked out after the promo was applied
+            # Transactions keep the priced discount lines, which carry the promo's description
+            discounts = transactions.get(order_id, {}).get("discounts", [])
+            if not any(d.get("description") == description for d in discounts):
+                lost["promos"] += 1
+    return lost
+
+
+def simulate(terminals=DEFAULT_TERMINALS, seconds=DEFAULT_SECONDS):
+    workdir = tempfile.mkdtemp(prefix="simulate-")
+    cwd = os.getcwd()
+    try:
+        os.makedirs(os.path.join(workdir, "data"))
+        for name in ("menu_items.txt", "promo_codes.txt"):
+            shutil.copy(os.path.join(cwd, "data", name), os.path.join(workdir, "data", name))
+        os.chdir(workdir)
+        data = datagen.generate(SEED_ORDERS)
+        get_storage().latest_for_user("orders", data["users"][0], 1)  # Build the indexes up front
+
+        started = time.time()
+        jobs = [(workdir, n, started + seconds, n) for n in range(terminals)]
+        with multiprocessing.get_context("spawn").Pool(terminals) as pool:
+            results = pool.map(_terminal, jobs)
+        elapsed = time.time() - started
+
+        operations = {}
+        errors = {}
+        for result in results:
+            for name, values in result["latencies"].items():
+                operations.setdefault(name, []).extend(values)
+            for name, count in result["errors"].items():
+                errors[name] = errors.get(name, 0) + count
+
+        report = {
+            "terminals": terminals,
+            "seconds": elapsed,
+            "throughput": sum(len(v) for v in operations.values()) / elapsed,
+            "operations": {
+                name: {
+                    "count": len(values),
+                    "per_second": len(values) / elapsed,
+                    "p50": _percentile(values, 0.50),
+                    "p99": _percentile(values, 0.99)
+                }
+                for name, values in sorted(operations.items())
+            },
+            "errors": errors,
+            "lost_updates": verify(results),
+            "contention": locking.merge_stats(result["locks"] for result in results)
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(RESULTS_FILE, "w") as f:
+        json.dump(report, f, indent=4)
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['terminals']} terminals for {report['seconds']:.1f}s: "
+          f"{report['throughput']:.1f} operations/s")
+    print(f"\n{'Operation':<20} {'Count':>7} {'Per sec':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, stats in report["operations"].items():
+        print(f"{name:<20} {stats['count']:>7} {stats['per_second']:>9.1f} "
+              f"{stats['p50'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f}")
+    print("\nErrors:")
+    for name, count in sorted(report["errors"].items()) or [("none", 0)]:
+        print(f"  {name}: {count}")
+    print("\nLost updates:")
+    for name, count in report["lost_updates"].items():
+        print(f"  {name}: {count}")
+    print(f"\n{'Lock':<26} {'Taken':>8} {'Waited':>8} {'Wait ms':>9} {'Max ms':>8} {'Retries':>8}")
+    for name, stats in sorted(report["contention"].items()):
+        print(f"{name:<26} {stats['acquired']:>8} {stats['contended']:>8} {stats['wait'] * 1000:>9.1f} "
+              f"{stats['max_wait'] * 1000:>8.1f} {stats['conflicts']:>8}")
+    print(f"\nResults written to {RESULTS_FILE}")
+
+
+if __name__ == "__main__":
+    terminals = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TERMINALS
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SECONDS
+    print_report(simulate(terminals, seconds))
@@ -1,65 +1,6 @@
-import os
-import json
-from datetime import datetime
-from utils.helpers import load_file
-def load_cart(user):
-    cart = []
-    try:
-        with open("data/carts.txt", "r") as f:
-            for line in f:
-                parts = line.strip().split("|||")
-                if parts[0] == user:
-                    for item_str in parts[1:]:
-                        try:
-                            item = eval(item_str)
-                            if not isinstance(item, dict):
-                                continue
-                            if 'remarks' not in item:
-                                item['remarks'] = ''
-                            cart.append(item)
-                        except:
-                            continue
-                    break
-    except (FileNotFoundError, SyntaxError):
-        pass
-    return cart
-
-
-def save_cart(user, cart):
-    os.makedirs("data", exist_ok=True)
-    carts = {}
-    try:
-        with open("data/carts.txt", "r") as f:
-            for line in f:
-                parts = line.strip().split("|||")
-                if parts:
-                    carts[parts[0]] = parts[1:]
-    except FileNotFoundError:
-        pass
-
-    carts[user] = [str(item) for item in cart]
-    with open("data/carts.txt", "w") as f:
-        for username, items in carts.items():
-            if username:
-                f.write(f"{username}|||{'|||'.join(items)}\n")
-
-
-def load_all_orders():
-    try:
-        with open("data/orders.txt", "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-
-def save_order(order_data):
-    os.makedirs("data", exist_ok=True)
-    all_orders = load_all_orders()
-    order_id = next(iter(order_data))
-    all_orders[order_id] = order_data[order_id]
-
-    with open("data/orders.txt", "w") as f:
-        json.dump(all_orders, f, indent=4)
+from data.menu_index import get_menu_index
+from utils.carts import flush_carts, flush_if_due
+from utils.services import CartService, ServiceError
 
 
 def display_cart(cart):
@@ -94,35 +35,76 @@ def display_cart(cart):
     print(f"\nTOTAL: RM{total:.2f}")
 
 
-def customize_item(menu_item, full_menu=None, is_combo_part=False, component_id=None):
-    item_id = component_id if component_id else menu_item.get('id')
+def _ask_extras(menu_item):
+    """Ask for each optional ingredient of a burger; returns the ones to add."""
+    extras = []
+    if menu_item.get('category') == 'Burgers' and menu_item.get('ingredients'):
+        print("\nCustomizable ingredients:")
+        for ing, details in menu_item.get('ingredients', {}).items():
+            if not details.get('default', True):
+                if input(f"Add {ing} (+RM{details.get('price', 0):.2f})? (y/n): ").lower() == 'y':
+                    extras.append(ing)
+    return extras
+
+
+def _ask_drinks(component, fixed_qty):
+    """Ask which of a combo's drinks to swap; returns [drink ID, quantity] substitutions."""
+    remaining_qty = fixed_qty
+    drink_changes = []
 
-    item = {
-        'id': item_id,
-        'name': menu_item.get('name', 'Unnamed Item'),
-        'price': menu_item.get('base_price', 0),
-        'quantity': 1,
-        'remarks': '',
-        'type': 'combo' if 'contents' in menu_item else 'single',
-        'contents': {}
-    }
+    print(f"\n Original Drink: {component.get('name', 'Drink')} x{fixed_qty}")
+
+    drinks = dict(get_menu_index().category_items('Drinks'))
+    while remaining_qty > 0:
+        print(f"\nDrinks left to customize: {remaining_qty}")
+        print("Available drinks:")
+        for d_id, drink in drinks.items():
+            print(f"{d_id}. {drink.get('name', 'Drink')} (RM{drink.get('base_price', 0):.2f})")
+
+        choice = input("Enter drink ID or 'keep' remaining: ").strip().upper()
+        if choice == 'KEEP':
+            break
+        if choice not in drinks:
+            print("Invalid choice! Try again.")
+            continue
+
+        while True:
+            try:
+                change_qty = int(input(
+                    f"How many {drinks[choice].get('name', 'Drink')}? (1-{remaining_qty}): "
+                ))
+                if 1 <= change_qty <= remaining_qty:
+                    drink_changes.append([choice, change_qty])
+                    remaining_qty -= change_qty
+                    break
+                print(f"Must be 1-{remaining_qty}")
+            except ValueError:
+                print("Numbers only!")
+    return drink_changes
+
+
+def customize_item(menu_item, full_menu=None):
+    """Ask how the customer wants menu_item; returns the item spec for CartService."""
+    spec = {'id': menu_item.get('id')}
+    is_combo = 'contents' in menu_item
 
     # ===== QUANTITY SELECTION =====
-    if not is_combo_part and item['type'] == 'single':
+    if not is_combo:
         while True:
             try:
-                qty = int(input(f"\nEnter quantity for {item['name']} (1-10): "))
+                qty = int(input(f"\nEnter quantity for {menu_item.get('name', 'Unnamed Item')} (1-10): "))
                 if 1 <= qty <= 10:
-                    item['quantity'] = qty
+                    spec['quantity'] = qty
                     break
                 print("Please enter 1-10")
             except ValueError:
                 print("Numbers only!")
 
     # ===== COMBO CUSTOMIZATION =====
-    if item['type'] == 'combo' and full_menu:
-        print(f"\n{'=' * 30}\n⚡ Customizing {item['name']} Combo ⚡\n{'=' * 30}")
-        item['contents'] = {}
+    if is_combo and full_menu:
+        print(f"\n{'=' * 30}\n⚡ Customizing {menu_item.get('name', 'Unnamed Item')} Combo ⚡\n{'=' * 30}")
+        spec['burgers'] = {}
+        spec['drinks'] = {}
 
         for comp_id, fixed_qty in menu_item.get('contents', {}).items():
             component = full_menu.get(comp_id, {})
@@ -143,112 +125,27 @@ def customize_item(menu_item, full_menu=None, is_combo_part=False, component_id=
                     except ValueError:
                         print("Invalid input. Customizing none.")
 
-                # Customize selected burgers
+                spec['burgers'][comp_id] = []
                 for i in range(burgers_to_customize):
                     print(f"\nCustomizing Burger #{i + 1}:")
-                    customized = customize_item(component, full_menu, is_combo_part=True, component_id=comp_id)
-                    if comp_id not in item['contents']:
-                        item['contents'][comp_id] = []
-                    item['contents'][comp_id].append({
-                        'quantity': 1,
-                        'customizations': customized
-                    })
-                    item['price'] += (customized.get('price', 0) - component.get('base_price', 0))
-
-                # Add remaining standard burgers
-                if fixed_qty - burgers_to_customize > 0:
-                    if comp_id not in item['contents']:
-                        item['contents'][comp_id] = []
-                    item['contents'][comp_id].append({
-                        'quantity': fixed_qty - burgers_to_customize,
-                        'customizations': None
-                    })
+                    spec['burgers'][comp_id].append(_ask_extras(component))
 
             # ---- DRINKS ----
             elif component.get('category') == 'Drinks':
-                remaining_qty = fixed_qty
-                drink_changes = []
-
-                print(f"\n Original Drink: {component.get('name', 'Drink')} x{fixed_qty}")
-
-                while remaining_qty > 0:
-                    print(f"\nDrinks left to customize: {remaining_qty}")
-                    print("Available drinks:")
-                    drinks = {k: v for k, v in full_menu.items() if v.get('category') == 'Drinks'}
-                    for d_id, drink in drinks.items():
-                        print(f"{d_id}. {drink.get('name', 'Drink')} (RM{drink.get('base_price', 0):.2f})")
-
-                    choice = input("Enter drink ID or 'keep' remaining: ").strip().upper()
-                    if choice == 'KEEP':
-                        break
-                    if choice not in drinks:
-                        print("Invalid choice! Try again.")
-                        continue
-
-                    while True:
-                        try:
-                            change_qty = int(input(
-                                f"How many {drinks[choice].get('name', 'Drink')}? (1-{remaining_qty}): "
-                            ))
-                            if 1 <= change_qty <= remaining_qty:
-                                drink_changes.append({
-                                    'id': choice,
-                                    'qty': change_qty,
-                                    'price': drinks[choice].get('base_price', 0)
-                                })
-                                remaining_qty -= change_qty
-                                break
-                            print(f"Must be 1-{remaining_qty}")
-                        except ValueError:
-                            print("Numbers only!")
-
-                # Apply changes
-                if drink_changes:
-                    item['contents'][comp_id] = []
-                    for change in drink_changes:
-                        item['contents'][comp_id].append({
-                            'quantity': change['qty'],
-                            'customizations': {
-                                'substituted_id': change['id'],
-                                'name': drinks[change['id']].get('name', 'Drink'),
-                                'price_diff': change['price'] - component.get('base_price', 0)
-                            }
-                        })
-                        item['price'] += (change['price'] - component.get('base_price', 0)) * change['qty']
-
-                    if remaining_qty > 0:
-                        item['contents'][comp_id].append({
-                            'quantity': remaining_qty,
-                            'customizations': None
-                        })
-                else:
-                    item['contents'][comp_id] = {
-                        'quantity': fixed_qty,
-                        'customizations': None
-                    }
+                spec['drinks'][comp_id] = _ask_drinks(component, fixed_qty)
 
             # ---- SIDES ----
             else:
                 print(f"\n {component.get('name', 'Side')} x{fixed_qty} (Standard)")
-                item['contents'][comp_id] = {
-                    'quantity': fixed_qty,
-                    'customizations': None
-                }
 
     # ===== BURGER INGREDIENTS =====
-    elif menu_item.get('category') == 'Burgers' and menu_item.get('ingredients'):
-        print("\nCustomizable ingredients:")
-        for ing, details in menu_item.get('ingredients', {}).items():
-            if not details.get('default', True):
-                if input(f"Add {ing} (+RM{details.get('price', 0):.2f})? (y/n): ").lower() == 'y':
-                    item['price'] += details.get('price', 0)
-                    item['name'] += f" +{ing}"
+    elif not is_combo:
+        spec['extras'] = _ask_extras(menu_item)
 
     # ===== SPECIAL INSTRUCTIONS =====
-    if not is_combo_part:
-        item['remarks'] = input("\n Special instructions (press Enter to skip): ").strip()
+    spec['remarks'] = input("\n Special instructions (press Enter to skip): ").strip()
 
-    return item
+    return spec
 
 
 def checkout(current_user, cart):
@@ -259,7 +156,7 @@ def checkout(current_user, cart):
     display_cart(cart)
 
     # Get customer info
-    customer_name = current_user
+    customer_name = None
     if current_user.startswith("Guest_"):
         customer_name = input("Enter your name for the order: ").strip()
         while not customer_name:
@@ -281,49 +178,36 @@ def checkout(current_user, cart):
 
     remarks = input("Enter order remarks (optional): ").strip()
 
-    # Generate order data
-    existing_orders = load_all_orders()
-    order_id = "D" + str(len(existing_orders) + 1).zfill(2)
-
-    order_data = {
-        order_id: {
-            "system_user": current_user,
-            "display_name": customer_name,
-            "type": "Dine-In" if order_type == "1" else "Takeaway",
-            "table_number": int(table_num),
-            "items": [[item['id'], item['quantity']] for item in cart],
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "remarks": remarks,
-            "status": "Preparing"
-        }
-    }
-
-    # Save the order
-    save_order(order_data)
+    try:
+        order_id, order = CartService().checkout(
+            current_user, "Dine-In" if order_type == "1" else "Takeaway", table_num, remarks, customer_name
+        )
+    except ServiceError as e:
+        print(e)
+        return False
 
     # Show confirmation
     print(f"\n=== ORDER CONFIRMATION ===")
     print(f"Order ID: {order_id}")
-    print(f"Customer: {customer_name}")
+    print(f"Customer: {order['display_name']}")
     print("Items:")
-    for item_id, qty in order_data[order_id]['items']:
+    for item_id, qty in order['items']:
         print(f"  - {item_id} x{qty}")
     print(f"Remarks: {remarks if remarks else 'None'}")
-
-    # Clear cart
-    save_cart(current_user, [])
     return True
 
 
 def cart_management(current_user, menu):
-    menu = load_file("menu_items.txt")
+    menu = get_menu_index()
     if not current_user:
         print("Please login first")
         return current_user
 
-    cart = load_cart(current_user)
+    service = CartService(menu)
 
     while True:
+        flush_if_due()
+        cart = service.cart(current_user)
         display_cart(cart)
 
         print("\nOPTIONS:")
@@ -337,21 +221,18 @@ def cart_management(current_user, menu):
 
         if choice == "1":
             print("\nMENU ITEMS:")
-            categories = {}
-            for item_id, item in menu.items():
-                categories.setdefault(item['category'], []).append((item_id, item))
-
-            for category, items in categories.items():
+            for category, items in menu.by_category.items():
                 print(f"\n{category.upper()}")
                 for item_id, item in items:
                     print(f"{item_id}. {item['name']} - RM{item['base_price']:.2f}")
 
             item_id = input("\nEnter item ID: ").strip()
             if item_id in menu:
-                item_data = {'id': item_id, **menu[item_id]}
-                cart.append(customize_item(item_data, menu))
-                save_cart(current_user, cart)
-                print("Item added to cart!")
+                try:
+                    service.add_to_cart(current_user, customize_item(menu.items[item_id], menu.items))
+                    print("Item added to cart!")
+                except ServiceError as e:
+                    print(e)
             else:
                 print("Invalid item ID!")
 
@@ -362,12 +243,10 @@ def cart_management(current_user, menu):
 
             try:
                 idx = int(input("Enter item number to remove: ")) - 1
-                if 0 <= idx < len(cart):
-                    removed = cart.pop(idx)
-                    save_cart(current_user, cart)
-                    print(f"Removed {removed.get('name', 'item')}")
-                else:
-                    print("Invalid item number!")
+                removed = service.remove_from_cart(current_user, idx)
+                print(f"Removed {removed.get('name', 'item')}")
+            except ServiceError as e:
+                print(e)
             except ValueError:
                 print("Please enter a valid number!")
 
@@ -379,9 +258,7 @@ def cart_management(current_user, menu):
             try:
                 idx = int(input("Enter item number to edit remarks: ")) - 1
                 if 0 <= idx < len(cart):
-                    new_remarks = input("Enter new remarks: ").strip()
-                    cart[idx]['remarks'] = new_remarks
-                    save_cart(current_user, cart)
+                    service.set_remarks(current_user, idx, input("Enter new remarks: ").strip())
                     print("Remarks updated!")
                 else:
                     print("Invalid item number!")
@@ -393,6 +270,7 @@ def cart_management(current_user, menu):
                 return current_user
 
         elif choice == "5":
+            flush_carts()
             return current_user
 
         else:
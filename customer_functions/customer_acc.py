@@ -1,31 +1,15 @@
+from utils.accounts import AccountExists, account_exists, authenticate, create_account, list_accounts
+
+
 def load_customers():
-    customers = {}
-    try:
-        with open("data/users.txt", "r") as f:
-            for line in f:
-                line = line.strip()
-                if line and "|||" in line:
-                    username, pwd = line.split("|||", 1)
-                    customers[username] = pwd
-    except FileNotFoundError:
-        import os
-        os.makedirs("data", exist_ok=True)
-        with open("data/users.txt", "w"):
-            pass
-    return customers
-
-
-def save_customers(customers):
-    import os
-    os.makedirs("data", exist_ok=True)
-    with open("data/users.txt", "w") as f:
-        for username, pwd in customers.items():
-            f.write(f"{username}|||{pwd}\n")
+    return list_accounts("customer")
 
 
-def customer_account_management(current_user):
-    customers = load_customers()
+def save_customer(username, password):
+    create_account(username, password, "customer")
 
+
+def customer_account_management(current_user):
     while True:
         print("\n=== ACCOUNT MANAGEMENT ===")
         print(f"Current user: {current_user or 'Not logged in'}")
@@ -45,7 +29,10 @@ def customer_account_management(current_user):
             if " " in username:
                 print("Username cannot contain spaces!")
                 continue
-            if username in customers:
+            if ":" in username:
+                print("Username cannot contain ':'!")
+                continue
+            if account_exists(username):  # Early answer; save_customer makes the real check
                 print("Username already exists!")
                 continue
 
@@ -56,9 +43,15 @@ def customer_account_management(current_user):
             if " " in password:
                 print("Password cannot contain spaces!")
                 continue
+            if ":" in password:
+                print("Password cannot contain ':'!")
+                continue
 
-            customers[username] = password
-            save_customers(customers)
+            try:
+                save_customer(username, password)
+            except AccountExists:
+                print("Username already exists!")
+                continue
             print("Registration successful!")
             return username
 
@@ -70,7 +63,7 @@ def customer_account_management(current_user):
             username = input("Username: ").strip()
             password = input("Password: ").strip()
 
-            if username in customers and customers[username] == password:
+            if authenticate(username, password, "customer"):
                 print("Login successful!")
                 return username
             else:
@@ -1,25 +1,8 @@
-def load_reviews():
-    reviews = []
-    try:
-        with open("data/review.txt", "r") as f:
-            for line in f:
-                parts = line.strip().split("|||")
-                if len(parts) >= 4:
-                    reviews.append({
-                        "user": parts[0],
-                        "dish": parts[1],
-                        "comment": parts[2],
-                        "rating": parts[3]
-                    })
-    except FileNotFoundError:
-        pass
-    return reviews
+from utils import reviews
 
 
-def save_reviews(reviews):
-    with open("data/review.txt", "w") as f:
-        for review in reviews:
-            f.write(f"{review['user']}|||{review['dish']}|||{review['comment']}|||{review['rating']}\n")
+def load_reviews(user):
+    return [{"id": review_id, **review} for review_id, review in reviews.reviews_by_user(user).items()]
 
 
 def dishes_review(current_user):
@@ -27,8 +10,7 @@ def dishes_review(current_user):
         print("Please login first")
         return current_user
 
-    reviews = load_reviews()
-    user_reviews = [r for r in reviews if r["user"] == current_user]
+    user_reviews = load_reviews(current_user)
 
     while True:
         print(f"\nReviews by {current_user}:")
@@ -36,7 +18,7 @@ def dishes_review(current_user):
             print("(No reviews yet)")
         else:
             for idx, review in enumerate(user_reviews, 1):
-                print(f"{idx}. {review['dish']}: {review['comment']} ({review['rating']}/5)")
+                print(f"{idx}. {review.get('dish_name', review['dish'])}: {review['comment']} ({review['rating']}/5)")
 
         print("\n1. Add Review")
         print("2. Delete Review")
@@ -44,7 +26,14 @@ def dishes_review(current_user):
         choice = input("Choose (1-3): ")
 
         if choice == "1":
-            dish = input("Dish name: ").strip()
+            dish = reviews.resolve_dish(input("Dish (item code or name): "))
+            if dish is None:
+                print("No such dish on the menu!")
+                continue
+            rating_info = reviews.dish_rating(dish)
+            if rating_info:
+                print(f"{reviews.dish_name(dish)} is rated {rating_info['mean']:.1f}/5 "
+                      f"from {rating_info['count']} review(s).")
             comment = input("Your review: ").strip()
             while True:
                 rating = input("Rating (1-5): ").strip()
@@ -52,13 +41,7 @@ def dishes_review(current_user):
                     break
                 print("Invalid rating! Enter 1-5.")
 
-            reviews.append({
-                "user": current_user,
-                "dish": dish,
-                "comment": comment,
-                "rating": rating
-            })
-            save_reviews(reviews)
+            reviews.add_review(current_user, dish, comment, rating)
             print("Review added successfully!")
             return current_user
 
@@ -70,8 +53,9 @@ def dishes_review(current_user):
             try:
                 idx = int(input("Enter review number to delete: ")) - 1
                 if 0 <= idx < len(user_reviews):
-                    reviews = [r for r in reviews if r != user_reviews[idx]]
-                    save_reviews(reviews)
+                    review = user_reviews[idx]
+                    reviews.delete_review(review.pop("id"), review)
+                    user_reviews = load_reviews(current_user)
                     print("Review deleted!")
                 else:
                     print("Invalid number!")
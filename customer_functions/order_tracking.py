@@ -1,23 +1,20 @@
-import json
+from utils import events
+from utils.storage import get_storage
 
-def load_orders(username):
-    try:
-        with open("data/orders.txt", "r") as f:
-            all_orders = json.load(f)
-            return {
-                order_id: order
-                for order_id, order in all_orders.items()
-                if order.get("system_user") == username  # Consistent tracking
-            }
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+PAGE_SIZE = 5
+WATCH_PROMPT = "'w' to watch for status updates"
+
+def load_orders(username, limit=None, offset=0):
+    """This user's orders, newest first, read through the per-user index"""
+    return dict(get_storage().latest_for_user("orders", username, limit, offset))
 
 def order_tracking(current_user):
     if not current_user:
         print("Please login first")
         return current_user
 
-    orders = load_orders(current_user)
+    page = 0
+    orders = load_orders(current_user, PAGE_SIZE)
 
     if not orders:
         print("\nNo orders found for your account!")
@@ -26,20 +23,44 @@ def order_tracking(current_user):
         return current_user
 
     print(f"\n=== YOUR ORDER HISTORY ===")
-    for order_id, order in sorted(orders.items(),
-                                 key=lambda x: x[1]['timestamp'],
-                                 reverse=True):
-        print(f"\nOrder ID: {order_id}")
-        print(f"Date: {order['timestamp']}")
-        print(f"Type: {order['type']}")
-        if order['type'] == "Dine-In":
-            print(f"Table: {order['table_number']}")
-        print("Items:")
-        for item_id, qty in order['items']:
-            print(f"  - {item_id} x{qty}")
-        if order['remarks']:
-            print(f"Remarks: {order['remarks']}")
-        print("-" * 40)
-
-    input("\nPress Enter to continue...")
-    return current_user
\ No newline at end of file
+    while orders:
+        for order_id, order in orders.items():
+            print(f"\nOrder ID: {order_id}")
+            print(f"Date: {order['timestamp']}")
+            print(f"Type: {order['type']}")
+            print(f"Status: {order.get('status', 'Preparing')}")
+            if order['type'] == "Dine-In":
+                print(f"Table: {order['table_number']}")
+            print("Items:")
+            for item_id, qty in order['items']:
+                print(f"  - {item_id} x{qty}")
+            if order['remarks']:
+                print(f"Remarks: {order['remarks']}")
+            print("-" * 40)
+
+        if len(orders) < PAGE_SIZE:
+            break
+        choice = input(f"\nEnter 'n' for older orders, {WATCH_PROMPT}, or press Enter to continue: ").strip().lower()
+        if choice == 'w':
+            watch_orders(current_user)
+        if choice != 'n':
+            return current_user
+        page += 1
+        orders = load_orders(current_user, PAGE_SIZE, page * PAGE_SIZE)
+        if not orders:
+            print("\nNo older orders.")
+
+    if input(f"\nEnter {WATCH_PROMPT} or press Enter to continue: ").strip().lower() == 'w':
+        watch_orders(current_user)
+    return current_user
+
+def watch_orders(current_user):
+    """Print this user's order events as they happen, until Ctrl+C"""
+    feed = events.EventFeed(users={current_user})
+    print("\nWatching your orders (press Ctrl+C to stop)...")
+    try:
+        while True:
+            for event in feed.wait(timeout=60):
+                print(f"  {events.describe(event)}")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
\ No newline at end of file
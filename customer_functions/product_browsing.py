@@ -1,17 +1,16 @@
-from data.menu_data import get_default_menu
+from data.menu_index import get_menu_index
 
 def display_menu_by_category(menu, category):
-    menu = get_default_menu()
+    menu = get_menu_index()
     print(f"\n=== {category.upper()} ===")
-    for item_id, item in menu.items():
-        if item['category'] == category:
-            print(f"\n{item_id}. {item['name']} - RM{item['base_price']:.2f}")
-            if item.get('contents'):
-                print("   Includes:")
-                for content_id, qty in item['contents'].items():
-                    print(f"   - {qty}x {menu[content_id]['name']}")
-            if item.get('ingredients'):
-                print("   Customizable: Yes")
+    for item_id, item in menu.category_items(category):
+        print(f"\n{item_id}. {item['name']} - RM{item['base_price']:.2f}")
+        if item_id in menu.combo_contents:
+            print("   Includes:")
+            for content_id, name, qty in menu.combo_contents[item_id]:
+                print(f"   - {qty}x {name}")
+        if item.get('ingredients'):
+            print("   Customizable: Yes")
 
 
 def product_browsing(menu):
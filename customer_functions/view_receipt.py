@@ -1,25 +1,17 @@
-import json
+from utils.storage import get_storage
 
-def view_receipt(username):
-    try:
-        with open("data/receipt.json", "r", encoding="utf-8") as f:
-            all_receipts = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("\nNo receipts available.")
-        return
+def latest_receipt(username):
+    """This user's most recent receipt, read through the per-user index"""
+    latest = get_storage().latest_for_user("receipts", username, 1)
+    return latest[0] if latest else (None, None)
 
-    user_receipts = {
-        oid: r for oid, r in all_receipts.items()
-        if r.get("system_user") == username
-    }
+def view_receipt(username):
+    last_id, last = latest_receipt(username)
 
-    if not user_receipts:
+    if last is None:
         print("\nYou have no receipts yet.")
         return
 
-    # Найдём последний заказ по дате
-    last_id, last = max(user_receipts.items(), key=lambda x: x[1]["timestamp"])
-
     print("\n" + "=" * 40)
     print(f"🧾 Receipt for Order {last_id}")
     print("-" * 40)
@@ -0,0 +1,94 @@
+"""
+menu_index.py
+Read-only, precompiled view of the menu shared by browsing, the cart and the
+cashier screens.
+
+MENU_DATA supplies categories, ingredients and combo contents; menu_items.txt
+supplies the current names, prices and availability. The index is built once
+and rebuilt only when menu_items.txt changes, so callers never copy the menu.
+Every item mapping carries both "base_price" (MENU_DATA style) and "price"
+(menu_items.txt style) so it can stand in for either.
+"""
+
+from types import MappingProxyType
+
+from data.menu_data import MENU_DATA
+from utils.helpers import load_file
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    return value
+
+
+class MenuIndex:
+    def __init__(self, menu_data, menu_items):
+        self.menu_items = menu_items
+
+        items = {}
+        for code in list(menu_data) + [c for c in menu_items if c not in menu_data]:
+            source = menu_data.get(code, {})
+            listing = menu_items.get(code, {})
+            price = listing.get("price", source.get("base_price", 0))
+            item = dict(source)
+            item.update({
+                "id": code,
+                "name": listing.get("name", source.get("name", code)),
+                "base_price": price,
+                "price": price,
+                "category": source.get("category", listing.get("category", "")),
+                "availability": listing.get("availability", "Available"),
+            })
+            if "contents" not in item:
+                item.setdefault("ingredients", {})
+            items[code] = _freeze(item)
+        self.items = MappingProxyType(items)
+
+        by_category = {}
+        for code, item in items.items():
+            by_category.setdefault(item["category"], []).append((code, item))
+        self.by_category = MappingProxyType({cat: tuple(entries) for cat, entries in by_category.items()})
+
+        # Combo code -> ((component code, component name, quantity), ...)
+        self.combo_contents = MappingProxyType({
+            code: tuple(
+                (comp_id, items[comp_id]["name"] if comp_id in items else comp_id, qty)
+                for comp_id, qty in item["contents"].items()
+            )
+            for code, item in items.items() if "contents" in item
+        })
+
+        # Item code -> {ingredient: price}, and the optional add-ons only
+        self.ingredient_prices = MappingProxyType({
+            code: MappingProxyType({ing: d.get("price", 0) for ing, d in item.get("ingredients", {}).items()})
+            for code, item in items.items()
+        })
+        self.extras = MappingProxyType({
+            code: MappingProxyType({
+                ing: d.get("price", 0)
+                for ing, d in item.get("ingredients", {}).items() if not d.get("default", True)
+            })
+            for code, item in items.items()
+        })
+
+    def get(self, code):
+        return self.items.get(code)
+
+    def __contains__(self, code):
+        return code in self.items
+
+    def category_items(self, category):
+        return self.by_category.get(category, ())
+
+
+_index = None
+
+
+def get_menu_index():
+    """Return the shared MenuIndex, rebuilding it only if menu_items.txt changed."""
+    global _index
+    menu_items = load_file("menu_items.txt")  # Served from the read cache when unchanged
+    if _index is None or _index.menu_items is not menu_items:
+        _index = MenuIndex(MENU_DATA, menu_items)
+    return _index
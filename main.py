@@ -1,35 +1,19 @@
-import os
 from users.cashier import cashier_menu
 from users.manager import manager_menu
 from users.customer import customer_main
-
-ACCOUNTS_FILE = "data/users.txt"
+from utils.accounts import authenticate, list_accounts
 
 
 def load_accounts():
-    accounts = {}
-    if not os.path.exists(ACCOUNTS_FILE):
-        os.makedirs("data", exist_ok=True)
-        open(ACCOUNTS_FILE, "w").close()
-
-    with open(ACCOUNTS_FILE, "r") as file:
-        for line in file:
-            parts = line.strip().split(":")
-            if len(parts) == 3:
-                username, password, role = parts
-                accounts[username] = {"password": password, "role": role}
-    return accounts
+    return list_accounts()
 
 
 def login(expected_role):
-    accounts = load_accounts()
-
     print(f"\n=== Login as {expected_role.capitalize()} ===")
     username = input("Username: ").strip()
     password = input("Password: ").strip()
 
-    user = accounts.get(username)
-    if user and user["password"] == password and user["role"] == expected_role:
+    if authenticate(username, password, expected_role):
         print(f"\n✅ Logged in successfully as {username} ({expected_role})")
         return True
     else:
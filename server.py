@@ -0,0 +1,387 @@
+"""
+server.py
+Local HTTP/JSON API for kiosks and cashier terminals (standard library only).
+
+    python server.py [port]        # default: 8080, on 127.0.0.1
+
+One asyncio process serves every kiosk and terminal. The active orders are
+held in memory and changed through utils.services, one request at a time, so
+concurrent sessions never overwrite each other's files; changes made by
+cashier terminals are picked up from the order event feed (utils.events). Changes are persisted
+in batches: order and transaction changes are group-committed to the journal
+every FLUSH_INTERVAL (a write request is answered once its batch is on disk),
+the daily rollups are saved with the same batch, and carts are written behind
+as in the terminal app. While a batch is open the server keeps the journal
+lock, so a cashier terminal never checks an order against a file that is
+missing the server's latest changes, and order events are only sent once
+the batch is written.
+
+Endpoints (JSON in, JSON out; errors are {"error": message}):
+
+    GET    /menu                               menu by category
+    GET    /promos                             promo codes
+    GET    /carts/<user>                       cart
+    POST   /carts/<user>/items                 add an item spec (see CartService)
+    DELETE /carts/<user>/items/<n>             remove item n (1-based)
+    PUT    /carts/<user>/items/<n>/remarks     {"remarks"}
+    POST   /carts/<user>/checkout              {"order_type", "table_number", "remarks", "display_name"}
+    GET    /orders                             active orders
+    GET    /orders/<id>                        active order with its price breakdown
+    POST   /orders/<id>/discounts              {"promo_code"} or {"kind", "value", "item_code"}
+    DELETE /orders/<id>/discounts/<n>          remove discount n (1-based)
+    PUT    /orders/<id>/status                 {"status"}
+    POST   /orders/<id>/checkout               {"payment_method"}
+    DELETE /orders/<id>                        cancel
+    GET    /events[?cursor=&user=&order_id=]   order events after cursor (waits up to EVENT_WAIT)
+    GET    /kitchen                            open quantities to cook, biggest batch first
+    GET    /stock                              ingredient levels and items that cannot be made
+    GET    /reports/daily[?date=YYYY-MM-DD]    daily sales report
+
+/events answers {"events": [...], "cursor": "..."}; pass the cursor back to
+get the next events. Without one it starts from now.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+from collections.abc import Mapping
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from data.menu_index import get_menu_index
+from utils import carts, events, journal, rollups, stock
+from utils.kitchen import DemandTable
+from utils.helpers import load_file
+from utils.services import CartService, OrderService, ReportService, ServiceError
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+FLUSH_INTERVAL = 0.02  # Seconds between group commits
+MAX_BODY = 64 * 1024
+EVENT_WAIT = 25.0  # Seconds an /events request waits for something to happen
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def _thaw(value):
+    """Plain dicts from the menu index's read-only mappings, for json.dumps."""
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    return value
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ==============================================
+# API
+# ==============================================
+
+class RestaurantAPI:
+    def __init__(self):
+        self.current_orders = load_file('current_active_orders.txt')
+        self.carts = CartService()
+        self.reports = ReportService()
+        self.published = asyncio.Event()  # Set whenever this process publishes an event
+        events.subscribe(lambda event: self.published.set())
+        self.feed = events.EventFeed()
+        self.demand = DemandTable(self.current_orders)
+        self.routes = [
+            ("GET", r"/menu", self.menu),
+            ("GET", r"/promos", self.promos),
+            ("GET", r"/carts/(?P<user>[^/]+)", self.cart),
+            ("POST", r"/carts/(?P<user>[^/]+)/items", self.add_to_cart),
+            ("DELETE", r"/carts/(?P<user>[^/]+)/items/(?P<n>\d+)", self.remove_from_cart),
+            ("PUT", r"/carts/(?P<user>[^/]+)/items/(?P<n>\d+)/remarks", self.set_remarks),
+            ("POST", r"/carts/(?P<user>[^/]+)/checkout", self.cart_checkout),
+            ("GET", r"/orders", self.orders),
+            ("GET", r"/orders/(?P<order_id>[^/]+)", self.order),
+            ("POST", r"/orders/(?P<order_id>[^/]+)/discounts", self.add_discount),
+            ("DELETE", r"/orders/(?P<order_id>[^/]+)/discounts/(?P<n>\d+)", self.remove_discount),
+            ("PUT", r"/orders/(?P<order_id>[^/]+)/status", self.set_status),
+            ("POST", r"/orders/(?P<order_id>[^/]+)/checkout", self.order_checkout),
+            ("DELETE", r"/orders/(?P<order_id>[^/]+)", self.cancel),
+            ("GET", r"/events", self.events),
+            ("GET", r"/kitchen", self.kitchen),
+            ("GET", r"/stock", self.stock),
+            ("GET", r"/reports/daily", self.daily_report),
+        ]
+        self.routes = [(method, re.compile(pattern), handler) for method, pattern, handler in self.routes]
+
+    def order_service(self):
+        return OrderService(self.current_orders, get_menu_index().items)
+
+    def dispatch(self, method, path, query, body):
+        """Run the handler for `method path`; returns the JSON-able result."""
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            params = {name: unquote(value) for name, value in match.groupdict().items()}
+            return handler(body=body, query=query, **params)
+        if allowed:
+            raise HTTPError(405, f"{method} is not allowed on {path}")
+        raise HTTPError(404, f"No such endpoint: {path}")
+
+    # ---- Browsing ----
+
+    def menu(self, **_):
+        return {
+            category: [_thaw(item) for _, item in entries]
+            for category, entries in get_menu_index().by_category.items()
+        }
+
+    def promos(self, **_):
+        return load_file('promo_codes.txt')
+
+    # ---- Carts ----
+
+    def cart(self, user, **_):
+        return self.carts.cart(user)
+
+    def add_to_cart(self, user, body, **_):
+        return self.carts.add_to_cart(user, body)
+
+    def remove_from_cart(self, user, n, **_):
+        return self.carts.remove_from_cart(user, int(n) - 1)
+
+    def set_remarks(self, user, n, body, **_):
+        self.carts.set_remarks(user, int(n) - 1, str(body.get("remarks", "")))
+        return self.carts.cart(user)
+
+    def cart_checkout(self, user, body, **_):
+        order_id, order = self.carts.checkout(
+            user, body.get("order_type"), body.get("table_number", 0),
+            body.get("remarks", ""), body.get("display_name")
+        )
+        return {"order_id": order_id, "order": order}
+
+    # ---- Active orders ----
+
+    def orders(self, **_):
+        return self.current_orders
+
+    def order(self, order_id, **_):
+        service = self.order_service()
+        return {"order": service.order(order_id), "price": service.price(order_id)}
+
+    def add_discount(self, order_id, body, **_):
+        service = self.order_service()
+        if body.get("promo_code"):
+            return service.apply_promo(order_id, str(body["promo_code"]))
+        try:
+            value = float(body.get("value"))
+        except (TypeError, ValueError):
+            raise ServiceError("Please enter a valid number.")
+        return service.add_discount(order_id, body.get("kind"), value, body.get("item_code"))
+
+    def remove_discount(self, order_id, n, **_):
+        return self.order_service().remove_discount(order_id, int(n) - 1)
+
+    def set_status(self, order_id, body, **_):
+        return self.order_service().set_status(order_id, body.get("status"))
+
+    def order_checkout(self, order_id, body, **_):
+        return self.order_service().checkout(order_id, body.get("payment_method"))
+
+    def cancel(self, order_id, **_):
+        return self.order_service().cancel(order_id)
+
+    # ---- Events ----
+
+    def sync(self):
+        """Apply active-order changes made by other processes to the in-memory orders."""
+        changes = [event for event in self.feed.poll() if event["pid"] != os.getpid()]
+        events.apply_to_active_orders(self.current_orders, changes)
+        for event in changes:
+            self.demand.apply(event)
+        current_orders = load_file('current_active_orders.txt')
+        if current_orders is not self.current_orders:
+            # The file was changed outside the event feed as well: take it as it is
+            self.current_orders = current_orders
+            self.demand.rebuild(current_orders)
+
+    async def events(self, query, **_):
+        def first(name):
+            return query.get(name, [None])[0]
+
+        try:
+            feed = events.EventFeed(
+                order_ids=[first("order_id")] if first("order_id") else None,
+                users=[first("user")] if first("user") else None,
+                cursor=first("cursor")
+            )
+        except ValueError:
+            raise ServiceError("Invalid cursor.")
+        deadline = asyncio.get_running_loop().time() + EVENT_WAIT
+        while True:
+            self.published.clear()
+            found = feed.poll()
+            remaining = deadline - asyncio.get_running_loop().time()
+            if found or remaining <= 0:
+                return {"events": found, "cursor": feed.cursor}
+            try:
+                await asyncio.wait_for(self.published.wait(), min(events.POLL_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    def kitchen(self, **_):
+        return {
+            "open_orders": self.demand.open_orders(),
+            "batches": [{"id": code, "name": name, "quantity": qty} for code, name, qty in self.demand.batches()]
+        }
+
+    def stock(self, **_):
+        return {"levels": stock.load_stock(), "unavailable": stock.unavailable()}
+
+    # ---- Reports ----
+
+    def daily_report(self, query, **_):
+        report = self.reports.daily_report(query.get("date", [None])[0])
+        if report is None:
+            raise ServiceError("No transactions found for that day!")
+        return report
+
+
+# ==============================================
+# HTTP
+# ==============================================
+
+class Server:
+    def __init__(self, api):
+        self.api = api
+        self._committed = None
+
+    async def commit_loop(self):
+        """Group-commit journaled changes, write behind idle carts and pick up outside changes."""
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self.commit()
+            carts.flush_if_due()
+            self.api.sync()
+
+    def commit(self):
+        """Write the pending journal batch and release the requests waiting for it."""
+        committed, self._committed = self._committed, None
+        try:
+            journal.flush()
+            rollups.flush()
+        except OSError as e:
+            events.discard()
+            if committed is not None:
+                committed.set_exception(e)
+            return
+        events.flush()  # Only now is what they describe on disk
+        if committed is not None:
+            committed.set_result(None)
+
+    async def committed(self):
+        """Wait for the group commit that includes everything written so far (and its events)."""
+        if not journal.has_pending() and not events.has_pending():
+            return
+        if self._committed is None:
+            self._committed = asyncio.get_running_loop().create_future()
+        await asyncio.shield(self._committed)
+
+    async def respond(self, method, target, body):
+        url = urlsplit(target)
+        try:
+            payload = json.loads(body) if body else {}
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Request body must be a JSON object")
+            if method != "GET":
+                # Keep other terminals out of the journal until this request's batch is
+                # written: its version checks ran against changes still held in memory
+                journal.hold()
+            result = self.api.dispatch(method, url.path.rstrip("/") or "/", parse_qs(url.query), payload)
+            if asyncio.iscoroutine(result):
+                result = await result
+            if method != "GET":
+                await self.committed()
+            return 200, result
+        except json.JSONDecodeError:
+            return 400, {"error": "Request body is not valid JSON"}
+        except HTTPError as e:
+            return e.status, {"error": str(e)}
+        except ServiceError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader, writer):
+        """Serve one connection; HTTP/1.1 keep-alive lets a kiosk reuse it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, result = 413, {"error": "Request body too large"}
+                    body = b""
+                else:
+                    body = await reader.readexactly(length)
+                    status, result = await self.respond(method.upper(), target, body)
+
+                data = json.dumps(result).encode("utf-8")
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"{version} {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=DEFAULT_PORT):
+        journal.begin_group_commit()
+        rollups.begin_write_behind()
+        events.begin_deferred()
+        commits = asyncio.create_task(self.commit_loop())
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Serving the restaurant API on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            commits.cancel()
+            self.commit()
+            carts.flush_carts()
+            journal.end_group_commit()
+            rollups.end_write_behind()
+            events.end_deferred()
+
+
+def run(port=DEFAULT_PORT, host=HOST):
+    try:
+        asyncio.run(Server(RestaurantAPI()).serve(host, port))
+    except KeyboardInterrupt:
+        print("Server stopped.")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT)
@@ -1,12 +1,17 @@
 from utils.order_management import view_active_orders
-from utils.display import show_menu, show_promo_codes, daily_sales_report
+from utils.display import show_menu, show_promo_codes, show_kitchen_demand, daily_sales_report
+from utils.kitchen import get_demand
 from utils.helpers import load_file
+from data.menu_index import get_menu_index
+from utils.storage import get_storage
+from datetime import datetime
 
 def cashier_menu():
     while True:
         current_orders = load_file('current_active_orders.txt')
-        transactions = load_file('transactions.txt')
-        menu_items = load_file('menu_items.txt')
+        today = datetime.now().strftime("%Y-%m-%d")
+        transactions = get_storage().transactions_between(today, today)  # Only today's partition
+        menu_items = get_menu_index().items
         promo_codes = load_file('promo_codes.txt')
 
         print("\n=== Cashier Menu ===")
@@ -14,7 +19,8 @@ def cashier_menu():
         print("2. Daily Sales Report")
         print("3. View Menu")
         print("4. View Promo Codes")
-        print("5. Exit")
+        print("5. Kitchen Demand")
+        print("6. Exit")
 
         choice = input("Select an option: ").strip()
 
@@ -33,6 +39,10 @@ def cashier_menu():
             input("\nPress Enter to return to main menu...")
             
         elif choice == '5':
+            show_kitchen_demand(get_demand())
+            input("\nPress Enter to return to main menu...")
+
+        elif choice == '6':
             print("Exiting the cashier system. Goodbye!")
             break
         
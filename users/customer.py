@@ -1,10 +1,11 @@
 from customer_functions.customer_acc import customer_account_management
-from data.menu_data import get_default_menu
+from data.menu_index import get_menu_index
 from customer_functions.product_browsing import product_browsing
 from customer_functions.cart_management import cart_management
 from customer_functions.order_tracking import order_tracking
 from customer_functions.dishes_review import dishes_review
 from customer_functions.view_receipt import view_receipt
+from utils.carts import flush_if_due
 from utils.helpers import load_file
 from utils.display import show_menu
 import os
@@ -18,7 +19,7 @@ def load_initial_data():
 
     return {
         'current_user': None,
-        'menu': load_file("menu.txt"),
+        'menu': get_menu_index().items,
         'promo_codes': load_file("promo_codes.txt")
     }
 
@@ -44,6 +45,7 @@ def customer_main():
     promo_codes = load_file('promo_codes.txt')
 
     while True:
+        flush_if_due()
         print("\n" + "=" * 40)
         print("=" * 40)
         print("1. Account Management")
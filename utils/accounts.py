@@ -0,0 +1,103 @@
+"""
+accounts.py
+User accounts for every role: lookups, registration and password checks.
+
+Accounts live in the storage engine's "accounts" collection. With the flat
+backend the parsed users.txt is cached and revalidated whenever the file
+changes, so a lookup is a dictionary access; SQLite looks the key up directly.
+
+Passwords are stored as salted PBKDF2-SHA256 hashes,
+"pbkdf2_sha256$<iterations>$<salt>$<hash>". Hashing only happens at login,
+registration and account creation. The cost is set with
+RESTAURANT_PBKDF2_ITERATIONS; older hashes and plain-text passwords left
+over from before hashing are upgraded the next time their owner logs in.
+"""
+
+import hashlib
+import hmac
+import os
+
+from utils.storage import ConflictError, get_storage
+
+HASH_SCHEME = "pbkdf2_sha256"
+PBKDF2_ITERATIONS = int(os.environ.get("RESTAURANT_PBKDF2_ITERATIONS", 120_000))
+SALT_BYTES = 16
+
+
+class AccountExists(ValueError):
+    """The username was taken (possibly by another terminal a moment earlier)."""
+
+
+# ==============================================
+# PASSWORD HASHING
+# ==============================================
+
+def hash_password(password, iterations=None):
+    iterations = iterations or PBKDF2_ITERATIONS
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def _is_hashed(stored):
+    return stored.startswith(HASH_SCHEME + "$")
+
+
+def verify_password(stored, password):
+    """Check a password against a stored hash (or a legacy plain-text password)."""
+    if not _is_hashed(stored):
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    _, iterations, salt, digest = stored.split("$")
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+def needs_rehash(stored):
+    return not _is_hashed(stored) or int(stored.split("$")[1]) != PBKDF2_ITERATIONS
+
+
+# ==============================================
+# ACCOUNTS
+# ==============================================
+
+def get_account(username):
+    return get_storage().get("accounts", username)
+
+
+def account_exists(username):
+    return get_account(username) is not None
+
+
+def list_accounts(role=None):
+    storage = get_storage()
+    return storage.find("accounts", "role", role) if role else storage.load("accounts")
+
+
+def create_account(username, password, role):
+    """Create an account if the username is free, else raise AccountExists.
+
+    The check is made inside the commit (expecting no record yet), so two
+    terminals registering the same name cannot both succeed.
+    """
+    account = {"password": hash_password(password), "role": role}
+    try:
+        get_storage().commit([("accounts", username, account)], expected={("accounts", username): None})
+    except ConflictError:
+        raise AccountExists(f"Username '{username}' already exists.")
+
+
+def delete_account(username):
+    get_storage().commit([("accounts", username, None)])
+
+
+def authenticate(username, password, role=None):
+    """Return the account if the password (and role, when given) match, else None."""
+    account = get_account(username)
+    if account is None or (role is not None and account["role"] != role):
+        return None
+    if not verify_password(account["password"], password):
+        return None
+    if needs_rehash(account["password"]):
+        account = dict(account, password=hash_password(password))
+        get_storage().commit([("accounts", username, account)])
+    return account
@@ -0,0 +1,171 @@
+"""
+batch_pricing.py
+Reprice many orders at once, e.g. every open order after a price change in
+menu_items.txt, or every transaction when auditing a day.
+
+All order lines are flattened into item-code / quantity / order-number arrays,
+prices are looked up through a price vector and subtotals, per-category totals
+and tax are computed with NumPy. Only orders that carry discounts go through
+the scalar discount resolver in utils.pricing, so results match it exactly.
+NumPy is optional: without it every order is priced by the scalar engine.
+
+    python -m utils.batch_pricing
+"""
+
+from itertools import chain
+from operator import itemgetter
+
+from utils import pricing
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+class BatchResult:
+    """Per-order pricing results in column form, indexable by order ID."""
+
+    def __init__(self, order_ids, orders, menu_items, subtotal, total, tax, category_totals, discount_details):
+        self.order_ids = order_ids
+        self.subtotal = subtotal
+        self.total = total
+        self.tax = tax
+        self.category_totals = category_totals  # {category: per-order totals}
+        self._orders = orders
+        self._menu_items = menu_items
+        self._discount_details = discount_details
+        self._positions = {order_id: i for i, order_id in enumerate(order_ids)}
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    def __contains__(self, order_id):
+        return order_id in self._positions
+
+    def __getitem__(self, order_id):
+        """Same dict as pricing.compute_order() for this order."""
+        i = self._positions[order_id]
+        _, item_totals = pricing.line_totals(self._orders[order_id]["items"], self._menu_items)
+        return pricing.breakdown(
+            float(self.subtotal[i]),
+            float(self.total[i]),
+            self._discount_details.get(order_id, []),
+            item_totals
+        )
+
+    def grand_totals(self):
+        return {order_id: float(self.total[i]) + float(self.tax[i]) for i, order_id in enumerate(self.order_ids)}
+
+
+def reprice(orders, menu_items):
+    """Price every order in `orders` ({order_id: order}) against `menu_items`."""
+    if np is None:
+        return _reprice_scalar(orders, menu_items)
+
+    order_ids = list(orders)
+    codes = list(menu_items)
+    code_index = {code: i for i, code in enumerate(codes)}
+    categories = sorted({item['category'] for item in menu_items.values()})
+    category_index = {category: i for i, category in enumerate(categories)}
+
+    prices = np.array([menu_items[code]['price'] for code in codes], dtype=np.float64)
+    item_categories = np.array([category_index[menu_items[code]['category']] for code in codes], dtype=np.int64)
+
+    # Flatten every order line into parallel arrays
+    order_list = [orders[order_id] for order_id in order_ids]
+    item_lists = [order["items"] for order in order_list]
+    line_counts = np.fromiter(map(len, item_lists), dtype=np.int64, count=len(item_lists))
+    lines = list(chain.from_iterable(item_lists))
+    line_codes = np.fromiter(
+        map(code_index.__getitem__, map(itemgetter(0), lines)), dtype=np.int64, count=len(lines)
+    )
+    line_qty = np.fromiter(map(itemgetter(1), lines), dtype=np.float64, count=len(lines))
+    line_order = np.repeat(np.arange(len(order_ids)), line_counts)
+
+    line_totals = prices[line_codes] * line_qty
+    subtotal = np.bincount(line_order, weights=line_totals, minlength=len(order_ids))
+
+    n_categories = len(categories)
+    per_category = np.bincount(
+        line_order * n_categories + item_categories[line_codes],
+        weights=line_totals,
+        minlength=len(order_ids) * n_categories
+    ).reshape(len(order_ids), n_categories)
+    category_totals = {category: per_category[:, i] for i, category in enumerate(categories)}
+
+    # Discounts are rare and order-dependent: resolve them one order at a time
+    total = subtotal.copy()
+    discount_details = {}
+    discounted = [i for i, order in enumerate(order_list) if order.get("discounts")]
+    for i in discounted:
+        order_id = order_ids[i]
+        order = order_list[i]
+        _, item_totals = pricing.line_totals(order["items"], menu_items)
+        known = None
+        if len(item_totals) == len(order["items"]):  # No repeated codes: line totals == item totals
+            known = {category: float(per_category[i, j]) for j, category in enumerate(categories)}
+        total[i], discount_details[order_id] = pricing.resolve_discounts(
+            float(subtotal[i]), item_totals, order["discounts"], menu_items, known
+        )
+
+    tax = np.maximum(total, 0) * pricing.TAX_RATE
+    return BatchResult(order_ids, orders, menu_items, subtotal, total, tax, category_totals, discount_details)
+
+
+def _reprice_scalar(orders, menu_items):
+    order_ids = list(orders)
+    categories = sorted({item['category'] for item in menu_items.values()})
+    subtotal, total, tax = [], [], []
+    category_totals = {category: [] for category in categories}
+    discount_details = {}
+
+    for order_id in order_ids:
+        result = pricing.compute_order(orders[order_id], menu_items)
+        subtotal.append(result['subtotal'])
+        total.append(result['total'])
+        tax.append(result['tax'])
+        if result['discount_details']:
+            discount_details[order_id] = result['discount_details']
+        sums = dict.fromkeys(categories, 0)
+        for code, qty in orders[order_id]["items"]:
+            sums[menu_items[code]['category']] += menu_items[code]['price'] * qty
+        for category in categories:
+            category_totals[category].append(sums[category])
+
+    return BatchResult(order_ids, orders, menu_items, subtotal, total, tax, category_totals, discount_details)
+
+
+def audit_transactions(transactions, menu_items, tolerance=0.005):
+    """Return {order_id: (recorded total, repriced total)} for rows that no longer match.
+
+    Transactions keep the resolved discount amounts, not the discount rules, so
+    those amounts are subtracted from the repriced subtotal as they are.
+    """
+    lines = {
+        order_id: {"items": t.get("items", [])} for order_id, t in transactions.items()
+        if all(code in menu_items for code, _ in t.get("items", []))
+    }
+    result = reprice(lines, menu_items)
+    mismatches = {}
+    for i, order_id in enumerate(result.order_ids):
+        discounts = sum(d.get('amount', 0) for d in transactions[order_id].get('discounts', []))
+        repriced = float(result.subtotal[i]) - discounts
+        if abs(repriced - transactions[order_id]['total']) > tolerance:
+            mismatches[order_id] = (transactions[order_id]['total'], repriced)
+    return mismatches
+
+
+if __name__ == "__main__":
+    from utils.helpers import load_file
+    from data.menu_index import get_menu_index
+
+    menu_items = get_menu_index().items
+    open_orders = load_file("current_active_orders.txt")
+    result = reprice(open_orders, menu_items)
+    print(f"Repriced {len(result)} open orders: RM{sum(result.grand_totals().values()):.2f} including tax")
+
+    mismatches = audit_transactions(load_file("transactions.txt"), menu_items)
+    print(f"{len(mismatches)} transactions no longer match current prices")
+    for order_id, (recorded, repriced) in mismatches.items():
+        print(f"  {order_id}: recorded RM{recorded:.2f}, now RM{repriced:.2f}")
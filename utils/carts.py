@@ -0,0 +1,63 @@
+"""
+carts.py
+Per-user shopping carts, stored through the storage engine.
+
+Cart edits are written behind: a burst of edits is saved as one write.
+Nothing runs on a timer; pending carts are written by the first of:
+
+- a cart edit, or a pass through the customer or cart menu (flush_if_due),
+  once FLUSH_DELAY seconds have gone by since the oldest unsaved edit;
+- the server's commit loop, which calls flush_if_due on every tick;
+- the customer leaving the cart menu, or checking out;
+- the program exiting.
+
+A terminal left waiting at a prompt keeps its edits in memory until then.
+"""
+
+import atexit
+import copy
+import time
+
+from utils.storage import get_storage
+
+FLUSH_DELAY = 2.0
+_pending_carts = {}
+_pending_since = None
+
+
+def load_cart(user):
+    if user in _pending_carts:
+        cart = copy.deepcopy(_pending_carts[user])
+    else:
+        cart = get_storage().get("carts", user) or []
+    for item in cart:
+        if 'remarks' not in item:
+            item['remarks'] = ''
+    return cart
+
+
+def save_cart(user, cart):
+    global _pending_since
+    _pending_carts[user] = copy.deepcopy(cart)
+    if _pending_since is None:
+        _pending_since = time.monotonic()
+    elif time.monotonic() - _pending_since >= FLUSH_DELAY:
+        flush_carts()
+
+
+def flush_carts():
+    """Write every pending cart in one commit; empty carts are removed."""
+    global _pending_since
+    if _pending_carts:
+        get_storage().commit([("carts", user, cart or None) for user, cart in _pending_carts.items()])
+        _pending_carts.clear()
+    _pending_since = None
+
+
+def flush_if_due():
+    """Flush pending carts once the oldest edit has waited FLUSH_DELAY."""
+    if _pending_since is not None and time.monotonic() - _pending_since >= FLUSH_DELAY:
+        flush_carts()
+
+
+atexit.register(flush_carts)
@@ -5,6 +5,8 @@ Functions for displaying menus, promo codes, and order details in a restaurant s
 
 from datetime import datetime
 
+from utils.services import ReportService
+
 
 # ==============================================
 # CORE DISPLAY FUNCTIONS
@@ -52,6 +54,20 @@ def show_promo_codes(promo_codes):
     
     print("=" * 80)
 
+def show_kitchen_demand(table):
+    """Display what the kitchen still has to make, biggest batch first."""
+    print(f"\n{'=' * 80}")
+    print(f"{'KITCHEN DEMAND':^80}")
+    print(f"{'=' * 80}")
+    batches = table.batches()
+    if not batches:
+        print("Nothing left to cook.")
+    for code, name, qty in batches:
+        print(f"{code:<6} {name:<60} Cook: {qty:>5}")
+    print("-" * 80)
+    print(f"Open orders: {table.open_orders()}")
+    print("=" * 80)
+
 # ==============================================
 # ORDER DISPLAY FUNCTIONS
 # ==============================================
@@ -145,17 +161,13 @@ def daily_sales_report(transactions, menu_items):
     today = datetime.now().strftime("%Y-%m-%d")
     print(f"\nDate: {today}")
     
-    # Filter transactions for today only
-    today_transactions = {
-        order_id: trans for order_id, trans in transactions.items() 
-        if trans.get('timestamp', '').startswith(today)
-    }
+    # Today's totals are kept up to date at checkout
+    reports = ReportService()
+    report_data = reports.daily_report(today)
     
-    if not today_transactions:
+    if not report_data:
         print("\nNo transactions found for today!")
         return
-    # Calculate report data
-    report_data = _calculate_report_data(today_transactions, menu_items)
     
     # Financial summary
     
@@ -187,6 +199,11 @@ def daily_sales_report(transactions, menu_items):
     print(f"{'    - Dine-In:':<47}{dine_in_text:>15}RM{report_data['dine_in']['total']:>14.2f}")
     print(f"{'    - Take Away:':<47}{take_away_text:>15}RM{report_data['take_away']['total']:>14.2f}")
 
+    # Hourly breakdown
+    print("\nBreakdown by Hour:")
+    for hour, data in sorted(report_data['hours'].items()):
+        count_text = format_count(data['count'])
+        print(f"{f'    - {hour}:00':<47}{count_text:>15}RM{data['total']:>14.2f}")
     
     # Top selling items
     if not report_data["top_items"]:
@@ -220,15 +237,15 @@ def daily_sales_report(transactions, menu_items):
     print(header)
     print("-" * 80)
     
-    transactions_list = list(today_transactions.items())  # Convert to list for indexing
+    transactions_list = report_data['orders']  # [order_id, payment_method, type, total] rows
     # Data rows (using same fixed widths)
-    for i, (order_id, trans) in enumerate(transactions_list, 1):
+    for i, (order_id, payment_method, order_type, total) in enumerate(transactions_list, 1):
         row = (
             f"[{i}]:".ljust(8) + " " +
-            order_id.ljust(16) + " " +  # Use the dictionary key as order_id
-            trans['payment_method'].title().ljust(20) + " " +
-            trans['type'].replace('-', ' ').title().ljust(17) + " " +
-            f"${trans['total']:>14.2f}"
+            order_id.ljust(16) + " " +
+            payment_method.title().ljust(20) + " " +
+            order_type.replace('-', ' ').title().ljust(17) + " " +
+            f"${total:>14.2f}"
         )
         print(row)
     
@@ -242,80 +259,12 @@ def daily_sales_report(transactions, menu_items):
             idx = int(choice) - 1
             if 0 <= idx < len(transactions_list):
                 order_id = transactions_list[idx][0]
-                receipt_file = f"receipts/receipt_{order_id}.txt"
-                try:
-                    with open(receipt_file, "r") as f:
-                        print(f.read())
-                        
-                except FileNotFoundError:
+                receipt_text = reports.receipt(order_id, today)
+                if receipt_text is not None:
+                    print(receipt_text)
+                else:
                     print(f"\nReceipt for order {order_id} not found!")
             else:
                 print("Invalid order number!")
         except ValueError:
             print("Please enter a valid number or 'done'")
-
-    
-
-# ==============================================
-# HELPER FUNCTIONS
-# =============================================
- 
-def _calculate_report_data(transactions, d):
-    """Calculate all data needed for the sales report."""
-    # Payment breakdown
-    payment_types = {
-        'cash': {'total': 0, 'count': 0},
-        'card': {'total': 0, 'count': 0},
-        'touch n go': {'total': 0, 'count': 0}
-    }
-    
-    # Initialize other metrics
-    total_sales = 0
-    total_discounts = 0
-    item_sales = {}
-    dine_in_count = 0
-    dine_in_total = 0
-    take_away_count = 0
-    take_away_total = 0
-
-    for order_id, transaction in transactions.items():
-        # Update totals
-        total_sales += transaction['total']
-        total_discounts += (transaction.get('subtotal', transaction['total']) - transaction['total'])
-        
-        # Update payment types
-        payment_method = transaction.get('payment_method')
-        if payment_method in payment_types:
-            payment_types[payment_method]['total'] += transaction['total']
-            payment_types[payment_method]['count'] += 1
-        
-        # Update item sales
-        for item in transaction.get('items', []):
-            item_code = item[0]
-            qty = item[1]
-            item_sales[item_code] = item_sales.get(item_code, 0) + qty
-        
-        # Update order type counts
-        if transaction.get('type') == 'Dine-In':
-            dine_in_count += 1
-            dine_in_total += transaction['total']
-        elif transaction.get('type') == 'Take Away':
-            take_away_count += 1
-            take_away_total += transaction['total']
-    
-    return {
-        'total_sales': total_sales,
-        'total_discounts': total_discounts,
-        'order_count': len(transactions),
-        'payment_types': payment_types,
-        'dine_in': {
-            'count': dine_in_count,
-            'total': dine_in_total
-        },
-        'take_away': {
-            'count': take_away_count,
-            'total': take_away_total
-        },
-        'top_items': sorted(item_sales.items(), key=lambda x: x[1], reverse=True)[:5]
-    }
- 
\ No newline at end of file
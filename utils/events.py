@@ -0,0 +1,239 @@
+"""
+events.py
+Order lifecycle events, pushed to this process and to every other terminal.
+
+    events.publish("status_changed", "D00042", order=order, status="Ready")
+    unsubscribe = events.subscribe(callback, types=("status_changed",))
+
+    feed = events.EventFeed(users={"alice"})
+    for event in feed.wait(timeout=5):
+        ...
+
+Events are appended, one JSON line each, to data/events.jsonl. Subscribers in
+the publishing process are called straight away; other processes follow the
+file with an EventFeed, which only reads the bytes appended since its last
+poll (an os.stat when nothing happened), so a view can redraw the orders that
+changed instead of re-reading the order files.
+
+Every event has "type", "order_id", "system_user" (None for walk-in orders),
+"at" and "pid", plus:
+
+    created           order (the customer's order record)
+    discount_applied  order (the active order after the change), discount
+    discount_removed  order, discount
+    status_changed    order, status
+    checked_out       total, payment_method
+    cancelled         -
+
+The file is a notification channel, not a record: the order files stay the
+source of truth, so an event must not go out before the change it describes
+is on disk. Under group commit (server.py) publishing is deferred:
+begin_deferred() holds events in memory and flush() sends them once the
+batch has been written. Past MAX_BYTES it is rotated to events.jsonl.1, which a feed
+finishes reading before moving on to the new file.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+from utils.locking import file_lock
+
+EVENT_FILE = os.path.join("data", "events.jsonl")
+ROTATED_FILE = EVENT_FILE + ".1"
+EVENT_LOCK = os.path.join("data", "events.lock")
+EVENT_TYPES = ("created", "discount_applied", "discount_removed", "status_changed", "checked_out", "cancelled")
+MAX_BYTES = 4 * 1024 * 1024
+POLL_INTERVAL = 0.2  # Seconds between checks of the event file while waiting
+
+_subscribers = []  # [(callback, types)]
+_deferred = None  # Events waiting for flush() while publishing is deferred
+
+
+# ==============================================
+# PUBLISHING
+# ==============================================
+
+def publish(event_type, order_id, **data):
+    """Record an event and notify this process's subscribers; returns the event."""
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown event type: {event_type}")
+    event = {
+        "type": event_type,
+        "order_id": order_id,
+        "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "pid": os.getpid(),
+        **data
+    }
+    if _deferred is not None:
+        _deferred.append(event)
+    else:
+        _send([event])
+    return event
+
+
+def _send(batch):
+    lines = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in batch)
+    with file_lock(EVENT_LOCK):
+        try:
+            if os.path.getsize(EVENT_FILE) >= MAX_BYTES:
+                os.replace(EVENT_FILE, ROTATED_FILE)
+        except FileNotFoundError:
+            pass
+        with open(EVENT_FILE, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    for event in batch:
+        for callback, types in list(_subscribers):
+            if types is None or event["type"] in types:
+                callback(event)
+
+
+def begin_deferred():
+    """Hold published events in memory until flush() (see _deferred)."""
+    global _deferred
+    if _deferred is None:
+        _deferred = []
+
+
+def end_deferred():
+    global _deferred
+    flush()
+    _deferred = None
+
+
+def has_pending():
+    return bool(_deferred)
+
+
+def flush():
+    """Send the events held since the last flush, in one append."""
+    if _deferred:
+        batch = list(_deferred)
+        _deferred.clear()
+        _send(batch)
+
+
+def discard():
+    """Drop the held events, for a batch whose changes could not be written."""
+    if _deferred:
+        _deferred.clear()
+
+
+def subscribe(callback, types=None):
+    """Call callback(event) for every event this process publishes; returns an unsubscribe function."""
+    entry = (callback, None if types is None else frozenset(types))
+    _subscribers.append(entry)
+    return lambda: _subscribers.remove(entry) if entry in _subscribers else None
+
+
+# ==============================================
+# FOLLOWING
+# ==============================================
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class EventFeed:
+    """Follows the event file from a cursor, optionally filtered.
+
+    A new feed starts at the end of the file (only events from now on)
+    unless it is given the cursor of an earlier feed, as "<inode>-<offset>".
+    """
+
+    def __init__(self, types=None, order_ids=None, users=None, cursor=None):
+        self.types = None if types is None else set(types)
+        self.order_ids = None if order_ids is None else set(order_ids)
+        self.users = None if users is None else set(users)
+        if cursor:
+            inode, offset = cursor.split("-")
+            self.inode, self.offset = int(inode), int(offset)
+        else:
+            self.inode = _inode(EVENT_FILE)
+            self.offset = os.path.getsize(EVENT_FILE) if self.inode is not None else 0
+
+    @property
+    def cursor(self):
+        return f"{self.inode or 0}-{self.offset}"
+
+    def _wanted(self, event):
+        if self.types is not None and event.get("type") not in self.types:
+            return False
+        if self.order_ids is not None and event.get("order_id") not in self.order_ids:
+            return False
+        return self.users is None or event.get("system_user") in self.users
+
+    def _read(self, path, offset):
+        """Complete lines after `offset`; returns (events, new offset)."""
+        events = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written
+                offset += len(line)
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return events, offset
+
+    def poll(self):
+        """Return the wanted events published since the last poll."""
+        try:
+            st = os.stat(EVENT_FILE)
+        except FileNotFoundError:
+            return []
+        events = []
+        if st.st_ino != self.inode:
+            # Rotated: finish the old file first, if it is still there
+            if self.inode is not None and _inode(ROTATED_FILE) == self.inode:
+                events, _ = self._read(ROTATED_FILE, self.offset)
+            self.inode, self.offset = st.st_ino, 0
+        elif st.st_size < self.offset:
+            self.offset = 0  # Truncated by hand
+        if st.st_size > self.offset:
+            new_events, self.offset = self._read(EVENT_FILE, self.offset)
+            events += new_events
+        return [event for event in events if self._wanted(event)]
+
+    def wait(self, timeout=None):
+        """Poll until there are wanted events or `timeout` seconds have passed."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            events = self.poll()
+            if events or (deadline is not None and time.monotonic() >= deadline):
+                return events
+            time.sleep(POLL_INTERVAL)
+
+
+def apply_to_active_orders(current_orders, events):
+    """Bring an active-orders mapping up to date from events; returns the changed order IDs."""
+    changed = []
+    for event in events:
+        order_id = event["order_id"]
+        if event["type"] in ("checked_out", "cancelled"):
+            if current_orders.pop(order_id, None) is not None:
+                changed.append(order_id)
+        elif event["type"] != "created" and "order" in event:
+            current_orders[order_id] = event["order"]
+            changed.append(order_id)
+    return changed
+
+
+def describe(event):
+    """One line for a terminal, e.g. "12:30:05 D00042 status: Ready"."""
+    details = {
+        "created": "order placed",
+        "discount_applied": f"discount applied: {event.get('discount', {}).get('description', '')}",
+        "discount_removed": f"discount removed: {event.get('discount', {}).get('description', '')}",
+        "status_changed": f"status: {event.get('status')}",
+        "checked_out": f"paid RM{event.get('total', 0):.2f} by {event.get('payment_method')}",
+        "cancelled": "cancelled",
+    }
+    return f"{event['at'][11:]} {event['order_id']} {details.get(event['type'], event['type'])}"
@@ -0,0 +1,87 @@
+"""
+file_cache.py
+Process-wide cache of parsed data files.
+
+Entries are keyed by path and revalidated with os.stat (mtime_ns, size and
+inode of the file and of any file it depends on, such as the journal), so an
+unchanged file is never parsed twice. Writers call invalidate() after saving,
+or store() the value they saved when they held the file's lock throughout.
+A writer that appends to a file others depend on, changes already applied to
+their cached values, calls restamp() on the dependents() it found current.
+
+The cached object is shared: callers that change it must save it straight away.
+"""
+
+import os
+
+_entries = {}
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def signature(paths):
+    """(mtime_ns, size, inode) of each path, None for a missing one."""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except FileNotFoundError:
+            parts.append(None)
+    return tuple(parts)
+
+
+def load(path, loader, depends_on=()):
+    """Return the cached result of loader() for `path`, reloading it if any file changed."""
+    depends_on = tuple(depends_on)
+    current = signature((path,) + depends_on)
+    entry = _entries.get(path)
+    if entry is not None and entry[0] == current:
+        _stats["hits"] += 1
+        return entry[1]
+
+    _stats["misses"] += 1
+    value = loader()
+    _entries[path] = (current, value, depends_on)
+    return value
+
+
+def peek(path, depends_on=()):
+    """The cached value for `path` if it is still current, else None (never loads)."""
+    entry = _entries.get(path)
+    if entry is not None and entry[0] == signature((path,) + tuple(depends_on)):
+        return entry[1]
+    return None
+
+
+def store(path, value, depends_on=()):
+    """Cache `value` as the current contents of `path`, for a writer that just saved it."""
+    depends_on = tuple(depends_on)
+    _entries[path] = (signature((path,) + depends_on), value, depends_on)
+
+
+def dependents(path):
+    """Paths of the current entries that depend on `path`."""
+    return [key for key, (sig, _, depends_on) in _entries.items()
+            if path in depends_on and sig == signature((key,) + depends_on)]
+
+
+def restamp(paths):
+    """Take the files as they are now as the signature of these entries' cached values."""
+    for path in paths:
+        entry = _entries.get(path)
+        if entry is not None:
+            store(path, entry[1], entry[2])
+
+
+def invalidate(path=None):
+    """Drop the cached entry for `path`, or every entry when no path is given."""
+    _stats["invalidations"] += 1
+    if path is None:
+        _entries.clear()
+    else:
+        _entries.pop(path, None)
+
+
+def stats():
+    """Return a copy of the hit/miss/invalidation counters."""
+    return dict(_stats, entries=len(_entries))
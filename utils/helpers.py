@@ -5,11 +5,24 @@ import json
 import os
 from datetime import datetime
 
+from utils import file_cache, pricing
+from utils.storage import COLLECTION_FILES, get_storage
+
+# File name -> storage collection, for files kept by the storage engine
+FILE_COLLECTIONS = {file: collection for collection, file in COLLECTION_FILES.items()}
+
+
+def _read_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
 
 def load_file(file):
+    """Load a data file; unchanged files are served from the read cache"""
     try:
-        with open(os.path.join("data", file), "r") as f:
-            return json.load(f)
+        if file in FILE_COLLECTIONS:
+            return get_storage().load(FILE_COLLECTIONS[file])
+        path = os.path.join("data", file)
+        return file_cache.load(path, lambda: _read_json(path))
     except FileNotFoundError:
         print(f"Error: {file} not found.")
         return {}
@@ -20,94 +33,59 @@ def load_file(file):
 def save_to_file (data, file):
     """Save current orders to current_active_orders.txt"""
     try:
-        with open(os.path.join("data", file), "w") as f:
+        if file in FILE_COLLECTIONS:
+            get_storage().replace(FILE_COLLECTIONS[file], data)
+            return
+        path = os.path.join("data", file)
+        with open(path, "w") as f:
             json.dump(data, f, indent=4)
+        file_cache.invalidate(path)
     except IOError as e:
         print(f"Error saving current orders: {e}")
 
-def get_total_ordered_quantity(item_code, current_orders):
-    total = 0
-    for order in current_orders.values():
-        for code, qty in order["items"]:
-            if code == item_code:
-                total += qty
-    return total
+def save_changes(changes, expected=None):
+    """Save a list of (file, key, value) changes in one step; None deletes the key.
+    `expected` makes it a compare-and-swap (see storage.FlatFileStorage.commit)"""
+    try:
+        get_storage().commit([(FILE_COLLECTIONS[file], key, value) for file, key, value in changes], expected)
+    except IOError as e:
+        print(f"Error saving changes: {e}")
 
-def calculate_order_total(order_id, current_orders, menu_items):
-    order = current_orders[order_id]
-    subtotal = 0
-    item_totals = {}
-
-    for item_code, qty in order["items"]:
-        price = menu_items[item_code]['price']
-        item_total = price * qty
-        item_totals[item_code] = item_total
-        subtotal += item_total
-
-    total = subtotal
-    discount_details = []
-
-    for discount in order.get("discounts", []):
-        if discount["apply_to"] == "specific_item":
-            item_code = discount["item_code"]
-            if item_code in item_totals:
-                item_total = item_totals[item_code]
-                remaining_value = item_total - sum(
-                    d['amount'] for d in discount_details
-                    if d.get('item_code') == item_code
-                )
-
-                if discount["type"] == "percentage":
-                    discount_amount = min(item_total * discount["value"] / 100, remaining_value)
-                else:
-                    discount_amount = min(discount["value"], remaining_value)
-
-                if discount_amount > 0:
-                    total -= discount_amount
-                    discount_details.append({
-                        'description': discount['description'],
-                        'amount': discount_amount,
-                        'item_code': item_code
-                    })
-
-        elif discount["apply_to"] in ["food", "beverage"]:
-            applicable_total = sum(
-                item_totals[code] for code in item_totals
-                if menu_items[code]['category'] == discount["apply_to"]
-            )
+def save_record(data, file, key):
+    """Save only the record `key` of `data`, or its removal if it is gone"""
+    if file not in FILE_COLLECTIONS:
+        save_to_file(data, file)
+        return
+    save_changes([(file, key, data.get(key))])
 
-            if discount["type"] == "percentage":
-                discount_amount = applicable_total * discount["value"] / 100
-            else:
-                discount_amount = discount["value"]
-
-            discount_amount = min(discount_amount, total)
-            if discount_amount > 0:
-                total -= discount_amount
-                discount_details.append({
-                    'description': discount['description'],
-                    'amount': discount_amount
-                })
-
-        else:
-            if discount["type"] == "percentage":
-                discount_amount = subtotal * discount["value"] / 100
-            else:
-                discount_amount = discount["value"]
-
-            discount_amount = min(discount_amount, total)
-            if discount_amount > 0:
-                total -= discount_amount
-                discount_details.append({
-                    'description': discount['description'],
-                    'amount': discount_amount
-                })
+def cache_stats():
+    """Hit/miss counters of the load_file read cache"""
+    return file_cache.stats()
 
+def calculate_order_total(order_id, current_orders, menu_items):
+    """Price breakdown of an order, memoized by the pricing engine"""
+    return pricing.price_order(order_id, current_orders[order_id], menu_items)
+
+def receipt_record(order, calc, timestamp, menu_items):
+    """Structured receipt (as kept in receipt.json) for a checked-out order"""
     return {
-        'subtotal': subtotal,
-        'total': total,
-        'discount_details': discount_details,
-        'item_totals': item_totals
+        "status": "Completed",
+        "type": order["type"],
+        "timestamp": timestamp,
+        "table_number": order.get("table_number"),
+        "remarks": order.get("remarks", ""),
+        "system_user": order["system_user"],
+        "items": [
+            {
+                "name": menu_items[code]["name"],
+                "code": code,
+                "quantity": qty,
+                "price_each": menu_items[code]["price"],
+                "subtotal": menu_items[code]["price"] * qty
+            }
+            for code, qty in order["items"]
+        ],
+        "total": calc["total"]
     }
 
 def generate_receipt_lines(order_id, order, payment_method, menu_items):
@@ -196,30 +174,3 @@ def generate_receipt_lines(order_id, order, payment_method, menu_items):
     lines.append("=" * TOTAL_WIDTH)
     
     return lines
-
-def generate_receipt(order_id, order, payment_method, menu_items):
-    """Generate and save a formatted receipt"""
-    try:
-        # Ensure receipts directory exists
-        os.makedirs("receipts", exist_ok=True)
-        
-        # Generate receipt content
-        receipt_lines = generate_receipt_lines(order_id, order, payment_method, menu_items)
-        receipt_text = "\n".join(receipt_lines)
-        
-        # Print to console
-        print(f"\n{receipt_text}")
-        
-        # Save to file
-        filename = f"receipt_{order_id}.txt"
-        filepath = os.path.join("receipts", filename)
-        
-        with open(filepath, "w") as f:
-            f.write(receipt_text)
-            
-        print(f"Receipt saved to {filepath}")
-        return filepath
-        
-    except Exception as e:
-        print(f"Error generating receipt: {e}")
-        return None
\ No newline at end of file
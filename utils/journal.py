@@ -0,0 +1,250 @@
+"""
+journal.py
+Append-only change journal for the order and transaction files.
+
+Every mutation is written as a single JSON line holding one or more operations,
+so a checkout (record the transaction + drop the active order) is committed by
+one write. A line that was only half written when the process died is ignored
+on replay, which keeps the files consistent. Once the journal grows past
+COMPACT_BYTES it is folded into the JSON snapshots and truncated.
+Transactions are folded into their day partitions instead (see partitions.py).
+
+Appending and compacting hold data/journal.lock exclusively; reading a
+snapshot together with the journal holds it shared, so a reader never sees a
+snapshot from before a compaction with the journal from after it.
+"""
+
+import json
+import os
+from contextlib import ExitStack
+
+from utils import file_cache, partitions
+from utils.locking import file_lock
+
+DATA_DIR = "data"
+JOURNAL_FILE = "journal.log"
+JOURNAL_LOCK = "journal.lock"
+JOURNALED_FILES = ("current_active_orders.txt", "transactions.txt")
+COMPACT_BYTES = 256 * 1024
+
+# Group commit: while it is on and this process holds the journal lock (hold()),
+# appended operations wait in memory and flush() writes all of them as one
+# entry with a single fsync, then lets the lock go. Readers in this process
+# already see them; other processes wait for the lock, so none of them can
+# check a version against the file while newer operations are still in memory.
+_group = None
+_hold = None  # ExitStack holding the journal lock from hold() until flush()
+
+# Files whose journaled operations are folded by a function instead of a snapshot
+FOLDERS = {
+    "transactions.txt": partitions.apply_ops,
+}
+
+
+# ==============================================
+# READING
+# ==============================================
+
+def journal_path():
+    return os.path.join(DATA_DIR, JOURNAL_FILE)
+
+
+def lock(shared=False):
+    """The journal's file lock (exclusive for writers, shared for readers)."""
+    return file_lock(os.path.join(DATA_DIR, JOURNAL_LOCK), shared)
+
+
+def read_entries():
+    """Return every complete journal entry, skipping a torn last line."""
+    entries = []
+    try:
+        with open(journal_path(), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Interrupted write, never committed
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+    except FileNotFoundError:
+        pass
+    if _group:
+        entries.append({"ops": list(_group)})
+    return entries
+
+
+def apply_ops(data, ops, file):
+    """Apply the operations that target `file` to `data` in order."""
+    for op in ops:
+        if op["file"] != file:
+            continue
+        if op["op"] == "set":
+            data[op["key"]] = op["value"]
+        elif op["op"] == "delete":
+            data.pop(op["key"], None)
+        elif op["op"] == "replace":
+            data.clear()
+            data.update(op["value"])
+    return data
+
+
+def read_snapshot(file):
+    with open(os.path.join(DATA_DIR, file), "r") as f:
+        return json.load(f)
+
+
+def load(file, data=None):
+    """Load the snapshot of `file` (or use `data`) and replay the journal on top of it."""
+    with lock(shared=True):
+        data = read_snapshot(file) if data is None else data
+        for entry in read_entries():
+            apply_ops(data, entry["ops"], file)
+    return data
+
+
+def pending_ops(file):
+    """Journaled operations for `file` that have not been compacted yet."""
+    return [op for entry in read_entries() for op in entry["ops"] if op["file"] == file]
+
+
+# ==============================================
+# WRITING
+# ==============================================
+
+def _to_op(file, key, value):
+    if value is None:
+        return {"file": file, "op": "delete", "key": key}
+    return {"file": file, "op": "set", "key": key, "value": value}
+
+
+def to_ops(changes):
+    """Journal operations for a list of (file, key, value) changes."""
+    return [_to_op(file, key, value) for file, key, value in changes]
+
+
+def append(changes):
+    """Commit a list of (file, key, value) changes as one journal entry.
+
+    A value of None deletes the key.
+    """
+    _append_ops(to_ops(changes))
+
+
+def replace(file, data):
+    """Commit a full replacement of `file` and fold it into the snapshot."""
+    with lock():
+        _append_ops([{"file": file, "op": "replace", "value": data}])
+        compact()
+
+
+def begin_group_commit():
+    """Hold appended operations in memory until flush() (see _group)."""
+    global _group
+    if _group is None:
+        _group = []
+
+
+def end_group_commit():
+    """Write anything still held and go back to one write per commit."""
+    global _group
+    flush()
+    _group = None
+
+
+def hold():
+    """Take the journal lock until the next flush(), so appended operations can wait in memory.
+
+    Only has an effect while group commit is on. Call it outside any block
+    that already holds the journal lock.
+    """
+    global _hold
+    if _group is not None and _hold is None:
+        stack = ExitStack()
+        stack.enter_context(lock())
+        _hold = stack
+
+
+def has_pending():
+    return bool(_group)
+
+
+def flush():
+    """Write the operations held by group commit as one journal entry and release the lock."""
+    global _hold
+    try:
+        if _group:
+            ops = list(_group)
+            _group.clear()
+            # The cached files were updated with these operations as they were
+            # committed, so they stay current once the operations are on disk
+            cached = file_cache.dependents(journal_path())
+            _write_ops(ops)
+            file_cache.restamp(cached)
+    finally:
+        if _hold is not None:
+            _hold.close()
+            _hold = None
+
+
+def _append_ops(ops):
+    if _group is not None and _hold is not None:
+        _group.extend(ops)
+        return
+    _write_ops(ops)
+
+
+def _write_ops(ops):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = journal_path()
+    with lock():
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ops": ops}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        if os.path.getsize(path) > COMPACT_BYTES:
+            compact()
+
+
+def write_snapshot(file, data):
+    """Atomically replace the snapshot of `file`."""
+    path = os.path.join(DATA_DIR, file)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def compact():
+    """Fold the journal into the snapshots and truncate it.
+
+    Replaying an operation twice gives the same result, so a crash between
+    writing the snapshots and truncating the journal is harmless.
+    """
+    with lock():
+        entries = read_entries()
+        if not entries:
+            return
+
+        for file in JOURNALED_FILES:
+            ops = [op for entry in entries for op in entry["ops"] if op["file"] == file]
+            if not ops:
+                continue
+            if file in FOLDERS:
+                FOLDERS[file](ops)
+                continue
+            try:
+                data = read_snapshot(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = {}
+            for entry in entries:
+                apply_ops(data, entry["ops"], file)
+            write_snapshot(file, data)
+
+        with open(journal_path(), "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        if _group:
+            _group.clear()  # Folded into the snapshots above
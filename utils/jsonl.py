@@ -0,0 +1,232 @@
+"""
+jsonl.py
+JSON Lines record files with streaming readers.
+
+Each line is one record, {"key": ..., "value": {...}}, or a deletion,
+{"key": ..., "deleted": true}. Later lines override earlier ones for the same
+key, so writers only ever append a line. Readers are generators: callers can
+filter as they go and stop early without loading the whole file. Files still
+in the legacy pretty-printed {key: record} layout are read transparently
+(in one piece) until they are converted:
+
+    python -m utils.jsonl convert [file ...]
+"""
+
+import gzip
+import json
+import os
+import sys
+
+DATA_DIR = "data"
+DEFAULT_FILES = ("orders.txt", "receipt.json")
+
+
+def _open(path, mode, compressed=None):
+    if path.endswith(".gz") if compressed is None else compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def encode(key, value):
+    """One JSON line for a record, or for a deletion when value is None."""
+    entry = {"key": key, "deleted": True} if value is None else {"key": key, "value": value}
+    return json.dumps(entry, separators=(",", ":")) + "\n"
+
+
+def is_jsonl(path):
+    """True if the file is in JSON Lines form (an empty file counts)."""
+    try:
+        with _open(path, "r") as f:
+            first = f.readline()
+    except FileNotFoundError:
+        return True
+    if not first.strip():
+        return True
+    try:
+        entry = json.loads(first)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(entry, dict) and "key" in entry
+
+
+# ==============================================
+# READING
+# ==============================================
+
+def iter_entries(path):
+    """Yield (key, record) in file order; record is None for a deletion.
+
+    A torn last line (no newline, invalid JSON) is skipped.
+    """
+    if not is_jsonl(path):
+        with _open(path, "r") as f:
+            yield from json.load(f).items()
+        return
+
+    try:
+        with _open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                yield entry["key"], entry.get("value")
+    except FileNotFoundError:
+        return
+
+
+def iter_offsets(path):
+    """Yield (offset, key, record) for every line of an uncompressed JSON Lines file."""
+    try:
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        entry = None
+                    if isinstance(entry, dict) and "key" in entry:
+                        yield offset, entry["key"], entry.get("value")
+                offset += len(line)
+    except FileNotFoundError:
+        return
+
+
+def read_at(path, offset):
+    """Return (key, record) of the line starting at `offset`, or None if there is none."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            entry = json.loads(f.readline())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(entry, dict) or "key" not in entry:
+        return None
+    return entry["key"], entry.get("value")
+
+
+_offset_maps = {}  # path -> (inode, bytes scanned, {key: offset of its latest line})
+
+
+def latest_offsets(path):
+    """{key: byte offset of its latest line} for the live keys, in the order they were first appended.
+
+    Deleted keys are left out; an update keeps the key's place. The map is
+    kept per file and extended with only the lines appended since the last
+    call, so repeated calls read just the new tail.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _offset_maps.pop(path, None)
+        return {}
+    inode, scanned, offsets = _offset_maps.get(path, (None, 0, None))
+    if inode != st.st_ino or st.st_size < scanned:
+        scanned, offsets = 0, {}  # Rewritten: start over
+    if st.st_size > scanned:
+        with open(path, "rb") as f:
+            f.seek(scanned)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    entry = None
+                if isinstance(entry, dict) and "key" in entry:
+                    if entry.get("value") is None:
+                        offsets.pop(entry["key"], None)
+                    else:
+                        offsets[entry["key"]] = scanned
+                scanned += len(line)
+    _offset_maps[path] = (st.st_ino, scanned, offsets)
+    return offsets
+
+
+def load_records(path):
+    """Return the current {key: record} of a file."""
+    records = {}
+    for key, record in iter_entries(path):
+        if record is None:
+            records.pop(key, None)
+        else:
+            records[key] = record
+    return records
+
+
+# ==============================================
+# WRITING
+# ==============================================
+
+def _ends_with_newline(path):
+    if path.endswith(".gz"):
+        return True
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+    except FileNotFoundError:
+        return True
+
+
+def append(path, changes):
+    """Append (key, record) changes as lines; a record of None deletes the key.
+
+    Returns the byte offset of each new line (uncompressed files only).
+    """
+    if not is_jsonl(path):
+        convert(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    encoded = [encode(key, value) for key, value in changes]
+    lines = "".join(encoded)
+    if not _ends_with_newline(path):
+        lines = "\n" + lines  # Close a torn last line so it cannot swallow this record
+    with _open(path, "a") as f:
+        f.write(lines)
+        f.flush()
+        if path.endswith(".gz"):
+            return []
+        os.fsync(f.fileno())
+        end = f.tell()
+
+    offsets = []
+    offset = end - len(lines.encode("utf-8")) + (lines[0] == "\n")
+    for line in encoded:
+        offsets.append(offset)
+        offset += len(line.encode("utf-8"))
+    return offsets
+
+
+def write(path, records):
+    """Atomically rewrite a file with exactly `records` ({key: record})."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with _open(tmp_path, "w", compressed=path.endswith(".gz")) as f:
+        for key, value in records.items():
+            f.write(encode(key, value))
+    os.replace(tmp_path, path)
+
+
+def convert(path):
+    """Rewrite a legacy {key: record} JSON file as JSON Lines. Returns the record count."""
+    records = load_records(path)
+    write(path, records)
+    return len(records)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["convert"]:
+        files = sys.argv[2:] or [os.path.join(DATA_DIR, name) for name in DEFAULT_FILES]
+        for path in files:
+            if is_jsonl(path):
+                print(f"{path}: already JSON Lines")
+            else:
+                print(f"{path}: {convert(path)} records converted")
+    else:
+        print("Usage: python -m utils.jsonl convert [file ...]")
@@ -0,0 +1,159 @@
+"""
+kitchen.py
+Open demand across the active orders, for batching work in the kitchen.
+
+    table = get_demand()
+    table.demand("B1")       # Cheese burgers still to make, combos included
+    table.batches()          # [(code, name, quantity)], biggest batch first
+
+A DemandTable adds each order's items once, with combos expanded into their
+component items (MENU_DATA "contents"), and keeps per-item totals. Orders
+leave the table when they are checked out or cancelled, or when their status
+moves past COOKING_STATUSES, so a query is a dictionary lookup however many
+orders are open.
+
+The table follows the order events (see events.py): changes made in this
+process arrive through a subscription, changes made by other terminals
+through an EventFeed read on sync(). Orders written to the active orders
+file without an event (by an older terminal, or by hand) are picked up by
+recounting: file_cache hands out a new mapping whenever the file changed
+underneath this process, and get_demand() rebuilds the table when the
+mapping it was counted from is no longer the current one.
+"""
+
+import os
+
+from data.menu_index import get_menu_index
+from utils import events
+from utils.helpers import load_file
+
+COOKING_STATUSES = ("Pending", "Preparing")  # Orders the kitchen still has to make
+
+
+def expand(code, menu=None, quantity=1):
+    """Component items making up `quantity` of a menu item: {code: quantity}."""
+    menu = menu or get_menu_index()
+    item = menu.get(code)
+    if item is None or "contents" not in item:
+        return {code: quantity}
+    components = {}
+    for comp_id, qty in item["contents"].items():
+        for part, part_qty in expand(comp_id, menu, quantity * qty).items():
+            components[part] = components.get(part, 0) + part_qty
+    return components
+
+
+class DemandTable:
+    """Per-item open quantities over a set of orders, kept up to date incrementally."""
+
+    def __init__(self, current_orders=None, menu=None):
+        self.menu = menu or get_menu_index()
+        self._expansions = {}  # menu code -> expand(code), computed once per code
+        self._orders = {}  # order ID -> (its items, {component code: quantity} it contributes)
+        self.components = {}  # component code -> open quantity
+        self.ordered = {}  # menu code as ordered (combos not expanded) -> open quantity
+        self.feed = events.EventFeed()  # Opened first, so nothing published during the count is missed
+        self.rebuild(current_orders)
+        self._unsubscribe = events.subscribe(self.apply)
+
+    def _expansion(self, code):
+        if code not in self._expansions:
+            self._expansions[code] = expand(code, self.menu)
+        return self._expansions[code]
+
+    def _add(self, counts, code, qty):
+        total = counts.get(code, 0) + qty
+        if total:
+            counts[code] = total
+        else:
+            counts.pop(code, None)
+
+    # ---- Maintenance ----
+
+    def add_order(self, order_id, order):
+        """Count an order (replacing what it counted before); ignored once it is past cooking."""
+        self.remove_order(order_id)
+        if order.get("status", "Pending") not in COOKING_STATUSES:
+            return
+        contribution = {}
+        for code, qty in order["items"]:
+            self._add(self.ordered, code, qty)
+            for part, part_qty in self._expansion(code).items():
+                contribution[part] = contribution.get(part, 0) + part_qty * qty
+        for part, qty in contribution.items():
+            self._add(self.components, part, qty)
+        self._orders[order_id] = (order["items"], contribution)
+
+    def remove_order(self, order_id):
+        entry = self._orders.pop(order_id, None)
+        if entry is None:
+            return
+        items, contribution = entry
+        for code, qty in items:
+            self._add(self.ordered, code, -qty)
+        for part, qty in contribution.items():
+            self._add(self.components, part, -qty)
+
+    def apply(self, event):
+        """Update the table from one order event."""
+        if event["type"] in ("checked_out", "cancelled"):
+            self.remove_order(event["order_id"])
+        elif event["type"] != "created" and "order" in event:
+            self.add_order(event["order_id"], event["order"])
+
+    def sync(self):
+        """Apply the events other terminals have published since the last sync."""
+        for event in self.feed.poll():
+            if event["pid"] != os.getpid():
+                self.apply(event)
+
+    def rebuild(self, current_orders=None):
+        """Recount from scratch (from the active orders file by default)."""
+        if current_orders is None:
+            current_orders = load_file('current_active_orders.txt')
+        self.source = current_orders
+        self._orders.clear()
+        self.components.clear()
+        self.ordered.clear()
+        for order_id, order in current_orders.items():
+            self.add_order(order_id, order)
+
+    def close(self):
+        self._unsubscribe()
+
+    # ---- Queries ----
+
+    def demand(self, code):
+        """Open quantity of a component item, including those inside combos."""
+        return self.components.get(code, 0)
+
+    def ordered_quantity(self, code):
+        """Open quantity of a menu item as ordered (a combo counts as the combo)."""
+        return self.ordered.get(code, 0)
+
+    def open_orders(self):
+        return len(self._orders)
+
+    def batches(self):
+        """[(code, name, quantity)] for everything still to make, biggest batch first."""
+        names = self.menu.items
+        return sorted(
+            ((code, names[code]["name"] if code in names else code, qty) for code, qty in self.components.items()),
+            key=lambda batch: (-batch[2], batch[0])
+        )
+
+
+_table = None
+
+
+def get_demand():
+    """The process-wide DemandTable, synced with other terminals' changes."""
+    global _table
+    if _table is None:
+        _table = DemandTable()
+        return _table
+    _table.sync()
+    current_orders = load_file('current_active_orders.txt')
+    if current_orders is not _table.source:
+        _table.rebuild(current_orders)  # Changed outside the event feed too
+    return _table
@@ -0,0 +1,117 @@
+"""
+locking.py
+Advisory file locks shared by every process using the data/ directory.
+
+    with file_lock("data/sequences.lock"):
+        ...  # only one process at a time gets here
+
+    with file_lock("data/journal.lock", shared=True):
+        ...  # any number of readers, but no writer
+
+fcntl.flock is used on POSIX systems and msvcrt.locking on Windows (where
+every lock is exclusive). Locks are re-entrant within a process: a nested
+file_lock on a path this process already holds does not block.
+
+Each lock also keeps contention metrics for this process (see stats()): how
+often it was taken, how often it was already held elsewhere, the time spent
+waiting, and the version conflicts noted against it by optimistic writers.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_held = {}  # path -> nesting depth, for locks this process holds
+_stats = {}
+
+
+def _counters(path):
+    directory, name = os.path.split(path)
+    name = f"{os.path.basename(directory)}/{name}" if directory else name
+    if name not in _stats:
+        _stats[name] = {"acquired": 0, "shared": 0, "contended": 0, "wait": 0.0, "max_wait": 0.0, "conflicts": 0}
+    return _stats[name]
+
+
+def _acquire(f, shared):
+    """Take the lock; returns True if it had to wait for another process."""
+    if fcntl is not None:
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(f.fileno(), mode | fcntl.LOCK_NB)
+            return False
+        except BlockingIOError:
+            fcntl.flock(f.fileno(), mode)
+            return True
+    f.seek(0)
+    try:
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return False
+    except OSError:
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        return True
+
+
+def _release(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold a lock on `path` (created if needed) for the with-block; exclusive unless shared."""
+    if path in _held:
+        _held[path] += 1
+        try:
+            yield
+        finally:
+            _held[path] -= 1
+        return
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    counters = _counters(path)
+    with open(path, "a+b") as f:
+        started = time.perf_counter()
+        if _acquire(f, shared):
+            waited = time.perf_counter() - started
+            counters["contended"] += 1
+            counters["wait"] += waited
+            counters["max_wait"] = max(counters["max_wait"], waited)
+        counters["acquired"] += 1
+        counters["shared"] += shared
+        _held[path] = 1
+        try:
+            yield
+        finally:
+            del _held[path]
+            _release(f)
+
+
+def note_conflict(path):
+    """Count a failed compare-and-swap against the lock guarding it."""
+    _counters(path)["conflicts"] += 1
+
+
+def stats():
+    """Contention metrics of this process: {"<directory>/<lock file>": counters}."""
+    return {name: dict(counters) for name, counters in _stats.items()}
+
+
+def merge_stats(all_stats):
+    """Add up stats() from several processes."""
+    merged = {}
+    for process_stats in all_stats:
+        for name, counters in process_stats.items():
+            total = merged.setdefault(name, dict.fromkeys(counters, 0))
+            for field, value in counters.items():
+                total[field] = max(total[field], value) if field == "max_wait" else total[field] + value
+    return merged
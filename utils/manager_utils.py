@@ -1,19 +1,38 @@
-import os
+from datetime import datetime
+from itertools import islice
 
-def load_lines_from_file(filename, default=[]):
-    filepath = os.path.join("data", filename)
-    if not os.path.exists(filepath):
-        return default
-    with open(filepath, "r", encoding="utf-8") as file:
-        return [line.strip() for line in file.readlines() if line.strip()]
+from data.menu_index import get_menu_index
+from utils import reviews, stock
+from utils.accounts import AccountExists, create_account, delete_account, list_accounts
+from utils.services import ReportService
+from utils.storage import get_storage
+
+PAGE_SIZE = 10
+
+def page_through(rows, show, page_size=PAGE_SIZE, header=None):
+    """Print rows from an iterable a page at a time; only one page is held in memory."""
+    rows = iter(rows)
+    page = list(islice(rows, page_size))
+    if not page:
+        print("Nothing to show.")
+        return
+    while page:
+        if header:
+            print(header)
+        for row in page:
+            show(row)
+        page = list(islice(rows, page_size))
+        if page and input("\nEnter 'n' for the next page or press Enter to finish: ").strip().lower() != 'n':
+            return
 
 def manage_user_accounts():
     while True:
-        users = load_lines_from_file("users.txt", default=[])
+        accounts = list_accounts()
+        users = list(accounts.items())
         print("\n--- User Accounts ---")
         if users:
-            for i, user in enumerate(users, 1):
-                print(f"{i}. {user}")
+            for i, (username, account) in enumerate(users, 1):
+                print(f"{i}. {username} ({account['role']})")
         else:
             print("No users found.")
 
@@ -26,19 +45,27 @@ def manage_user_accounts():
 
         if choice == "1":
             new_user = input("Enter new user info (e.g. username,password,role): ").strip()
-            if new_user:
-                users.append(new_user)
-                save_lines_to_file("users.txt", users)
-                print("User added successfully.")
+            parts = [part.strip() for part in new_user.split(",")]
+            if len(parts) != 3 or not all(parts):
+                print("User info must be in the form username,password,role.")
+            elif any(":" in part for part in parts):
+                print("User info cannot contain ':'.")
+            elif parts[0] in accounts:
+                print("Username already exists.")
             else:
-                print("User info cannot be empty.")
+                username, password, role = parts
+                try:
+                    create_account(username, password, role)
+                    print("User added successfully.")
+                except AccountExists as e:
+                    print(e)
 
         elif choice == "2":
             try:
                 index = int(input("Enter the number of the user to delete: "))
                 if 1 <= index <= len(users):
-                    removed = users.pop(index - 1)
-                    save_lines_to_file("users.txt", users)
+                    removed = users[index - 1][0]
+                    delete_account(removed)
                     print(f"User '{removed}' deleted.")
                 else:
                     print("Invalid user number.")
@@ -51,32 +78,169 @@ def manage_user_accounts():
         else:
             print("Invalid choice. Try again.")
 
-def save_lines_to_file(filename, lines):
-    filepath = os.path.join("data", filename)
-    with open(filepath, "w", encoding="utf-8") as file:
-        for line in lines:
-            file.write(line.strip() + "\n")
-            
 def view_orders():
-    orders = load_lines_from_file("orders.txt", default=[])
     print("\n--- Orders ---")
-    for order in orders:
-        print(order)
-        
+    since = _ask_date("Jump to date (YYYY-MM-DD, blank for the beginning): ") or ""
+    orders = (
+        (order_id, order) for order_id, order in get_storage().iter_since("orders", since)
+        if order is not None
+    )
+
+    def show(row):
+        order_id, order = row
+        items = ", ".join(f"{code} x{qty}" for code, qty in order.get('items', []))
+        print(f"{order_id:<8} {order.get('timestamp', ''):<20} {order.get('display_name', ''):<15} "
+              f"{order.get('type', ''):<10} {order.get('status', ''):<10} {items}")
+
+    page_through(orders, show, header=f"\n{'Order':<8} {'Time':<20} {'Customer':<15} {'Type':<10} {'Status':<10} Items")
+
+def _ask_date(prompt):
+    while True:
+        value = input(prompt).strip()
+        if not value:
+            return None
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+            return value
+        except ValueError:
+            print("Please use the format YYYY-MM-DD.")
+
 def track_finances():
-    finances = load_lines_from_file("finances.txt", default=[])
     print("\n--- Finances ---")
-    for line in finances:
-        print(line)
+    print("Filter transactions (leave blank for any).")
+    start = _ask_date("Start date (YYYY-MM-DD): ")
+    end = _ask_date("End date (YYYY-MM-DD): ")
+    payment_method = input("Payment method (Cash/Card/Touch 'N Go): ").strip() or None
+    order_type = input("Order type (Dine-In/Takeaway): ").strip() or None
+    item_code = input("Item code: ").strip().upper() or None
 
-def manage_inventory():
-    inventory = load_lines_from_file("menu_data.py", default=[])
+    filters = dict(start=start, end=end, payment_method=payment_method,
+                   order_type=order_type, item_code=item_code)
+    summary = ReportService().finances(**filters)
+    if not summary["count"]:
+        print("No matching transactions.")
+        return
+
+    print(f"\nTransactions: {summary['count']}")
+    print(f"Total Sales: RM{summary['total_sales']:.2f}")
+    print(f"Total Discounts: RM{summary['total_discounts']:.2f}")
+    if item_code:
+        print(f"{item_code} Sold: {summary['item_quantity']}")
+    for title, key in (("Payment Method", "payment_methods"), ("Order Type", "order_types")):
+        print(f"\nBy {title}:")
+        for name, bucket in summary[key].items():
+            print(f"  {name:<15} {bucket['count']:>5} orders  RM{bucket['total']:>10.2f}")
+
+    def show(row):
+        order_id, t = row
+        print(f"{order_id:<8} {t.get('timestamp', ''):<20} {t.get('payment_method', ''):<13} "
+              f"{t.get('type', ''):<10} {t['total']:>10.2f}")
+
+    page_through(ReportService().transactions(**filters), show,
+                 header=f"\n{'Order':<8} {'Time':<20} {'Payment':<13} {'Type':<10} {'Total':>10}")
+
+def show_menu_items():
     print("\n--- Inventory (Menu Items) ---")
-    for item in inventory:
-        print(item)
-        
+    menu = get_menu_index()
+    short = stock.unavailable()
+    items = (item for _, entries in menu.by_category.items() for _, item in entries)
+
+    def show(item):
+        availability = "Out of stock" if item['id'] in short else item['availability']
+        print(f"{item['id']:<6} {item['name']:<25} {item['category']:<12} "
+              f"RM{item['price']:>7.2f}  {availability}")
+
+    page_through(items, show, header=f"\n{'Code':<6} {'Name':<25} {'Category':<12} {'Price':>9}  Availability")
+
+def show_stock_levels():
+    levels = stock.load_stock()
+    print("\n--- Stock Levels ---")
+    for ingredient in stock.ingredients():
+        qty = levels.get(ingredient)
+        print(f"{stock.label(ingredient):<30} {'not tracked' if qty is None else f'{qty:g}':>12}")
+    short = stock.unavailable(levels)
+    if short:
+        print("\nItems that cannot be made:")
+        for code, missing in sorted(short.items()):
+            print(f"  {code:<6} {get_menu_index().items[code]['name']:<25} "
+                  f"short of {', '.join(map(stock.label, missing))}")
+
+def set_stock_level():
+    ingredient = stock.resolve(input("Ingredient name, or side/drink code: ").strip())
+    if ingredient is None:
+        print("No menu item uses that ingredient.")
+        return
+    qty = input("Quantity on hand (blank to stop tracking): ").strip()
+    if not qty:
+        stock.set_level(ingredient, None)
+        print(f"{stock.label(ingredient)} is no longer tracked.")
+        return
+    try:
+        qty = float(qty)
+    except ValueError:
+        print("Please enter a valid number.")
+        return
+    if qty < 0:
+        print("Quantity cannot be negative.")
+        return
+    stock.set_level(ingredient, qty)
+    print(f"{stock.label(ingredient)} set to {qty:g}.")
+
+def manage_inventory():
+    while True:
+        print("\n--- Inventory ---")
+        print("1. View Menu Items")
+        print("2. View Stock Levels")
+        print("3. Set Stock Level")
+        print("4. Back")
+
+        choice = input("Choose an option (1-4): ").strip()
+
+        if choice == "1":
+            show_menu_items()
+        elif choice == "2":
+            show_stock_levels()
+        elif choice == "3":
+            set_stock_level()
+        elif choice == "4":
+            break
+        else:
+            print("Invalid option.")
+
 def view_customer_feedback():
-    feedback = load_lines_from_file("review.txt", default=[])
-    print("\n--- Customer Feedback ---")
-    for review in feedback:
-        print(review)
\ No newline at end of file
+    print("\n--- Top-Rated Dishes ---")
+    top = reviews.top_rated(5)
+    if not top:
+        print("No reviews yet.")
+        return
+    for rank, (code, mean, count) in enumerate(top, 1):
+        print(f"{rank}. {reviews.dish_name(code)} ({code}) - {mean:.1f}/5 from {count} review(s)")
+
+    def show(row):
+        _, review = row
+        print(f"- [{review.get('timestamp', '')}] {review['user']} on {review.get('dish_name', review['dish'])}: "
+              f"{review['comment']} ({review['rating']}/5)")
+
+    while True:
+        dish = input("\nEnter a dish code or name to read its reviews, 'all' for every review, or 'done' to exit: ").strip()
+        if dish.lower() == 'done':
+            break
+        if dish.lower() == 'all':
+            since = _ask_date("Jump to date (YYYY-MM-DD, blank for the beginning): ") or ""
+            page_through(
+                ((review_id, review) for review_id, review in get_storage().iter_since("reviews", since)
+                 if review is not None),
+                show
+            )
+            continue
+        code = reviews.resolve_dish(dish)
+        rating = reviews.dish_rating(code) if code else None
+        if rating is None:
+            print("No reviews for that dish.")
+            continue
+        print(f"\n--- {reviews.dish_name(code)}: {rating['mean']:.1f}/5 from {rating['count']} review(s) ---")
+        widest = max(rating['histogram'].values()) or 1
+        for stars in reversed(reviews.RATINGS):
+            n = rating['histogram'].get(stars, 0)
+            print(f"{stars}* {'#' * round(20 * n / widest):<20} {n}")
+        page_through(reviews.reviews_for_dish(code).items(), show)
@@ -0,0 +1,46 @@
+"""
+order_ids.py
+Order ID allocation.
+
+Order numbers come from the storage engine's "order_id" sequence. Each
+process reserves a block of BLOCK_SIZE numbers at a time and hands them out
+from memory, so most checkouts never touch the disk for an ID and two kiosks
+can never receive the same one. Numbers left in a block when a process exits
+are skipped: IDs are unique and increasing per process, not gap-free.
+"""
+
+import re
+
+from utils.storage import get_storage
+
+SEQUENCE = "order_id"
+PREFIX = "D"
+BLOCK_SIZE = 10
+
+_block = {"next": 0, "end": 0}
+
+
+def _last_used_number():
+    """Highest D-number already used anywhere (read once, when the sequence is created)."""
+    storage = get_storage()
+    highest = 0
+    for collection in ("orders", "active_orders", "transactions"):
+        for order_id, _ in storage.iter_records(collection):
+            match = re.fullmatch(rf"{PREFIX}(\d+)", order_id)
+            if match:
+                highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def format_order_id(number):
+    return PREFIX + str(number).zfill(2)
+
+
+def next_order_id():
+    """Return a new, never used order ID."""
+    if _block["next"] >= _block["end"]:
+        first = get_storage().reserve_sequence(SEQUENCE, BLOCK_SIZE, seed=_last_used_number)
+        _block["next"], _block["end"] = first, first + BLOCK_SIZE
+    number = _block["next"]
+    _block["next"] += 1
+    return format_order_id(number)
@@ -2,71 +2,41 @@
 # adding items, applying and removing discounts or promo codes, processing checkouts, and
 # handling active orders. It provides functions for order item management, discount logic,
 # order status updates, and transaction processing in a point-of-sale system.
+# The work itself is done by utils.services.OrderService; these functions are the
+# cashier's terminal screens around it.
 
-from utils.helpers import calculate_order_total, generate_receipt, load_file, save_to_file
+import os
+
+from utils import events
+from utils.helpers import load_file
 from utils.display import view_order_details, show_promo_codes
-from datetime import datetime
+from utils.services import ORDER_STATUSES, PAYMENT_METHODS, OrderService, ServiceError
 
 
 def apply_discount_to_entire_order(order_id, current_orders, menu_items, discount_type):
-    # Calculate order total and existing discounts
-    calc = calculate_order_total(order_id, current_orders, menu_items)
-    order_total = calc['total']
-    existing_discounts = current_orders[order_id].get("discounts", [])
-    remaining_value = order_total - sum(d.get('amount', 0) for d in existing_discounts)
-    if discount_type == '1':  # Percentage discount
-        try:
+    service = OrderService(current_orders, menu_items)
+    try:
+        if discount_type == '1':  # Percentage discount
             percentage = float(input("Enter discount percentage for entire order (0-100): "))
-            if percentage <= 0 or percentage > 100:
-                print("Percentage must be between 0-100.")
-                return
-    
-            discount_amount = round(min(order_total * percentage / 100, remaining_value), 2)
-            if discount_amount <= 0:
-                print(f"Cannot apply discount - order already fully discounted (remaining value: RM{remaining_value:.2f})")
-                return
-
-            current_orders[order_id].setdefault("discounts", []).append({
-                "type": "percentage",
-                "value": percentage,
-                "description": f"{percentage}% off entire order",
-                "apply_to": "total",
-                "amount": discount_amount
-            })
-            save_to_file(current_orders, "current_active_orders.txt")  # Save after applying discount
-            print(f"Applied {percentage}% discount to entire order (-RM{discount_amount:.2f})")
-
-        except ValueError:
-            print("Please enter a valid number.")
-
-    else:  # Fixed amount discount
-        try:
+            discount = service.add_discount(order_id, "percentage", percentage)
+            print(f"Applied {percentage}% discount to entire order (-RM{discount['amount']:.2f})")
+        else:  # Fixed amount discount
+            remaining_value = service.remaining_value(order_id)
             amount = float(input(f"Enter fixed discount amount for entire order (max RM{remaining_value:.2f}): "))
-            if amount <= 0:
-                print("Amount must be positive.")
-                return
-            if amount > remaining_value:
-                print(f"Discount cannot exceed remaining order value (RM{remaining_value:.2f})")
-                return
-
-            current_orders[order_id].setdefault("discounts", []).append({
-                "type": "fixed",
-                "value": amount,
-                "description": f"RM{amount:.2f} off entire order",
-                "apply_to": "total",
-                "amount": amount
-            })
-            save_to_file(current_orders, "current_active_orders.txt")  # Save after applying discount
+            service.add_discount(order_id, "fixed", amount)
             print(f"Applied RM{amount:.2f} discount to entire order")
+    except ServiceError as e:
+        print(e)
+        return
+    except ValueError:
+        print("Please enter a valid number.")
+        return
 
-        except ValueError:
-            print("Please enter a valid number.")
-
-    calculate_order_total(order_id, current_orders, menu_items)
     view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
 
 def apply_discount_to_specific_item(order_id, current_orders, menu_items, discount_type):
     """Apply discount to a specific menu item"""
+    service = OrderService(current_orders, menu_items)
     print("=" * 80)
     print(f"{'Current Order Items':^{80}}")
     print("=" * 80)
@@ -78,141 +48,43 @@ def apply_discount_to_specific_item(order_id, current_orders, menu_items, discou
 
     try:
         item_idx = int(input("Enter item number to discount: ")) - 1
-        if 0 <= item_idx < len(current_orders[order_id]["items"]):
-            item_code = current_orders[order_id]["items"][item_idx][0]
-            item_name = menu_items[item_code]['name']
-            item_price = menu_items[item_code]['price']
-            item_qty = current_orders[order_id]["items"][item_idx][1]
-            item_total = item_price * item_qty
-
-            existing_discounts = [
-                d for d in current_orders[order_id].get("discounts", [])
-                if d.get('item_code') == item_code
-            ]
-            remaining_value = max(0, item_total - sum(d.get('amount', 0) for d in existing_discounts))
-
-            if discount_type == '1':  # Percentage
-                percentage = float(input(f"Enter discount percentage for {item_name} (0-100): "))
-                if percentage <= 0 or percentage > 100:
-                    print("Percentage must be between 0-100.")
-                    return
-
-                discount_amount = round(min(item_total * percentage / 100, remaining_value), 2)
-                if discount_amount <= 0:
-                    print(
-                        f"Cannot apply discount - item already fully discounted (remaining value: RM{remaining_value:.2f})")
-                    return
-
-                current_orders[order_id].setdefault("discounts", []).append({
-                    "type": "percentage",
-                    "value": percentage,
-                    "description": f"{percentage}% off on {item_name}",
-                    "apply_to": "specific_item",
-                    "item_code": item_code,
-                    "amount": discount_amount
-                })
-                save_to_file(current_orders, "current_active_orders.txt")  # Save after applying discount
-                print(f"Applied {percentage}% discount to {item_name} (-RM{discount_amount:.2f})")
-
-            else:  # Fixed amount
-                amount = float(input(
-                    f"Enter fixed discount amount for {item_name} (max RM{remaining_value:.2f}): "))
-                if amount <= 0:
-                    print("Amount must be positive.")
-                    return
-
-                if amount > remaining_value:
-                    print(
-                        f"Discount cannot exceed remaining item value (RM{remaining_value:.2f})")
-                    return
-
-                current_orders[order_id].setdefault("discounts", []).append({
-                    "type": "fixed",
-                    "value": amount,
-                    "description": f"RM{amount:.2f} off on {item_name}",
-                    "apply_to": "specific_item",
-                    "item_code": item_code,
-                    "amount": amount
-                })
-                save_to_file(current_orders, "current_active_orders.txt")  
-                print(f"Applied RM{amount:.2f} discount to {item_name}")
-
-            calculate_order_total(order_id, current_orders, menu_items)
-            view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
-        else:
+        if not 0 <= item_idx < len(current_orders[order_id]["items"]):
             print("Invalid item number!")
+            return
+        item_code = current_orders[order_id]["items"][item_idx][0]
+        item_name = menu_items[item_code]['name']
+
+        if discount_type == '1':  # Percentage
+            percentage = float(input(f"Enter discount percentage for {item_name} (0-100): "))
+            discount = service.add_discount(order_id, "percentage", percentage, item_code)
+            print(f"Applied {percentage}% discount to {item_name} (-RM{discount['amount']:.2f})")
+        else:  # Fixed amount
+            remaining_value = service.remaining_value(order_id, item_code)
+            amount = float(input(
+                f"Enter fixed discount amount for {item_name} (max RM{remaining_value:.2f}): "))
+            service.add_discount(order_id, "fixed", amount, item_code)
+            print(f"Applied RM{amount:.2f} discount to {item_name}")
+    except ServiceError as e:
+        print(e)
+        return
     except ValueError:
         print("Please enter valid numbers.")
+        return
+
+    view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
 
 def apply_promo_code(order_id, current_orders, menu_items, promo_codes):
     """Apply a promo code to the order"""
     show_promo_codes(promo_codes)
-    promo_code = input("\nEnter promo code: ").strip().upper()
-    if promo_code in promo_codes:
-        promo = promo_codes[promo_code]
-
-        # Check if promo already applied
-        if any(d.get('promo_code') == promo_code for d in
-               current_orders[order_id].get("discounts", [])):
-            print("This promo code has already been applied.")
-            return
-
-        elif promo['apply_to'] == 'specific_item':
-            item_code = promo.get('item_code')
-            if not item_code or not any(item[0] == item_code for item in current_orders[order_id]["items"]):
-                print(f"No valid item in order for this promo.")
-                return
-            item_total = sum(
-                qty * menu_items[item_code]['price']
-                for code, qty in current_orders[order_id]["items"]
-                if code == item_code
-            )
-            existing_discounts = sum(
-                d['amount'] for d in current_orders[order_id].get("discounts", [])
-                if d.get('item_code') == item_code
-            )
-            remaining_value = item_total - existing_discounts
-
-        elif promo['apply_to'] == 'total':
-            calc = calculate_order_total(order_id, current_orders, menu_items)
-            applicable_total = calc['total']
-            existing_discounts = sum(d['amount'] for d in calc['discount_details'])
-            remaining_value = applicable_total - existing_discounts
-
-        else:
-            print("Invalid promo code application type.")
-            return
-
-        # Calculate the discount amount
-        if promo['type'] == 'percentage':
-            discount_amount = min(remaining_value * promo['value'] / 100, remaining_value)
-        else:
-            discount_amount = min(promo['value'], remaining_value)
-
-        if discount_amount <= 0:
-            print("No value left to discount for this promo.")
-            return
+    promo_code = input("\nEnter promo code: ")
+    try:
+        discount = OrderService(current_orders, menu_items).apply_promo(order_id, promo_code)
+    except ServiceError as e:
+        print(e)
+        return
+    print(f"Applied promo: {discount['description']} (-RM{discount['amount']:.2f})")
 
-        # Apply promo
-        discount_entry = {
-            "type": promo['type'],
-            "value": promo['value'],
-            "amount": discount_amount,
-            "description": promo['description'],
-            "apply_to": promo['apply_to'],
-            "promo_code": promo_code
-        }
-        if promo['apply_to'] == 'specific_item':
-            discount_entry['item_code'] = promo['item_code']
-
-        current_orders[order_id].setdefault("discounts", []).append(discount_entry)
-        save_to_file(current_orders, "current_active_orders.txt")
-        print(f"Applied promo: {promo['description']} (-RM{discount_amount:.2f})")
-
-        calculate_order_total(order_id, current_orders, menu_items)
-        view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
-    else:
-        print("Invalid promo code.")
+    view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
         
 def apply_new_discount(order_id, current_orders, menu_items, promo_codes):
     """Apply a new discount to the order"""
@@ -261,15 +133,12 @@ def remove_existing_discounts(order_id, current_orders, menu_items):
         remove_idx = int(input("Enter discount number to remove (or 0 to cancel): ")) - 1
         if remove_idx == -1:
             return
-        if 0 <= remove_idx < len(current_orders[order_id]["discounts"]):
-            removed = current_orders[order_id]["discounts"].pop(remove_idx)
-            save_to_file(current_orders, "current_orders.txt")  # Save after applying discount
-            print(f"Removed discount: {removed['description']}")
-            
-            calculate_order_total(order_id, current_orders, menu_items)
-            view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
-        else:
-            print("Invalid selection.")
+        removed = OrderService(current_orders, menu_items).remove_discount(order_id, remove_idx)
+        print(f"Removed discount: {removed['description']}")
+
+        view_order_details("Order Details", order_id, current_orders[order_id], menu_items)
+    except ServiceError as e:
+        print(e)
     except ValueError:
         print("Please enter a valid number.")
 
@@ -304,50 +173,48 @@ def manage_discounts(order_id, current_orders, menu_items, promo_codes):
 
 
 def process_checkout(order_id, order, current_orders, menu_items, transactions):
-    calc = calculate_order_total(order_id, current_orders, menu_items)
-
     view_order_details("Order Details", order_id, order, menu_items)
     while True:
         print("\nEnter Payment Method:")
-        print("1. Cash")
-        print("2. Card")
-        print("3. Touch 'N Go")
-        print("4. Cancel")
-
-        payment_method = input("Enter Choice:").strip()
-
-        if payment_method == "1":
-           payment_method =  'Cash'
-           break
-        if payment_method == "2":
-           payment_method =  'Card'
-           break
-        if payment_method == "3":
-           payment_method =  "Touch 'N Go"
-           break
-        if payment_method == "4":
-           print("Transaction cancelled.")
-           return
-        else:
-            print("Invalid payment method.")
-
-    transactions[order_id] = {
-        "type": order["type"],
-        "items": order["items"],
-        "discounts": calc['discount_details'],
-        "total": calc['total'],
-        "payment_method": payment_method,
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    print(f"\nTransaction successful! Order {order_id} processed with {payment_method} payment.")
-    save_to_file(transactions, "transactions.txt")
+        for number, method in enumerate(PAYMENT_METHODS, 1):
+            print(f"{number}. {method}")
+        print(f"{len(PAYMENT_METHODS) + 1}. Cancel")
+
+        choice = input("Enter Choice:").strip()
 
-    generate_receipt(order_id, order, payment_method, menu_items)
-    del current_orders[order_id]
-    save_to_file(current_orders, "current_active_orders.txt")
+        if choice == str(len(PAYMENT_METHODS) + 1):
+            print("Transaction cancelled.")
+            return
+        if choice.isdigit() and 1 <= int(choice) <= len(PAYMENT_METHODS):
+            payment_method = PAYMENT_METHODS[int(choice) - 1]
+            break
+        print("Invalid payment method.")
+
+    try:
+        result = OrderService(current_orders, menu_items).checkout(order_id, payment_method, transactions)
+    except ServiceError as e:
+        print(e)
+        return
+    print(f"\nTransaction successful! Order {order_id} processed with {payment_method} payment.")
+    print(f"\n{result['receipt']}")
+    print(f"Receipt saved to {result['receipt_path']}")
 
     print("\nOrder completed successfully! Refreshing active orders...\n")
-    return
+
+def update_order_status(order_id, current_orders, menu_items):
+    print(f"\nCurrent status: {current_orders[order_id].get('status', 'Preparing')}")
+    for number, status in enumerate(ORDER_STATUSES, 1):
+        print(f"{number}. {status}")
+    choice = input("Select new status: ").strip()
+    if not (choice.isdigit() and 1 <= int(choice) <= len(ORDER_STATUSES)):
+        print("Invalid choice!")
+        return
+    try:
+        OrderService(current_orders, menu_items).set_status(order_id, ORDER_STATUSES[int(choice) - 1])
+    except ServiceError as e:
+        print(e)
+        return
+    print(f"Order {order_id} is now {ORDER_STATUSES[int(choice) - 1]}.")
 
 def handle_order_actions(order_id, order, current_orders, menu_items, transactions):
     while True:
@@ -357,7 +224,8 @@ def handle_order_actions(order_id, order, current_orders, menu_items, transactio
         print("1. Manage Discount")
         print("2. Cancel Order")
         print("3. Checkout")
-        print("4. Back ")
+        print("4. Update Status")
+        print("5. Back ")
         
         action = input("\nEnter Choice: ")
     
@@ -367,22 +235,36 @@ def handle_order_actions(order_id, order, current_orders, menu_items, transactio
         elif action == "2":
             confirm = input(f"Confirm cancel order {order_id}? (y/n): ").lower()
             if confirm == 'y':
-                del current_orders[order_id]
-                save_to_file(current_orders, "current_active_orders.txt")
-
+                try:
+                    OrderService(current_orders, menu_items).cancel(order_id)
+                except ServiceError as e:
+                    print(e)
+                    return
                 print(f"Order {order_id} cancelled.")
                 return
         elif action == "3":
             process_checkout(order_id, order, current_orders, menu_items, transactions)
             return
-            
+
         elif action == "4":
+            update_order_status(order_id, current_orders, menu_items)
+
+        elif action == "5":
             return
         else:
             print("Invalid choice!")
 
 def view_active_orders(current_orders, menu_items, transactions):
+    # Changes made at other terminals arrive as events, so the list is patched
+    # order by order instead of reloading the active orders file
+    feed = events.EventFeed(types=("discount_applied", "discount_removed", "status_changed", "checked_out", "cancelled"))
     while True:
+        updates = [event for event in feed.poll() if event["pid"] != os.getpid()]
+        if updates:
+            events.apply_to_active_orders(current_orders, updates)
+            print("\nUpdates from other terminals:")
+            for event in updates:
+                print(f"  {events.describe(event)}")
 
         if not current_orders:
             print("\nNo active orders.")
@@ -0,0 +1,240 @@
+"""
+partitions.py
+Transactions stored as one partition per business day.
+
+data/transactions/ holds one JSON Lines file per date plus a small manifest
+listing the dates. Reports and range queries open only the partitions they
+need. Partitions older than today are sealed: they are gzip-compressed and
+treated as read-only unless a late change for that day arrives.
+
+Journaled transaction changes (see journal.py) are folded in by apply_ops(),
+which appends one line per change to the open partition.
+The legacy data/transactions.txt is split into partitions the first time the
+manifest is missing.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from utils import file_cache, jsonl
+from utils.locking import file_lock
+
+PARTITION_DIR = os.path.join("data", "transactions")
+MANIFEST_FILE = "manifest.json"
+LEGACY_FILE = os.path.join("data", "transactions.txt")
+MIGRATE_LOCK = os.path.join(PARTITION_DIR, "migrate.lock")
+UNDATED = "undated"
+
+
+# ==============================================
+# MANIFEST
+# ==============================================
+
+def manifest_path():
+    return os.path.join(PARTITION_DIR, MANIFEST_FILE)
+
+
+def load_manifest():
+    """Return {date: {"file", "count", "sealed"}}, migrating the legacy file if needed."""
+    try:
+        with open(manifest_path(), "r") as f:
+            return json.load(f)["partitions"]
+    except FileNotFoundError:
+        return _migrate_legacy()
+
+
+def _save_manifest(partitions):
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    _atomic_write(manifest_path(), json.dumps({"partitions": partitions}, indent=4, sort_keys=True).encode())
+
+
+def _atomic_write(path, payload):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _migrate_legacy():
+    """Split the legacy file into partitions, once, however many terminals get here together.
+
+    Callers may hold the journal lock only shared, so the migration takes its
+    own exclusive lock and looks for a manifest again under it. The manifest
+    is written last, so nobody sees a partial migration.
+    """
+    with file_lock(MIGRATE_LOCK):
+        try:
+            with open(manifest_path(), "r") as f:
+                return json.load(f)["partitions"]  # Another terminal migrated first
+        except FileNotFoundError:
+            pass
+        try:
+            with open(LEGACY_FILE, "r") as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            legacy = {}
+        partitions = {}
+        _write_days(partitions, _group_by_date(legacy.items()))
+        return partitions
+
+
+# ==============================================
+# PARTITIONS
+# ==============================================
+
+def date_of(transaction):
+    return transaction.get("timestamp", "")[:10] or UNDATED
+
+
+def _group_by_date(records):
+    days = {}
+    for order_id, transaction in records:
+        days.setdefault(date_of(transaction), {})[order_id] = transaction
+    return days
+
+
+def _partition_path(entry):
+    return os.path.join(PARTITION_DIR, entry["file"])
+
+
+def iter_partition(date, partitions=None):
+    """Stream (order_id, transaction) entries of one day; a None transaction is a deletion."""
+    partitions = load_manifest() if partitions is None else partitions
+    entry = partitions.get(date)
+    if entry is not None:
+        yield from jsonl.iter_entries(_partition_path(entry))
+
+
+def read_partition(date, partitions=None):
+    """Return the transactions of one day (cached while the file is unchanged)."""
+    partitions = load_manifest() if partitions is None else partitions
+    entry = partitions.get(date)
+    if entry is None:
+        return {}
+    path = _partition_path(entry)
+    return file_cache.load(path, lambda: jsonl.load_records(path))
+
+
+def _write_partition(partitions, date, data, seal=False):
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    old = partitions.get(date)
+    name = f"{date}.jsonl.gz" if seal else f"{date}.jsonl"
+    jsonl.write(os.path.join(PARTITION_DIR, name), data)
+    partitions[date] = {"file": name, "count": len(data), "sealed": seal}
+    file_cache.invalidate(os.path.join(PARTITION_DIR, name))
+    if old and old["file"] != name:
+        try:
+            os.remove(_partition_path(old))
+        except FileNotFoundError:
+            pass
+
+
+def _write_days(partitions, days):
+    for date, data in days.items():
+        _write_partition(partitions, date, data)
+    seal_old_partitions(partitions)
+    _save_manifest(partitions)
+
+
+def seal_old_partitions(partitions, today=None):
+    """Compress every partition older than today; sealed days are not rewritten again."""
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    for date, entry in list(partitions.items()):
+        if not entry["sealed"] and date < today and date != UNDATED:
+            _write_partition(partitions, date, read_partition(date, partitions), seal=True)
+
+
+# ==============================================
+# QUERIES
+# ==============================================
+
+def dates_between(start=None, end=None, partitions=None):
+    partitions = load_manifest() if partitions is None else partitions
+    return sorted(
+        date for date in partitions
+        if (start is None or date >= start) and (end is None or date <= end)
+    )
+
+
+def load_range(start=None, end=None):
+    """Merge the partitions for dates start..end (inclusive, YYYY-MM-DD; None = open)."""
+    partitions = load_manifest()
+    data = {}
+    for date in dates_between(start, end, partitions):
+        data.update(read_partition(date, partitions))
+    return data
+
+
+def load_all():
+    return load_range()
+
+
+# ==============================================
+# JOURNAL FOLDING
+# ==============================================
+
+def _appendable(entry):
+    return entry is None or (not entry["sealed"] and entry["file"].endswith(".jsonl"))
+
+
+def apply_ops(ops):
+    """Fold journaled set/delete/replace operations into the day partitions.
+
+    Changes to an open day are appended as lines; sealed or legacy days and
+    full replacements are rewritten.
+    """
+    partitions = load_manifest()
+    appends = {}  # date -> [(order_id, transaction or None)]
+    days = {}  # date -> full contents to rewrite
+
+    def rewrite(date):
+        if date not in days:
+            days[date] = dict(read_partition(date, partitions))
+            for key, value in appends.pop(date, []):
+                if value is None:
+                    days[date].pop(key, None)
+                else:
+                    days[date][key] = value
+        return days[date]
+
+    def change(date, key, value):
+        if date in days or not _appendable(partitions.get(date)):
+            if value is None:
+                rewrite(date).pop(key, None)
+            else:
+                rewrite(date)[key] = value
+        else:
+            appends.setdefault(date, []).append((key, value))
+
+    def holds(date, key):
+        if date in days:
+            return key in days[date]
+        pending = [value for k, value in appends.get(date, []) if k == key]
+        if pending:
+            return pending[-1] is not None
+        return key in read_partition(date, partitions)
+
+    for op in ops:
+        if op["op"] == "replace":
+            for date in set(partitions) | set(appends):
+                rewrite(date).clear()
+            for date, records in _group_by_date(op["value"].items()).items():
+                rewrite(date).update(records)
+        elif op["op"] == "set":
+            change(date_of(op["value"]), op["key"], op["value"])
+        elif op["op"] == "delete":
+            for date in sorted(set(partitions) | set(days) | set(appends), reverse=True):
+                if holds(date, op["key"]):
+                    change(date, op["key"], None)
+                    break
+
+    for date, changes in appends.items():
+        entry = partitions.setdefault(date, {"file": f"{date}.jsonl", "count": 0, "sealed": False})
+        path = _partition_path(entry)
+        jsonl.append(path, changes)
+        entry["count"] += sum(1 if value is not None else -1 for _, value in changes)
+        file_cache.invalidate(path)
+    _write_days(partitions, days)
@@ -0,0 +1,158 @@
+"""
+pricing.py
+Order pricing engine: subtotal, discounts, tax and total in one place.
+
+Discounts are resolved in a single pass, keeping a running discounted amount
+per item instead of re-summing earlier discounts for every new one. Results
+are memoized per order and reused while the order's items, discounts and the
+menu object are unchanged; invalidate() drops an order that was closed.
+"""
+
+TAX_RATE = 0.06
+
+# order_id -> (fingerprint, menu_items, breakdown)
+_cache = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+# ==============================================
+# CORE CALCULATION
+# ==============================================
+
+def line_totals(items, menu_items):
+    """Return (subtotal, item_totals) for a list of [item_code, qty] pairs."""
+    subtotal = 0
+    item_totals = {}
+    for item_code, qty in items:
+        item_total = menu_items[item_code]['price'] * qty
+        item_totals[item_code] = item_total
+        subtotal += item_total
+    return subtotal, item_totals
+
+
+def resolve_discounts(subtotal, item_totals, discounts, menu_items, category_totals=None):
+    """Apply discounts in order and return (total, discount_details).
+
+    category_totals may be passed in precomputed ({category: total}); otherwise
+    each category total is summed once, the first time a discount needs it.
+    """
+    total = subtotal
+    discount_details = []
+    item_discounted = {}
+    if category_totals is None:
+        category_totals = {}
+
+    for discount in discounts:
+        if discount["apply_to"] == "specific_item":
+            item_code = discount["item_code"]
+            if item_code not in item_totals:
+                continue
+            item_total = item_totals[item_code]
+            already = item_discounted.get(item_code, 0)
+            remaining_value = item_total - already
+
+            if discount["type"] == "percentage":
+                discount_amount = min(item_total * discount["value"] / 100, remaining_value)
+            else:
+                discount_amount = min(discount["value"], remaining_value)
+
+            if discount_amount > 0:
+                total -= discount_amount
+                item_discounted[item_code] = already + discount_amount
+                discount_details.append({
+                    'description': discount['description'],
+                    'amount': discount_amount,
+                    'item_code': item_code
+                })
+            continue
+
+        if discount["apply_to"] in ["food", "beverage"]:
+            category = discount["apply_to"]
+            if category not in category_totals:
+                category_totals[category] = sum(
+                    item_totals[code] for code in item_totals
+                    if menu_items[code]['category'] == category
+                )
+            base = category_totals[category]
+        else:
+            base = subtotal
+
+        if discount["type"] == "percentage":
+            discount_amount = base * discount["value"] / 100
+        else:
+            discount_amount = discount["value"]
+
+        discount_amount = min(discount_amount, total)
+        if discount_amount > 0:
+            total -= discount_amount
+            discount_details.append({
+                'description': discount['description'],
+                'amount': discount_amount
+            })
+
+    return total, discount_details
+
+
+def breakdown(subtotal, total, discount_details, item_totals):
+    taxable = max(total, 0)
+    tax = taxable * TAX_RATE
+    return {
+        'subtotal': subtotal,
+        'total': total,
+        'discount_details': discount_details,
+        'item_totals': item_totals,
+        'discount_total': subtotal - total,
+        'tax': tax,
+        'grand_total': taxable + tax
+    }
+
+
+def compute_order(order, menu_items):
+    """Price one order without the cache."""
+    subtotal, item_totals = line_totals(order["items"], menu_items)
+    total, discount_details = resolve_discounts(
+        subtotal, item_totals, order.get("discounts", []), menu_items
+    )
+    return breakdown(subtotal, total, discount_details, item_totals)
+
+
+# ==============================================
+# MEMOIZATION
+# ==============================================
+
+def fingerprint(order):
+    """Everything in an order that affects its price, as a tuple to compare.
+
+    The tuple itself is kept rather than its hash, so two different orders
+    can never be mistaken for each other.
+    """
+    return (
+        tuple((code, qty) for code, qty in order["items"]),
+        tuple(tuple(d.items()) for d in order.get("discounts", []))
+    )
+
+
+def price_order(order_id, order, menu_items):
+    """Return the (cached) price breakdown of an order. Treat the result as read-only."""
+    key = fingerprint(order)
+    entry = _cache.get(order_id)
+    if entry is not None and entry[0] == key and entry[1] is menu_items:
+        _stats["hits"] += 1
+        return entry[2]
+
+    _stats["misses"] += 1
+    result = compute_order(order, menu_items)
+    _cache[order_id] = (key, menu_items, result)
+    return result
+
+
+def invalidate(order_id=None):
+    """Forget the cached price of one order, or of every order."""
+    if order_id is None:
+        _cache.clear()
+    else:
+        _cache.pop(order_id, None)
+
+
+def stats():
+    return dict(_stats, entries=len(_cache))
@@ -0,0 +1,171 @@
+"""
+receipt_pack.py
+Append-only receipt archive.
+
+Receipts are appended to one pack file per day (receipts/<date>.pack, rolling
+over to <date>-1.pack, <date>-2.pack, ... past MAX_PACK_BYTES) instead of one
+file per order. Each pack has a small index (<date>.idx) with one line per
+receipt, "order_id offset length flag", where the flag is "z" for a
+zlib-compressed receipt and "-" for plain text. Reading a receipt is a
+dictionary lookup plus one seek and read.
+
+The old one-file-per-order layout can be recreated with:
+
+    python -m utils.receipt_pack export [directory]
+"""
+
+import os
+import sys
+import zlib
+from datetime import datetime, timedelta
+
+from utils import file_cache
+from utils.locking import file_lock
+
+PACK_DIR = "receipts"
+MAX_PACK_BYTES = 64 * 1024 * 1024
+COMPRESS = True
+
+
+# ==============================================
+# PACK FILES
+# ==============================================
+
+def _pack_names(date):
+    """Pack base names for a day, oldest first."""
+    names = []
+    try:
+        files = os.listdir(PACK_DIR)
+    except FileNotFoundError:
+        return names
+    for name in files:
+        base, ext = os.path.splitext(name)
+        if ext == ".pack" and (base == date or base.startswith(date + "-")):
+            names.append(base)
+    return sorted(names, key=lambda base: int(base[len(date) + 1:] or 0))
+
+
+def all_dates():
+    try:
+        files = os.listdir(PACK_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted({name[:10] for name in files if name.endswith(".pack")}, reverse=True)
+
+
+def _read_index(base):
+    index = {}
+    try:
+        with open(os.path.join(PACK_DIR, base + ".idx"), "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 4:
+                    order_id, offset, length, flag = parts
+                    index[order_id] = (int(offset), int(length), flag == "z")
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def load_index(base):
+    """Return {order_id: (offset, length, compressed)} for one pack."""
+    path = os.path.join(PACK_DIR, base + ".idx")
+    return file_cache.load(path, lambda: _read_index(base))
+
+
+# ==============================================
+# WRITING AND READING
+# ==============================================
+
+def write_receipt(order_id, text, date=None):
+    """Append a receipt to today's pack and index it. Returns the pack path."""
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    os.makedirs(PACK_DIR, exist_ok=True)
+
+    # One writer per day, so two terminals never interleave offsets in a pack
+    with file_lock(os.path.join(PACK_DIR, date + ".lock")):
+        names = _pack_names(date)
+        base = names[-1] if names else date
+        pack_path = os.path.join(PACK_DIR, base + ".pack")
+        if os.path.exists(pack_path) and os.path.getsize(pack_path) >= MAX_PACK_BYTES:
+            base = f"{date}-{len(names)}"
+            pack_path = os.path.join(PACK_DIR, base + ".pack")
+
+        blob = text.encode("utf-8")
+        if COMPRESS:
+            blob = zlib.compress(blob)
+
+        with open(pack_path, "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # The index line is written last: a receipt is only visible once both are on disk
+        index_path = os.path.join(PACK_DIR, base + ".idx")
+        with open(index_path, "a") as f:
+            f.write(f"{order_id} {offset} {len(blob)} {'z' if COMPRESS else '-'}\n")
+            f.flush()
+            os.fsync(f.fileno())
+    file_cache.invalidate(index_path)
+    return pack_path
+
+
+def _read_blob(base, offset, length, compressed):
+    with open(os.path.join(PACK_DIR, base + ".pack"), "rb") as f:
+        f.seek(offset)
+        blob = f.read(length)
+    return (zlib.decompress(blob) if compressed else blob).decode("utf-8")
+
+
+def read_receipt(order_id, date=None):
+    """Return a receipt's text, or None.
+
+    Pass the day of the order's transaction (receipts are filed under it); the
+    next day is tried too, for receipts written just after midnight before
+    that was the rule. Without a date every day is searched, newest first.
+    """
+    if date:
+        following = (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        days = [date, following]
+    else:
+        days = all_dates()
+    for day in days:
+        for base in reversed(_pack_names(day)):
+            entry = load_index(base).get(order_id)
+            if entry:
+                return _read_blob(base, *entry)
+
+    # Receipts saved before packs were introduced
+    try:
+        with open(os.path.join(PACK_DIR, f"receipt_{order_id}.txt"), "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def iter_receipts():
+    """Yield (order_id, text) for every packed receipt, oldest day first."""
+    for date in reversed(all_dates()):
+        for base in _pack_names(date):
+            for order_id, entry in load_index(base).items():
+                yield order_id, _read_blob(base, *entry)
+
+
+def export(directory=PACK_DIR):
+    """Write every packed receipt out as <directory>/receipt_<order_id>.txt."""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for order_id, text in iter_receipts():
+        with open(os.path.join(directory, f"receipt_{order_id}.txt"), "w") as f:
+            f.write(text)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["export"]:
+        directory = sys.argv[2] if len(sys.argv) > 2 else PACK_DIR
+        print(f"Exported {export(directory)} receipts to {directory}/")
+    else:
+        print("Usage: python -m utils.receipt_pack export [directory]")
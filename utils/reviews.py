@@ -0,0 +1,187 @@
+"""
+reviews.py
+Dish reviews and per-dish rating aggregates.
+
+Reviews are records in the storage engine's "reviews" collection, keyed by a
+review number and linked to a menu item code ("dish"), with the dish name kept
+alongside for display. Lookups by user or by dish go through the collection's
+indexes.
+
+data/review_stats.json holds a count, rating sum and 1-5 histogram per dish.
+It is updated as each review is added or deleted, so "top-rated dishes" and a
+dish's rating never read the reviews themselves. It is built from the reviews
+the first time it is needed (which also links legacy free-text dish names to
+item codes) and can be rebuilt at any time with:
+
+    python -m utils.reviews rebuild
+"""
+
+import heapq
+import json
+import os
+import sys
+from datetime import datetime
+
+from data.menu_index import get_menu_index
+from utils.locking import file_lock
+from utils.storage import get_storage
+
+STATS_FILE = os.path.join("data", "review_stats.json")
+STATS_LOCK = os.path.join("data", "review_stats.lock")
+SEQUENCE = "review_id"
+RATINGS = ("1", "2", "3", "4", "5")
+
+
+# ==============================================
+# DISHES
+# ==============================================
+
+def resolve_dish(text):
+    """Item code for a code or (case-insensitive) dish name, or None."""
+    menu = get_menu_index()
+    text = text.strip()
+    if text.upper() in menu:
+        return text.upper()
+    for code, item in menu.items.items():
+        if item["name"].lower() == text.lower():
+            return code
+    return None
+
+
+def dish_name(code):
+    item = get_menu_index().get(code)
+    return item["name"] if item else code
+
+
+# ==============================================
+# AGGREGATES
+# ==============================================
+
+def empty_stats():
+    return {"count": 0, "sum": 0, "histogram": dict.fromkeys(RATINGS, 0)}
+
+
+def _apply(stats, review, sign):
+    rating = str(review["rating"])
+    dish = stats.setdefault(review["dish"], empty_stats())
+    dish["count"] += sign
+    dish["sum"] += sign * int(rating)
+    dish["histogram"][rating] = dish["histogram"].get(rating, 0) + sign
+    if dish["count"] <= 0:
+        del stats[review["dish"]]
+
+
+def _read_stats():
+    try:
+        with open(STATS_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_stats(stats):
+    tmp_path = STATS_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stats, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, STATS_FILE)
+
+
+def rebuild_stats():
+    """Recompute every dish's aggregate, linking legacy dish names to item codes first."""
+    storage = get_storage()
+    linked = []
+    previous = {}
+    stats = {}
+    # Read under the lock, so a review added meanwhile is counted by its own update
+    with file_lock(STATS_LOCK):
+        for review_id, review in storage.load("reviews").items():
+            if "dish_name" not in review:
+                previous[("reviews", review_id)] = review  # So the dish index drops the old name
+                code = resolve_dish(review["dish"])
+                review = dict(review, dish=code or review["dish"], dish_name=dish_name(code) if code else review["dish"])
+                linked.append(("reviews", review_id, review))
+            _apply(stats, review, 1)
+        if linked:
+            storage.commit(linked, previous=previous)
+        _save_stats(stats)
+    return stats
+
+
+def load_stats():
+    stats = _read_stats()
+    return rebuild_stats() if stats is None else stats
+
+
+def _update_stats(review, sign):
+    if _read_stats() is None:
+        rebuild_stats()  # Already reflects the change
+        return
+    with file_lock(STATS_LOCK):
+        stats = _read_stats()
+        _apply(stats, review, sign)
+        _save_stats(stats)
+
+
+def dish_rating(code):
+    """{"count", "mean", "histogram"} for a dish, or None if it has no reviews."""
+    stats = load_stats().get(code)
+    if not stats:
+        return None
+    return {"count": stats["count"], "mean": stats["sum"] / stats["count"], "histogram": stats["histogram"]}
+
+
+def top_rated(count=5, min_reviews=1):
+    """[(code, mean, review count)] of the best-rated dishes."""
+    stats = load_stats()
+    ranked = (
+        (code, s["sum"] / s["count"], s["count"])
+        for code, s in stats.items() if s["count"] >= min_reviews
+    )
+    return heapq.nlargest(count, ranked, key=lambda r: (r[1], r[2]))
+
+
+# ==============================================
+# REVIEWS
+# ==============================================
+
+def reviews_by_user(user):
+    return get_storage().find("reviews", "user", user)
+
+
+def reviews_for_dish(code):
+    return get_storage().find("reviews", "dish", code)
+
+
+def _last_review_id():
+    return max((int(k) for k, _ in get_storage().iter_records("reviews") if k.isdigit()), default=0)
+
+
+def add_review(user, code, comment, rating):
+    """Store a review of a menu item; returns its id."""
+    load_stats()  # Build the aggregates before the first change so it is counted once
+    review_id = str(get_storage().reserve_sequence(SEQUENCE, seed=_last_review_id))
+    review = {
+        "user": user,
+        "dish": code,
+        "dish_name": dish_name(code),
+        "comment": comment,
+        "rating": int(rating),
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    get_storage().commit([("reviews", review_id, review)])
+    _update_stats(review, 1)
+    return review_id
+
+
+def delete_review(review_id, review):
+    """Delete a review the caller has already loaded."""
+    load_stats()
+    get_storage().commit([("reviews", review_id, None)], previous={("reviews", review_id): review})
+    _update_stats(review, -1)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["rebuild"]:
+        print(f"Rebuilt rating aggregates for {len(rebuild_stats())} dish(es).")
+    else:
+        print("Usage: python -m utils.reviews rebuild")
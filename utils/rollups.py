@@ -0,0 +1,208 @@
+"""
+rollups.py
+Per-day sales rollups maintained at checkout time.
+
+Each business day has a small JSON file in data/rollups/ with the totals the
+daily sales report needs: sales, discounts, payment-method and order-type
+breakdowns, item quantities, hourly buckets and one row per transaction.
+OrderService.checkout adds every transaction to its day, so opening the report
+reads one small file however much history has built up.
+
+Rollups can always be rebuilt from the transactions:
+
+    python -m utils.rollups rebuild
+"""
+
+import heapq
+import json
+import os
+import sys
+from operator import itemgetter
+
+from utils.locking import file_lock
+from utils.storage import get_storage
+
+ROLLUP_DIR = os.path.join("data", "rollups")
+PAYMENT_METHODS = ("cash", "card", "touch 'n go")
+
+# Write-behind: while it is on, checkouts are kept in memory as
+# {date: {order_id: transaction}} and flush() adds them to the saved rollups,
+# so a busy day is not rewritten on every checkout.
+_unsaved = None
+
+
+def empty_rollup(date):
+    return {
+        "date": date,
+        "order_count": 0,
+        "total_sales": 0,
+        "total_discounts": 0,
+        "payment_methods": {method: {"count": 0, "total": 0} for method in PAYMENT_METHODS},
+        "order_types": {},
+        "items": {},
+        "hours": {},
+        "orders": []
+    }
+
+
+def add_transaction(rollup, order_id, transaction):
+    """Fold one transaction into a day's rollup."""
+    total = transaction['total']
+    rollup["order_count"] += 1
+    rollup["total_sales"] += total
+    rollup["total_discounts"] += sum(d.get('amount', 0) for d in transaction.get('discounts', []))
+
+    method = transaction.get('payment_method', '').lower()
+    bucket = rollup["payment_methods"].setdefault(method, {"count": 0, "total": 0})
+    bucket["count"] += 1
+    bucket["total"] += total
+
+    bucket = rollup["order_types"].setdefault(transaction.get('type', ''), {"count": 0, "total": 0})
+    bucket["count"] += 1
+    bucket["total"] += total
+
+    for item_code, qty in transaction.get('items', []):
+        rollup["items"][item_code] = rollup["items"].get(item_code, 0) + qty
+
+    hour = transaction.get('timestamp', '')[11:13]
+    bucket = rollup["hours"].setdefault(hour, {"count": 0, "total": 0})
+    bucket["count"] += 1
+    bucket["total"] += total
+
+    rollup["orders"].append([order_id, transaction.get('payment_method', ''), transaction.get('type', ''), total])
+    return rollup
+
+
+def top_items(rollup, count=5):
+    return heapq.nlargest(count, rollup["items"].items(), key=itemgetter(1))
+
+
+# ==============================================
+# PERSISTENCE
+# ==============================================
+
+def _rollup_path(date):
+    return os.path.join(ROLLUP_DIR, f"{date}.json")
+
+
+def _read_rollup(date):
+    try:
+        with open(_rollup_path(date), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _add_new(rollup, transactions):
+    """Add the (order_id, transaction) pairs the rollup does not count yet."""
+    counted = {row[0] for row in rollup["orders"]}
+    for order_id, transaction in transactions:
+        if order_id not in counted:
+            add_transaction(rollup, order_id, transaction)
+            counted.add(order_id)
+    return rollup
+
+
+def load_rollup(date):
+    """Return the rollup for a YYYY-MM-DD date, or None if nothing was sold."""
+    rollup = _read_rollup(date)
+    if _unsaved and date in _unsaved:
+        rollup = _add_new(rollup or empty_rollup(date), _unsaved[date].items())
+    return rollup
+
+
+def save_rollup(rollup):
+    os.makedirs(ROLLUP_DIR, exist_ok=True)
+    path = _rollup_path(rollup["date"])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(rollup, f)
+    os.replace(tmp_path, path)
+
+
+def _lock_path(date):
+    return os.path.join(ROLLUP_DIR, f"{date}.lock")
+
+
+def record_transaction(order_id, transaction):
+    """Add a completed transaction to its day's rollup (called at checkout)."""
+    date = transaction['timestamp'][:10]
+    if _unsaved is not None:
+        _unsaved.setdefault(date, {}).setdefault(order_id, transaction)
+        return
+    # Other terminals may be checking out on the same day: re-read under the day's lock
+    with file_lock(_lock_path(date)):
+        rollup = _read_rollup(date) or empty_rollup(date)
+        if any(row[0] == order_id for row in rollup["orders"]):
+            return  # Already counted
+        save_rollup(add_transaction(rollup, order_id, transaction))
+
+
+def begin_write_behind():
+    """Keep changed rollups in memory until flush() (see _unsaved)."""
+    global _unsaved
+    if _unsaved is None:
+        _unsaved = {}
+
+
+def end_write_behind():
+    global _unsaved
+    flush()
+    _unsaved = None
+
+
+def flush():
+    """Add the checkouts held since the last flush to their days' rollups.
+
+    Each rollup is re-read under its day's lock, so sales other terminals
+    saved meanwhile are kept.
+    """
+    if _unsaved:
+        for date, transactions in _unsaved.items():
+            with file_lock(_lock_path(date)):
+                save_rollup(_add_new(_read_rollup(date) or empty_rollup(date), transactions.items()))
+        _unsaved.clear()
+
+
+def build_rollups(transactions):
+    """Compute {date: rollup} from (order_id, transaction) pairs or a dict of transactions.
+
+    Each order must appear once: pass current records (storage.load), not the
+    raw lines of iter_records, where an updated transaction appears twice.
+    """
+    rollups = {}
+    pairs = transactions.items() if isinstance(transactions, dict) else transactions
+    for order_id, transaction in pairs:
+        if transaction is None:
+            continue
+        date = transaction.get('timestamp', '')[:10]
+        if not date:
+            continue
+        add_transaction(rollups.setdefault(date, empty_rollup(date)), order_id, transaction)
+    return rollups
+
+
+def rebuild_rollups(transactions):
+    """Recreate every rollup file from scratch."""
+    os.makedirs(ROLLUP_DIR, exist_ok=True)
+    for name in os.listdir(ROLLUP_DIR):
+        if name.endswith(".json"):
+            os.remove(os.path.join(ROLLUP_DIR, name))
+    rollups = build_rollups(transactions)
+    for rollup in rollups.values():
+        save_rollup(rollup)
+    return rollups
+
+
+def ensure_rollups():
+    """Build the rollups once, from the full history, if they have never been created."""
+    if not os.path.isdir(ROLLUP_DIR):
+        rebuild_rollups(get_storage().load("transactions"))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["rebuild"]:
+        rebuilt = rebuild_rollups(get_storage().load("transactions"))
+        print(f"Rebuilt rollups for {len(rebuilt)} day(s).")
+    else:
+        print("Usage: python -m utils.rollups rebuild")
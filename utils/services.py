@@ -0,0 +1,587 @@
+"""
+services.py
+Restaurant operations without the terminal.
+
+Every method takes its inputs as parameters, returns plain data and never
+calls input() or print(); a request that cannot be carried out raises
+ServiceError with a message meant for the user. The terminal menus collect
+answers and call these, and anything else (benchmarks, the simulator, another
+front-end) can call them directly:
+
+    OrderService().apply_promo("D00042", "LUCKY7")
+    OrderService().set_status("D00042", "Ready")
+    OrderService().checkout("D00042", "Card")
+    CartService().add_to_cart("alice", {"id": "M3", "drinks": {"D1": [["D3", 1]]}})
+    ReportService().daily_report("2025-06-01")
+"""
+
+import copy
+from datetime import datetime
+
+from data.menu_index import get_menu_index
+from utils import events, pricing, receipt_pack, rollups, stock, transaction_query
+from utils.carts import flush_carts, load_cart, save_cart
+from utils.helpers import calculate_order_total, generate_receipt_lines, load_file, receipt_record, save_changes
+from utils.order_ids import next_order_id
+from utils.storage import ConflictError, get_storage, version_of
+
+PAYMENT_METHODS = ("Cash", "Card", "Touch 'N Go")
+ORDER_TYPES = ("Dine-In", "Takeaway")
+ORDER_STATUSES = ("Pending", "Preparing", "Ready", "Served")
+MAX_QUANTITY = 10
+MAX_RETRIES = 5  # Attempts at an order change that other terminals keep beating us to
+
+
+class ServiceError(ValueError):
+    """A request the restaurant cannot carry out; str() is the message for the user."""
+
+
+# ==============================================
+# ORDERS (CASHIER)
+# ==============================================
+
+class OrderService:
+    """Discounts, cancellation and checkout of active orders.
+
+    current_orders is the active-orders mapping to work on (the shared cached
+    one by default); changes are saved record by record as they are made.
+
+    Another terminal may change the same order at the same time, so every
+    change is a compare-and-swap on the order's version: it is worked out on a
+    copy, committed only if the stored order is still the one it started
+    from, and otherwise redone on the fresh order (see _update).
+    """
+
+    def __init__(self, current_orders=None, menu_items=None):
+        self.current_orders = load_file('current_active_orders.txt') if current_orders is None else current_orders
+        self.menu_items = get_menu_index().items if menu_items is None else menu_items
+
+    def order(self, order_id):
+        if order_id not in self.current_orders:
+            raise ServiceError("No active order found!")
+        return self.current_orders[order_id]
+
+    def price(self, order_id):
+        """Price breakdown of an active order (see pricing.price_order)."""
+        self.order(order_id)
+        return calculate_order_total(order_id, self.current_orders, self.menu_items)
+
+    def remaining_value(self, order_id, item_code=None):
+        """How much of the order (or of one item) can still be discounted."""
+        order = self.order(order_id)
+        if item_code is None:
+            order_total = self.price(order_id)['total']
+            return order_total - sum(d.get('amount', 0) for d in order.get("discounts", []))
+        item_total = self._item_total(order, item_code)
+        existing = sum(d.get('amount', 0) for d in order.get("discounts", []) if d.get('item_code') == item_code)
+        return max(0, item_total - existing)
+
+    def _item_total(self, order, item_code):
+        return sum(qty * self.menu_items[item_code]['price'] for code, qty in order["items"] if code == item_code)
+
+    def _refresh(self, order_id):
+        """Reload an order another terminal changed; ServiceError if it was closed."""
+        stored = get_storage().get("active_orders", order_id)
+        if stored is None:
+            self.current_orders.pop(order_id, None)
+            pricing.invalidate(order_id)
+            raise ServiceError("No active order found!")
+        self.current_orders[order_id] = copy.deepcopy(stored)
+        pricing.invalidate(order_id)
+
+    def _update(self, order_id, change, extra=lambda result: []):
+        """Apply change(order) to a copy of the order and commit it if nobody got there first.
+
+        change returns (new order or None to close it, result); extra(result)
+        lists further (file, key, value) changes for the same commit.
+        Returns the result of the attempt that was committed.
+        """
+        for attempt in range(MAX_RETRIES):
+            order = self.order(order_id)
+            updated, result = change(copy.deepcopy(order))
+            changes = [("current_active_orders.txt", order_id, updated)] + extra(result)
+            try:
+                save_changes(changes, expected={("active_orders", order_id): version_of(order)})
+            except ConflictError:
+                self._refresh(order_id)
+                continue
+            if updated is None:
+                self.current_orders.pop(order_id, None)
+            else:
+                order.clear()
+                order.update(updated)
+                self.current_orders[order_id] = order
+            pricing.invalidate(order_id)
+            return result
+        raise ServiceError("The order is being changed at another terminal, please try again.")
+
+    def _publish(self, event_type, order_id, owner, **data):
+        """Publish an order event; `owner` is the order whose customer it concerns."""
+        events.publish(event_type, order_id, system_user=owner.get("system_user"), **data)
+
+    def _customer_order(self, order, order_id, status):
+        """The change that sets the status of the customer's own order record, if there is one."""
+        if not order.get("system_user"):
+            return []
+        record = get_storage().get("orders", order_id)
+        if record is None:
+            return []
+        return [("orders.txt", order_id, dict(record, status=status))]
+
+    def _add_discount(self, order_id, make_discount):
+        """Append make_discount()'s entry; it is re-evaluated if the order changes underneath."""
+        def change(order):
+            discount = make_discount()
+            order.setdefault("discounts", []).append(discount)
+            return order, discount
+        discount = self._update(order_id, change)
+        order = self.order(order_id)
+        self._publish("discount_applied", order_id, order, order=order, discount=discount)
+        return discount
+
+    def add_discount(self, order_id, kind, value, item_code=None):
+        """Apply a manual discount: kind is "percentage" or "fixed", on one item or the whole order.
+
+        Returns the discount entry that was added.
+        """
+        return self._add_discount(order_id, lambda: self._manual_discount(order_id, kind, value, item_code))
+
+    def _manual_discount(self, order_id, kind, value, item_code):
+        order = self.order(order_id)
+        if item_code is not None and not any(code == item_code for code, _ in order["items"]):
+            raise ServiceError("Invalid item number!")
+        remaining = self.remaining_value(order_id, item_code)
+        if item_code is None:
+            base = self.price(order_id)['total']
+            target, scope = "entire order", "order"
+        else:
+            base = self._item_total(order, item_code)
+            target, scope = self.menu_items[item_code]['name'], "item"
+
+        if kind == "percentage":
+            if value <= 0 or value > 100:
+                raise ServiceError("Percentage must be between 0-100.")
+            amount = round(min(base * value / 100, remaining), 2)
+            if amount <= 0:
+                raise ServiceError(f"Cannot apply discount - {scope} already fully discounted "
+                                   f"(remaining value: RM{remaining:.2f})")
+            description = f"{value}% off {'on ' if item_code else ''}{target}"
+        elif kind == "fixed":
+            if value <= 0:
+                raise ServiceError("Amount must be positive.")
+            if value > remaining:
+                raise ServiceError(f"Discount cannot exceed remaining {scope} value (RM{remaining:.2f})")
+            amount = value
+            description = f"RM{value:.2f} off {'on ' if item_code else ''}{target}"
+        else:
+            raise ServiceError("Invalid choice.")
+
+        discount = {
+            "type": kind,
+            "value": value,
+            "description": description,
+            "apply_to": "specific_item" if item_code else "total",
+            "amount": amount
+        }
+        if item_code:
+            discount["item_code"] = item_code
+        return discount
+
+    def apply_promo(self, order_id, code):
+        """Apply a promo code from promo_codes.txt; returns the discount entry that was added."""
+        code = code.strip().upper()
+        return self._add_discount(order_id, lambda: self._promo_discount(order_id, code))
+
+    def _promo_discount(self, order_id, code):
+        order = self.order(order_id)
+        promo_codes = load_file('promo_codes.txt')
+        if code not in promo_codes:
+            raise ServiceError("Invalid promo code.")
+        promo = promo_codes[code]
+
+        if any(d.get('promo_code') == code for d in order.get("discounts", [])):
+            raise ServiceError("This promo code has already been applied.")
+        if promo['apply_to'] == 'specific_item':
+            item_code = promo.get('item_code')
+            if not item_code or not any(item[0] == item_code for item in order["items"]):
+                raise ServiceError("No valid item in order for this promo.")
+            existing = sum(d['amount'] for d in order.get("discounts", []) if d.get('item_code') == item_code)
+            remaining_value = self._item_total(order, item_code) - existing
+        elif promo['apply_to'] == 'total':
+            calc = self.price(order_id)
+            remaining_value = calc['total'] - sum(d['amount'] for d in calc['discount_details'])
+        else:
+            raise ServiceError("Invalid promo code application type.")
+
+        if promo['type'] == 'percentage':
+            amount = min(remaining_value * promo['value'] / 100, remaining_value)
+        else:
+            amount = min(promo['value'], remaining_value)
+        if amount <= 0:
+            raise ServiceError("No value left to discount for this promo.")
+
+        discount = {
+            "type": promo['type'],
+            "value": promo['value'],
+            "amount": amount,
+            "description": promo['description'],
+            "apply_to": promo['apply_to'],
+            "promo_code": code
+        }
+        if promo['apply_to'] == 'specific_item':
+            discount['item_code'] = promo['item_code']
+        return discount
+
+    def remove_discount(self, order_id, index):
+        """Remove the order's discount at position `index` (0-based) and return it."""
+        def change(order):
+            discounts = order.get("discounts", [])
+            if not discounts:
+                raise ServiceError("No discounts applied to this order.")
+            if not 0 <= index < len(discounts):
+                raise ServiceError("Invalid selection.")
+            return order, discounts.pop(index)
+        removed = self._update(order_id, change)
+        order = self.order(order_id)
+        self._publish("discount_removed", order_id, order, order=order, discount=removed)
+        return removed
+
+    def set_status(self, order_id, status):
+        """Move an active order to another kitchen status (see ORDER_STATUSES); returns the order.
+
+        The customer's own order record follows, so order tracking shows it too.
+        """
+        if status not in ORDER_STATUSES:
+            raise ServiceError("Invalid status.")
+
+        def change(order):
+            order["status"] = status
+            return order, order
+        order = self._update(order_id, change, lambda order: self._customer_order(order, order_id, status))
+        self._publish("status_changed", order_id, order, order=order, status=status)
+        return order
+
+    def cancel(self, order_id):
+        """Drop an active order without a transaction; returns the order."""
+        order = self._update(order_id, lambda order: (None, order))
+        self._publish("cancelled", order_id, order)
+        return order
+
+    def checkout(self, order_id, payment_method, transactions=None):
+        """Take payment for an active order.
+
+        Records the transaction, closes the order and saves its receipt.
+        Returns {"transaction", "receipt", "receipt_path"}. The transaction
+        is also added to `transactions` when that mapping is given.
+        """
+        if payment_method not in PAYMENT_METHODS:
+            raise ServiceError("Invalid payment method.")
+
+        def close(order):
+            calc = self.price(order_id)
+            transaction = {
+                "type": order["type"],
+                "items": order["items"],
+                "discounts": calc['discount_details'],
+                "subtotal": calc['subtotal'],
+                "total": calc['total'],
+                "payment_method": payment_method,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            return None, (order, calc, transaction)
+
+        def record(closed):
+            # The transaction is committed together with closing the order, so
+            # two terminals can never both take payment for it
+            order, calc, transaction = closed
+            changes = [("transactions.txt", order_id, transaction)]
+            # Orders placed from a customer account also get a receipt in their history
+            if order.get("system_user"):
+                receipt = receipt_record(order, calc, transaction["timestamp"], self.menu_items)
+                changes.append(("receipt.json", order_id, receipt))
+            return changes + self._customer_order(order, order_id, "Completed")
+
+        order, calc, transaction = self._update(order_id, close, record)
+        self._publish("checked_out", order_id, order, total=transaction["total"], payment_method=payment_method)
+        rollups.record_transaction(order_id, transaction)
+        transaction_query.record(order_id, transaction)
+        # Stock lives outside the order commit: a crash right here loses this
+        # decrement, and the count reads high until the next stock take
+        stock.consume_order(order["items"])
+        if transactions is not None:
+            transactions[order_id] = transaction
+
+        receipt_text = "\n".join(generate_receipt_lines(order_id, order, payment_method, self.menu_items))
+        # Filed under the transaction's day, so the receipt is found from the transaction
+        receipt_path = receipt_pack.write_receipt(order_id, receipt_text, transaction["timestamp"][:10])
+        return {"transaction": transaction, "receipt": receipt_text, "receipt_path": receipt_path}
+
+
+# ==============================================
+# CARTS (CUSTOMER)
+# ==============================================
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ServiceError("Numbers only!")
+    try:
+        return int(value)
+    except ValueError:
+        raise ServiceError("Numbers only!")
+
+
+class CartService:
+    """Building cart items from a spec, editing carts and placing orders.
+
+    An item spec says how the customer wants one menu item:
+
+        {
+            "id": "M1",                          # menu code
+            "quantity": 2,                       # single items only (1-10); combos are 1
+            "extras": ["Bacon"],                 # optional burger ingredients to add
+            "burgers": {"B1": [["Bacon"], []]},  # combos: one extras list per customized burger
+            "drinks": {"D1": [["D3", 2]]},       # combos: [drink ID, quantity] substitutions
+            "remarks": "no onions"
+        }
+    """
+
+    def __init__(self, menu=None):
+        self.menu = get_menu_index() if menu is None else menu
+
+    def _with_extras(self, menu_item, extras):
+        """A single item with optional ingredients added to its name and price (and listed in 'extras')."""
+        item = {
+            'id': menu_item['id'],
+            'name': menu_item.get('name', 'Unnamed Item'),
+            'price': menu_item.get('base_price', 0),
+            'quantity': 1,
+            'remarks': '',
+            'type': 'single',
+            'contents': {}
+        }
+        ingredients = menu_item.get('ingredients', {}) if menu_item.get('category') == 'Burgers' else {}
+        for ing in extras:
+            details = ingredients.get(ing)
+            if details is None or details.get('default', True):
+                raise ServiceError(f"{ing} cannot be added to {item['name']}.")
+            item['price'] += details.get('price', 0)
+            item['name'] += f" +{ing}"
+        if extras:
+            item['extras'] = list(extras)
+        return item
+
+    def build_item(self, spec):
+        """Turn an item spec into a cart item, pricing every customization."""
+        code = spec.get("id")
+        if code not in self.menu:
+            raise ServiceError("Invalid item ID!")
+        menu_item = self.menu.items[code]
+
+        if 'contents' not in menu_item:
+            item = self._with_extras(menu_item, spec.get("extras", ()))
+            quantity = _number(spec.get("quantity", 1))
+            if not 1 <= quantity <= MAX_QUANTITY:
+                raise ServiceError(f"Please enter 1-{MAX_QUANTITY}")
+            item['quantity'] = quantity
+            item['remarks'] = spec.get("remarks", "")
+            return item
+
+        item = {
+            'id': code,
+            'name': menu_item.get('name', 'Unnamed Item'),
+            'price': menu_item.get('base_price', 0),
+            'quantity': 1,
+            'remarks': spec.get("remarks", ""),
+            'type': 'combo',
+            'contents': {}
+        }
+        drinks = dict(self.menu.category_items('Drinks'))
+        for comp_id, fixed_qty in menu_item['contents'].items():
+            component = self.menu.items.get(comp_id)
+            if not component:
+                continue
+
+            if component.get('category') == 'Burgers':
+                customized = spec.get("burgers", {}).get(comp_id, [])
+                if len(customized) > fixed_qty:
+                    raise ServiceError(f"Only {fixed_qty} {component['name']} in this combo.")
+                item['contents'][comp_id] = []
+                for extras in customized:
+                    burger = self._with_extras(component, extras)
+                    item['contents'][comp_id].append({'quantity': 1, 'customizations': burger})
+                    item['price'] += burger['price'] - component.get('base_price', 0)
+                if fixed_qty - len(customized) > 0:
+                    item['contents'][comp_id].append({
+                        'quantity': fixed_qty - len(customized),
+                        'customizations': None
+                    })
+
+            elif component.get('category') == 'Drinks' and spec.get("drinks", {}).get(comp_id):
+                remaining_qty = fixed_qty
+                item['contents'][comp_id] = []
+                for drink_id, qty in spec["drinks"][comp_id]:
+                    qty = _number(qty)
+                    if drink_id not in drinks:
+                        raise ServiceError("Invalid choice! Try again.")
+                    if not 1 <= qty <= remaining_qty:
+                        raise ServiceError(f"Must be 1-{remaining_qty}")
+                    price_diff = drinks[drink_id].get('base_price', 0) - component.get('base_price', 0)
+                    item['contents'][comp_id].append({
+                        'quantity': qty,
+                        'customizations': {
+                            'substituted_id': drink_id,
+                            'name': drinks[drink_id].get('name', 'Drink'),
+                            'price_diff': price_diff
+                        }
+                    })
+                    item['price'] += price_diff * qty
+                    remaining_qty -= qty
+                if remaining_qty > 0:
+                    item['contents'][comp_id].append({'quantity': remaining_qty, 'customizations': None})
+
+            else:
+                item['contents'][comp_id] = {'quantity': fixed_qty, 'customizations': None}
+        return item
+
+    def cart(self, user):
+        return load_cart(user)
+
+    def add_to_cart(self, user, spec):
+        """Build the item described by `spec`, add it to the user's cart and return it."""
+        item = self.build_item(spec)
+        cart = load_cart(user)
+        # What is already in the cart counts too; extras and swapped drinks included
+        short = stock.shortages(stock.get_bom().cart_bom(cart + [item]))
+        if short:
+            raise ServiceError(f"Sorry, {item['name']} is out of stock ({', '.join(map(stock.label, short))}).")
+        cart.append(item)
+        save_cart(user, cart)
+        return item
+
+    def _cart_item(self, cart, index):
+        if not cart:
+            raise ServiceError("Cart is empty!")
+        if not 0 <= index < len(cart):
+            raise ServiceError("Invalid item number!")
+        return cart[index]
+
+    def remove_from_cart(self, user, index):
+        """Remove the cart item at position `index` (0-based) and return it."""
+        cart = load_cart(user)
+        self._cart_item(cart, index)
+        removed = cart.pop(index)
+        save_cart(user, cart)
+        return removed
+
+    def set_remarks(self, user, index, remarks):
+        cart = load_cart(user)
+        self._cart_item(cart, index)['remarks'] = remarks
+        save_cart(user, cart)
+
+    def checkout(self, user, order_type, table_number=0, remarks="", display_name=None):
+        """Place the user's cart as an order and empty the cart; returns (order_id, order).
+
+        order_type is "Dine-In" or "Takeaway"; guests (Guest_...) must give a display_name.
+        """
+        cart = load_cart(user)
+        if not cart:
+            raise ServiceError("Cannot checkout - cart is empty!")
+        if order_type not in ORDER_TYPES:
+            raise ServiceError("Invalid choice. Please enter 1 or 2.")
+        if user.startswith("Guest_") and not display_name:
+            raise ServiceError("Name cannot be empty!")
+        try:
+            table_number = int(table_number) if order_type == "Dine-In" else 0
+        except ValueError:
+            raise ServiceError("Invalid table number!")
+
+        order_id = next_order_id()
+        order = {
+            "system_user": user,
+            "display_name": display_name or user,
+            "type": order_type,
+            "table_number": table_number,
+            "items": [[item['id'], item['quantity']] for item in cart],
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "remarks": remarks,
+            "status": "Preparing"
+        }
+        # Stock is taken under its lock before the order exists, so two terminals
+        # cannot both sell the last of something; it is put back if the order fails
+        try:
+            reserved = stock.consume_cart(cart)
+        except stock.OutOfStock as e:
+            raise ServiceError(f"Sorry, your cart can no longer be made ({', '.join(map(stock.label, e.ingredients))} ran out).")
+        try:
+            get_storage().commit([("orders", order_id, order)])
+        except Exception:
+            stock.restore(reserved)
+            raise
+        save_cart(user, [])
+        flush_carts()
+        events.publish("created", order_id, system_user=user, order=order)
+        return order_id, order
+
+
+# ==============================================
+# REPORTS (CASHIER AND MANAGER)
+# ==============================================
+
+def report_data_from_rollup(rollup):
+    """Shape a day's rollup into the figures shown by the sales report."""
+    order_types = rollup['order_types']
+    take_away = [order_types.get(t, {'count': 0, 'total': 0}) for t in ('Take Away', 'Takeaway')]
+
+    return {
+        'total_sales': rollup['total_sales'],
+        'total_discounts': rollup['total_discounts'],
+        'order_count': rollup['order_count'],
+        'payment_types': rollup['payment_methods'],
+        'dine_in': order_types.get('Dine-In', {'count': 0, 'total': 0}),
+        'take_away': {
+            'count': sum(t['count'] for t in take_away),
+            'total': sum(t['total'] for t in take_away)
+        },
+        'hours': rollup['hours'],
+        'top_items': rollups.top_items(rollup)
+    }
+
+
+class ReportService:
+    def daily_report(self, date=None):
+        """Sales figures for one day (today by default), or None if it has no transactions.
+
+        Besides the report_data_from_rollup figures, "orders" lists the day's
+        [order_id, payment_method, type, total] rows.
+        """
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        rollups.ensure_rollups()
+        rollup = rollups.load_rollup(date)
+        if not rollup:
+            return None
+        report = report_data_from_rollup(rollup)
+        report['orders'] = rollup['orders']
+        return report
+
+    def summarize(self, transactions):
+        """Sales-report figures for any {order_id: transaction} mapping."""
+        rollup = rollups.empty_rollup("")
+        for order_id, transaction in transactions.items():
+            rollups.add_transaction(rollup, order_id, transaction)
+        return report_data_from_rollup(rollup)
+
+    def receipt(self, order_id, date=None):
+        """Saved receipt text of an order, or None. The day defaults to its transaction's."""
+        if date is None:
+            transaction = get_storage().get("transactions", order_id)
+            if transaction:
+                date = transaction.get("timestamp", "")[:10] or None
+        return receipt_pack.read_receipt(order_id, date)
+
+    def transactions(self, limit=None, offset=0, **filters):
+        """[(order_id, transaction)] matching transaction_query filters, oldest first."""
+        return transaction_query.query(limit=limit, offset=offset, **filters)
+
+    def finances(self, **filters):
+        """Totals of the transactions matching transaction_query filters."""
+        return transaction_query.summarize(transaction_query.query(**filters), filters.get("item_code"))
@@ -0,0 +1,282 @@
+"""
+stock.py
+Ingredient-level stock, taken off as orders are checked out.
+
+Each menu item is flattened once into what one unit of it uses, its bill of
+materials (BOM): a burger uses one of each default ingredient, a side or a
+drink is its own stock item (kept under its item code, so renaming it in
+menu_items.txt does not lose its stock), and a combo adds up its components. Extras a
+customer added (the cart item's "extras") and combo drink substitutions are
+folded in from the cart item. BOMs are cached per item and extras, so a
+checkout sums a few cached vectors and applies the total to the stock file
+in one locked update.
+
+data/stock.json holds {ingredient: quantity on hand}. Ingredients that are not
+listed are not tracked and never run out, so stock keeping is opt-in:
+
+    python -m utils.stock                      # levels and unavailable items
+    python -m utils.stock set "Beef Patty" 40
+    python -m utils.stock set S1 100
+
+A reverse index (ingredient -> {menu item: quantity one unit needs}) tells
+which items can no longer be made without going through the menu.
+"""
+
+import json
+import os
+import sys
+from types import MappingProxyType
+
+from data.menu_index import get_menu_index
+from utils import file_cache
+from utils.locking import file_lock
+
+STOCK_FILE = os.path.join("data", "stock.json")
+STOCK_LOCK = os.path.join("data", "stock.lock")
+
+
+class OutOfStock(Exception):
+    """A stock update asked for more of some ingredients than is on hand."""
+
+    def __init__(self, ingredients):
+        super().__init__(f"Out of stock: {', '.join(ingredients)}")
+        self.ingredients = ingredients
+
+
+def _add(vector, other, times=1):
+    for ingredient, qty in other.items():
+        vector[ingredient] = vector.get(ingredient, 0) + qty * times
+    return vector
+
+
+def _extras(item):
+    """Extras added to a customized burger (its 'extras' list, see CartService.build_item)."""
+    return item.get('extras', [])
+
+
+# ==============================================
+# BILLS OF MATERIALS
+# ==============================================
+
+class BillOfMaterials:
+    """Cached BOM vectors for one menu, plus the ingredient -> items reverse index."""
+
+    def __init__(self, menu=None):
+        self.menu = menu or get_menu_index()
+        self._cache = {}
+        used_by = {}
+        for code in self.menu.items:
+            for ingredient, qty in self.bom(code).items():
+                used_by.setdefault(ingredient, {})[code] = qty
+        self.used_by = MappingProxyType(used_by)
+
+    def bom(self, code, extras=()):
+        """Ingredients used by one unit of a menu item (with optional extras)."""
+        key = (code, tuple(sorted(extras)))
+        if key not in self._cache:
+            self._cache[key] = MappingProxyType(self._flatten(code, key[1]))
+        return self._cache[key]
+
+    def _flatten(self, code, extras):
+        item = self.menu.get(code)
+        if item is None:
+            return {}
+        if "contents" in item:
+            vector = {}
+            for comp_id, qty in item["contents"].items():
+                _add(vector, self.bom(comp_id), qty)
+            return vector
+        ingredients = item.get("ingredients", {})
+        if not ingredients:
+            return {code: 1}
+        vector = {ingredient: 1 for ingredient, details in ingredients.items() if details.get("default", True)}
+        for extra in extras:
+            if extra in ingredients:
+                vector[extra] = vector.get(extra, 0) + 1
+        return vector
+
+    def order_bom(self, items):
+        """Total ingredients of an order's [item code, quantity] pairs."""
+        vector = {}
+        for code, qty in items:
+            _add(vector, self.bom(code), qty)
+        return vector
+
+    def cart_bom(self, cart):
+        """Total ingredients of cart items, with their customizations."""
+        vector = {}
+        for item in cart:
+            if item.get('type') != 'combo':
+                _add(vector, self.bom(item['id'], _extras(item)), item.get('quantity', 1))
+                continue
+            for comp_id, entries in item.get('contents', {}).items():
+                for entry in entries if isinstance(entries, list) else [entries]:
+                    custom = entry.get('customizations')
+                    if not custom:
+                        part = self.bom(comp_id)
+                    elif 'substituted_id' in custom:  # Drink swapped for another
+                        part = self.bom(custom['substituted_id'])
+                    else:  # Burger with extras
+                        part = self.bom(comp_id, _extras(custom))
+                    _add(vector, part, entry.get('quantity', 1) * item.get('quantity', 1))
+        return vector
+
+
+_bom = None
+
+
+def get_bom():
+    """The shared BillOfMaterials, rebuilt only when the menu index is."""
+    global _bom
+    menu = get_menu_index()
+    if _bom is None or _bom.menu is not menu:
+        _bom = BillOfMaterials(menu)
+    return _bom
+
+
+# ==============================================
+# STOCK LEVELS
+# ==============================================
+
+def _read_stock():
+    try:
+        with open(STOCK_FILE, "r") as f:
+            return _codes_for_names(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _codes_for_names(stock):
+    """Stock files written before sides and drinks were keyed by code list them by name."""
+    menu = get_bom().menu
+    used = {ingredient for item in menu.items.values() for ingredient in item.get("ingredients", {})}
+    names = {
+        item["name"]: code for code, item in menu.items.items()
+        if not item.get("ingredients") and "contents" not in item and item["name"] not in used
+    }
+    return {names.get(key, key): qty for key, qty in stock.items()}
+
+
+def _save_stock(stock):
+    os.makedirs(os.path.dirname(STOCK_FILE), exist_ok=True)
+    tmp_path = f"{STOCK_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stock, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, STOCK_FILE)
+    file_cache.invalidate(STOCK_FILE)
+
+
+def load_stock():
+    """{ingredient: quantity on hand} for the tracked ingredients."""
+    return file_cache.load(STOCK_FILE, _read_stock)
+
+
+def consume(vector, allow_short=False):
+    """Take a BOM total off the stock in one update; untracked ingredients are skipped.
+
+    Raises OutOfStock, leaving the stock as it was, if the total is more than
+    is on hand, unless allow_short is set (for food that has already been
+    made, which the count then goes below zero for).
+    """
+    if not vector:
+        return
+    with file_lock(STOCK_LOCK):
+        stock = _read_stock()  # Fresh, under the lock: other terminals check out too
+        short = shortages(vector, stock)
+        if short and not allow_short:
+            raise OutOfStock(short)
+        tracked = [ingredient for ingredient in vector if ingredient in stock]
+        if not tracked:
+            return
+        for ingredient in tracked:
+            stock[ingredient] = round(stock[ingredient] - vector[ingredient], 3)
+        _save_stock(stock)
+
+
+def restore(vector):
+    """Put back a total taken by consume() for an order that was not placed after all."""
+    consume({ingredient: -qty for ingredient, qty in vector.items()}, allow_short=True)
+
+
+def consume_order(items):
+    """Take off what a paid order used; it has been served, so this never refuses."""
+    consume(get_bom().order_bom(items), allow_short=True)
+
+
+def consume_cart(cart):
+    """Reserve a cart's ingredients before it is placed; returns the total taken."""
+    vector = get_bom().cart_bom(cart)
+    consume(vector)
+    return vector
+
+
+def set_level(ingredient, quantity):
+    """Set the quantity on hand; None stops tracking the ingredient."""
+    with file_lock(STOCK_LOCK):
+        stock = _read_stock()
+        if quantity is None:
+            stock.pop(ingredient, None)
+        else:
+            stock[ingredient] = int(quantity) if float(quantity).is_integer() else quantity
+        _save_stock(stock)
+
+
+def shortages(vector, stock=None):
+    """Tracked ingredients with less on hand than a BOM total needs."""
+    stock = load_stock() if stock is None else stock
+    return [ingredient for ingredient, qty in vector.items() if ingredient in stock and stock[ingredient] < qty]
+
+
+def unavailable(stock=None, bom=None):
+    """{menu item code: [ingredients short]} for items one more unit of cannot be made."""
+    stock = load_stock() if stock is None else stock
+    bom = bom or get_bom()
+    short = {}
+    for ingredient, on_hand in stock.items():
+        for code, needed in bom.used_by.get(ingredient, {}).items():
+            if on_hand < needed:
+                short.setdefault(code, []).append(ingredient)
+    return short
+
+
+def ingredients():
+    """Every stock key used by the menu, optional extras included, sorted."""
+    bom = get_bom()
+    extras = {ingredient for item in bom.menu.items.values() for ingredient in item.get("ingredients", {})}
+    return sorted(set(bom.used_by) | extras)
+
+
+def resolve(text):
+    """The stock key for an ingredient name, an item code or a side/drink name; None if unknown."""
+    known = ingredients()
+    if text in known:
+        return text
+    menu = get_bom().menu
+    for key in known:
+        item = menu.get(key)
+        if item is not None and item["name"].lower() == text.lower():
+            return key
+    return None
+
+
+def label(key):
+    """A stock key as shown to people: ingredients by name, sides and drinks by code and name."""
+    item = get_bom().menu.get(key)
+    return f"{key} {item['name']}" if item is not None else key
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["set"] and len(sys.argv) == 4:
+        key = resolve(sys.argv[2])
+        if key is None:
+            print(f"No menu item uses {sys.argv[2]}.")
+        else:
+            set_level(key, float(sys.argv[3]))
+            print(f"{label(key)}: {sys.argv[3]}")
+    elif len(sys.argv) == 1:
+        for key, qty in sorted(load_stock().items()):
+            print(f"{label(key):<30} {qty:>8g}")
+        for code, missing in sorted(unavailable().items()):
+            print(f"Unavailable: {code} (short of {', '.join(map(label, missing))})")
+    else:
+        print('Usage: python -m utils.stock [set "<ingredient or item code>" <quantity>]')
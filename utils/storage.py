@@ -0,0 +1,796 @@
+"""
+storage.py
+Pluggable storage engine for orders, active orders, transactions, carts,
+reviews and accounts.
+
+Every collection is a mapping of key -> record. Two backends implement the
+same small interface (load, get, find, iter_records, iter_since,
+transactions_between, transaction_changes, latest_for_user, commit, replace,
+reserve_sequence):
+
+- FlatFileStorage keeps the original files in data/ (the default); carts are
+  kept as one small JSON file per user in data/carts/.
+- SQLiteStorage keeps each collection in its own indexed table in
+  data/restaurant.db.
+
+Pick the backend with the RESTAURANT_STORAGE environment variable
+("flat" or "sqlite"). Copy the flat files into SQLite with:
+
+    python -m utils.storage migrate
+
+Several terminals may share one data/ directory. Flat-file writers hold a
+lock per file (data/<file>.lock, or data/journal.lock for journaled files)
+and whole files are replaced atomically, so readers never need to wait for
+them. Records of VERSIONED_COLLECTIONS carry a "_version" stamp that every
+write bumps; commit(changes, expected) is a compare-and-swap that raises
+ConflictError if another terminal saved one of the records first.
+"""
+
+import ast
+import bisect
+import json
+import os
+import sqlite3
+import sys
+from contextlib import ExitStack
+from urllib.parse import quote, unquote
+
+from utils import file_cache, journal, jsonl, partitions, user_index
+from utils.locking import file_lock, note_conflict
+
+DATA_DIR = "data"
+DB_FILE = "restaurant.db"
+SEQUENCES_FILE = "sequences.json"
+SEQUENCES_LOCK = "sequences.lock"
+
+# Collection name -> flat file in data/
+COLLECTION_FILES = {
+    "active_orders": "current_active_orders.txt",
+    "transactions": "transactions.txt",
+    "orders": "orders.txt",
+    "receipts": "receipt.json",
+    "carts": "carts.txt",
+    "reviews": "reviews.jsonl",
+    "accounts": "users.txt",
+}
+
+# Collections whose records carry a version stamp for compare-and-swap commits
+VERSIONED_COLLECTIONS = ("active_orders",)
+VERSION_FIELD = "_version"
+
+
+class ConflictError(Exception):
+    """A compare-and-swap commit found a record changed (or removed) by someone else."""
+
+    def __init__(self, collection, key):
+        super().__init__(f"{collection} record {key} was changed by another terminal")
+        self.collection = collection
+        self.key = key
+
+
+def version_of(record):
+    return record.get(VERSION_FIELD, 0) if record is not None else None
+
+
+def _tmp_path(path):
+    """Per-process temporary name, so concurrent writers never share one."""
+    return f"{path}.{os.getpid()}.tmp"
+
+
+# Collection name -> record fields stored as indexed SQLite columns
+INDEXED_FIELDS = {
+    "active_orders": [],
+    "transactions": ["timestamp", "payment_method", "type"],
+    "orders": ["system_user", "timestamp"],
+    "receipts": ["system_user", "timestamp"],
+    "carts": [],
+    "reviews": ["user", "dish"],
+    "accounts": ["role"],
+}
+
+
+# ==============================================
+# FLAT FILE BACKEND
+# ==============================================
+
+def _read_json(file):
+    try:
+        with open(os.path.join(DATA_DIR, file), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"Error in {file}: {e}.")
+        return {}
+
+
+def _write_json(file, data):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, file)
+    with open(_tmp_path(path), "w") as f:
+        json.dump(data, f, indent=4)
+    os.replace(_tmp_path(path), path)
+
+
+def _read_lines(file):
+    try:
+        with open(os.path.join(DATA_DIR, file), "r", encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f]
+    except FileNotFoundError:
+        return []
+
+
+def _write_lines(file, lines):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, file)
+    with open(_tmp_path(path), "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+    os.replace(_tmp_path(path), path)
+
+
+def _parse_carts(lines):
+    carts = {}
+    for line in lines:
+        parts = line.strip().split("|||")
+        if not parts[0]:
+            continue
+        cart = []
+        for item_str in parts[1:]:
+            try:
+                item = ast.literal_eval(item_str)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(item, dict):
+                cart.append(item)
+        carts[parts[0]] = cart
+    return carts
+
+
+def _format_carts(carts):
+    return [f"{user}|||{'|||'.join(str(item) for item in cart)}" for user, cart in carts.items() if user]
+
+
+def _parse_reviews(lines):
+    reviews = {}
+    for line in lines:
+        parts = line.strip().split("|||")
+        if len(parts) >= 4:
+            reviews[str(len(reviews) + 1)] = {
+                "user": parts[0],
+                "dish": parts[1],
+                "comment": parts[2],
+                "rating": parts[3]
+            }
+    return reviews
+
+
+def _format_reviews(reviews):
+    return [f"{r['user']}|||{r['dish']}|||{r['comment']}|||{r['rating']}" for r in reviews.values()]
+
+
+def _parse_accounts(lines):
+    accounts = {}
+    for line in lines:
+        line = line.strip()
+        if "|||" in line:
+            # Customer line as the original registration wrote it; saved back as user:pwd:role
+            username, password = line.split("|||", 1)
+            accounts[username] = {"password": password, "role": "customer"}
+            continue
+        parts = line.split(":")
+        if len(parts) == 3:
+            username, password, role = parts
+            accounts[username] = {"password": password, "role": role}
+    return accounts
+
+
+def _format_accounts(accounts):
+    return [f"{username}:{acc['password']}:{acc['role']}" for username, acc in accounts.items()]
+
+
+# Append-only JSON Lines files (see jsonl.py)
+JSONL_COLLECTIONS = ("orders", "receipts", "reviews")
+
+# JSON Lines collections converted from an older line-based file on first use
+LEGACY_LINE_FILES = {
+    "reviews": "review.txt",
+}
+
+# One JSON file per key in a directory: collection -> (directory, legacy file)
+KEYED_DIRECTORIES = {
+    "carts": ("carts", "carts.txt"),
+}
+
+# Line-based files: collection -> (parser, formatter)
+LINE_FORMATS = {
+    "carts": (_parse_carts, _format_carts),
+    "reviews": (_parse_reviews, _format_reviews),
+    "accounts": (_parse_accounts, _format_accounts),
+}
+
+
+def _keyed_dir(collection):
+    """Directory of a per-key collection, split out of its legacy file on first use.
+
+    The split takes its own exclusive lock and looks for the directory again
+    under it, so terminals starting together migrate the file only once.
+    """
+    directory, legacy_file = KEYED_DIRECTORIES[collection]
+    path = os.path.join(DATA_DIR, directory)
+    if not os.path.isdir(path):
+        with file_lock(path + ".migrate.lock"):
+            if not os.path.isdir(path):  # Another terminal may have split it meanwhile
+                parse, _ = LINE_FORMATS[collection]
+                records = parse(_read_lines(legacy_file))
+                tmp_dir = _tmp_path(path)
+                os.makedirs(tmp_dir, exist_ok=True)
+                for key, value in records.items():
+                    _write_keyed(tmp_dir, key, value)
+                os.replace(tmp_dir, path)
+    return path
+
+
+def _keyed_path(directory, key):
+    return os.path.join(directory, quote(key, safe="") + ".json")
+
+
+def _read_keyed(directory, key):
+    try:
+        with open(_keyed_path(directory, key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_keyed(directory, key, value):
+    path = _keyed_path(directory, key)
+    if value is None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    with open(_tmp_path(path), "w", encoding="utf-8") as f:
+        json.dump(value, f, separators=(",", ":"))
+    os.replace(_tmp_path(path), path)
+
+
+class FlatFileStorage:
+    """The data/ files. Order and transaction changes go through the journal;
+    transactions are kept in per-day partitions (see partitions.py)."""
+
+    name = "flat"
+
+    def _path(self, collection):
+        if collection == "transactions":
+            return partitions.manifest_path()
+        path = os.path.join(DATA_DIR, COLLECTION_FILES[collection])
+        if collection in LEGACY_LINE_FILES and not os.path.exists(path):
+            parse, _ = LINE_FORMATS[collection]
+            jsonl.write(path, parse(_read_lines(LEGACY_LINE_FILES[collection])))
+        return path
+
+    def load(self, collection):
+        """Load a collection, reusing the parsed copy while its files are unchanged."""
+        if collection in KEYED_DIRECTORIES:
+            return self._read(collection)
+        file = COLLECTION_FILES[collection]
+        depends_on = (journal.journal_path(),) if file in journal.JOURNALED_FILES else ()
+        return file_cache.load(self._path(collection), lambda: self._read(collection), depends_on)
+
+    def _read(self, collection):
+        file = COLLECTION_FILES[collection]
+        if collection in KEYED_DIRECTORIES:
+            directory = _keyed_dir(collection)
+            records = {}
+            for name in os.listdir(directory):
+                if name.endswith(".json"):
+                    key = unquote(name[:-len(".json")])
+                    records[key] = _read_keyed(directory, key)
+            return records
+        if collection == "transactions":
+            with journal.lock(shared=True):
+                return journal.load(file, partitions.load_all())
+        if file in journal.JOURNALED_FILES:
+            try:
+                return journal.load(file)
+            except FileNotFoundError:
+                return {}
+            except json.JSONDecodeError as e:
+                print(f"Error in {file}: {e}.")
+                return {}
+        if collection in JSONL_COLLECTIONS:
+            return jsonl.load_records(self._path(collection))
+        if collection in LINE_FORMATS:
+            parse, _ = LINE_FORMATS[collection]
+            return parse(_read_lines(file))
+        return _read_json(file)
+
+    def get(self, collection, key):
+        if collection in KEYED_DIRECTORIES:
+            return _read_keyed(_keyed_dir(collection), key)
+        return self.load(collection).get(key)
+
+    def find(self, collection, field, value):
+        if field in user_index.INDEXED_BY.get(collection, ()):
+            return dict(user_index.latest(collection, self._path(collection), field, value))
+        return {
+            key: record for key, record in self.load(collection).items()
+            if record.get(field) == value
+        }
+
+    def iter_records(self, collection):
+        """Stream (key, record) pairs; a None record means the key was deleted.
+
+        JSON Lines collections and transaction partitions are read line by
+        line, so callers can stop early. Later pairs override earlier ones.
+        """
+        if collection == "transactions":
+            ops = journal.pending_ops(COLLECTION_FILES[collection])
+            if any(op["op"] == "replace" for op in ops):
+                journal.compact()
+                ops = []
+            manifest = partitions.load_manifest()
+            for date in partitions.dates_between(partitions=manifest):
+                yield from partitions.iter_partition(date, manifest)
+            for op in ops:
+                yield op["key"], op.get("value")
+        elif collection in JSONL_COLLECTIONS:
+            yield from jsonl.iter_entries(self._path(collection))
+        else:
+            yield from self.load(collection).items()
+
+    def iter_since(self, collection, timestamp):
+        """Stream (key, record) pairs stamped at or after `timestamp`, without loading the rest.
+
+        Transactions start at that day's partition; a None record means the
+        key was deleted. JSON Lines collections yield only the latest version
+        of each live key, in the order the keys were first appended (which is
+        timestamp order), so the first key is found by bisecting that order.
+        """
+        def recent(pairs):
+            return (
+                (key, record) for key, record in pairs
+                if record is None or record.get("timestamp", "") >= timestamp
+            )
+
+        if collection == "transactions":
+            manifest = partitions.load_manifest()
+            ops = journal.pending_ops(COLLECTION_FILES[collection])
+            if any(op["op"] == "replace" for op in ops):
+                journal.compact()
+                manifest, ops = partitions.load_manifest(), []
+            for date in partitions.dates_between(timestamp[:10], partitions=manifest):
+                yield from recent(partitions.iter_partition(date, manifest))
+            yield from recent((op["key"], op.get("value")) for op in ops)
+        elif collection in JSONL_COLLECTIONS:
+            path = self._path(collection)
+            if not jsonl.is_jsonl(path):
+                jsonl.convert(path)
+            offsets = list(jsonl.latest_offsets(path).values())
+
+            def timestamp_at(offset):
+                entry = jsonl.read_at(path, offset)
+                return entry[1].get("timestamp", "") if entry else ""
+
+            start = bisect.bisect_left(offsets, timestamp, key=timestamp_at) if timestamp else 0
+            for offset in offsets[start:]:
+                entry = jsonl.read_at(path, offset)
+                if entry is not None:
+                    yield entry
+        else:
+            yield from recent(self.load(collection).items())
+
+    def transactions_between(self, start=None, end=None):
+        """Transactions dated start..end (YYYY-MM-DD, inclusive), reading only those days."""
+        ops = journal.pending_ops(COLLECTION_FILES["transactions"])
+        if any(op["op"] == "replace" for op in ops):
+            journal.compact()
+            ops = []
+        data = partitions.load_range(start, end)
+        for op in ops:
+            date = partitions.date_of(op["value"]) if op["op"] == "set" else None
+            if date and (start is None or date >= start) and (end is None or date <= end):
+                data[op["key"]] = op["value"]
+            else:
+                data.pop(op["key"], None)
+        return data
+
+    def transaction_changes(self, token=None):
+        """Transactions changed since `token`, for keeping an index current without reloading.
+
+        Returns (new token, [(order_id, transaction or None)]) from the journal,
+        or (new token, None) when the caller has to reload everything: on the
+        first call, and once the journal has been compacted into the partitions.
+        """
+        with journal.lock(shared=True):
+            files = file_cache.signature((partitions.manifest_path(), journal.journal_path()))
+            if token is not None and token[0] == files:
+                return token, []
+            ops = journal.pending_ops(COLLECTION_FILES["transactions"])
+        seen = token[1] if token is not None else 0
+        new_ops = ops[seen:]
+        if (token is None or token[0][0] != files[0] or len(ops) < seen
+                or any(op["op"] == "replace" for op in new_ops)):
+            return (files, len(ops)), None
+        return (files, len(ops)), [(op["key"], op.get("value")) for op in new_ops]
+
+    def latest_for_user(self, collection, username, limit=None, offset=0):
+        """A user's orders or receipts as [(key, record)], newest first, via the per-user index."""
+        owner = user_index.INDEXED_BY[collection][0]
+        return user_index.latest(collection, self._path(collection), owner, username, limit, offset)
+
+    def _lock_path(self, collection):
+        file = COLLECTION_FILES[collection]
+        if file in journal.JOURNALED_FILES:
+            return os.path.join(DATA_DIR, journal.JOURNAL_LOCK)
+        return os.path.join(DATA_DIR, file + ".lock")
+
+    def _locked(self, collections):
+        """Exclusive locks for every non-keyed collection, taken in a fixed order."""
+        stack = ExitStack()
+        for path in sorted({self._lock_path(c) for c in collections if c not in KEYED_DIRECTORIES}):
+            stack.enter_context(file_lock(path))
+        return stack
+
+    def _stamp_versions(self, changes, expected):
+        """Check `expected` versions and bump the version of every versioned record written."""
+        for (collection, key), version in (expected or {}).items():
+            if version_of(self.get(collection, key)) != version:
+                note_conflict(self._lock_path(collection))
+                raise ConflictError(collection, key)
+        for collection, key, value in changes:
+            if collection in VERSIONED_COLLECTIONS and value is not None:
+                value[VERSION_FIELD] = (version_of(self.get(collection, key)) or 0) + 1
+
+    def commit(self, changes, expected=None, previous=None):
+        """Apply (collection, key, value) changes; a value of None deletes the key.
+
+        `expected` maps (collection, key) to the version the caller last read
+        (see version_of); if any of those records has changed since, nothing
+        is written and ConflictError is raised. `previous` maps (collection,
+        key) to a record as the caller loaded it before this change: for a
+        deleted record it saves looking it up again to take it out of the
+        per-user index, and a record whose indexed field changes needs it so
+        its old index entry is removed.
+        """
+        journaled = []
+        journaled_collections = set()
+        by_collection = {}
+        for collection, key, value in changes:
+            file = COLLECTION_FILES[collection]
+            if file in journal.JOURNALED_FILES:
+                journaled.append((file, key, value))
+                journaled_collections.add(collection)
+            else:
+                by_collection.setdefault(collection, []).append((key, value))
+
+        with self._locked([collection for collection, _, _ in changes] + [c for c, _ in expected or {}]):
+            self._stamp_versions(changes, expected)
+            if journaled:
+                # Nobody else can write while we hold the journal lock (under group commit
+                # it stays held until our operations are on disk, see journal.hold), so a
+                # copy that is current now stays current once they are applied to it
+                depends_on = (journal.journal_path(),)
+                cached = {c: file_cache.peek(self._path(c), depends_on) for c in journaled_collections}
+                journal.append(journaled)
+                for collection, data in cached.items():
+                    if data is None:
+                        file_cache.invalidate(self._path(collection))
+                        continue
+                    file = COLLECTION_FILES[collection]
+                    journal.apply_ops(data, journal.to_ops(journaled), file)
+                    file_cache.store(self._path(collection), data, depends_on)
+            for collection, updates in by_collection.items():
+                if collection in JSONL_COLLECTIONS:
+                    path = self._path(collection)
+                    before = {
+                        key: (previous or {}).get((collection, key)) or self._latest(path, key)
+                        for key, value in updates if value is None
+                    }
+                    before.update(
+                        (key, previous[(collection, key)]) for key, value in updates
+                        if value is not None and (collection, key) in (previous or {})
+                    )
+                    offsets = jsonl.append(path, updates)
+                    file_cache.invalidate(path)
+                    user_index.update(collection, updates, offsets, before)
+                    continue
+                if collection in KEYED_DIRECTORIES:
+                    directory = _keyed_dir(collection)
+                    for key, value in updates:
+                        _write_keyed(directory, key, value)
+                    continue
+                data = self._read(collection)  # Fresh from disk: we hold the file's lock
+                for key, value in updates:
+                    if value is None:
+                        data.pop(key, None)
+                    else:
+                        data[key] = value
+                self.replace(collection, data)
+
+    def _latest(self, path, key):
+        """The current record of a JSON Lines key, read from its latest line alone."""
+        offset = jsonl.latest_offsets(path).get(key)
+        entry = jsonl.read_at(path, offset) if offset is not None else None
+        return entry[1] if entry else None
+
+    def replace(self, collection, data):
+        with self._locked([collection]):
+            self._replace(collection, data)
+        file_cache.invalidate(self._path(collection))
+
+    def _replace(self, collection, data):
+        file = COLLECTION_FILES[collection]
+        if file in journal.JOURNALED_FILES:
+            journal.replace(file, data)
+        elif collection in JSONL_COLLECTIONS:
+            jsonl.write(self._path(collection), data)
+            user_index.drop(collection)
+        elif collection in KEYED_DIRECTORIES:
+            directory = _keyed_dir(collection)
+            for key in set(self._read(collection)) - set(data):
+                _write_keyed(directory, key, None)
+            for key, value in data.items():
+                _write_keyed(directory, key, value)
+        elif collection in LINE_FORMATS:
+            _, fmt = LINE_FORMATS[collection]
+            _write_lines(file, fmt(data))
+        else:
+            _write_json(file, data)
+
+    def reserve_sequence(self, name, count=1, seed=None):
+        """Reserve `count` consecutive numbers of a named sequence; returns the first.
+
+        The counter lives in data/sequences.json and is only changed under a
+        file lock, so concurrent processes never receive the same numbers.
+        `seed` is called once, when the sequence does not exist yet, for the
+        last number already in use.
+        """
+        path = os.path.join(DATA_DIR, SEQUENCES_FILE)
+        with file_lock(os.path.join(DATA_DIR, SEQUENCES_LOCK)):
+            try:
+                with open(path, "r") as f:
+                    sequences = json.load(f)
+            except FileNotFoundError:
+                sequences = {}
+            if name not in sequences:
+                sequences[name] = seed() if seed else 0
+            first = sequences[name] + 1
+            sequences[name] += count
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(sequences, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        return first
+
+
+# ==============================================
+# SQLITE BACKEND
+# ==============================================
+
+class SQLiteStorage:
+    """One table per collection with the INDEXED_FIELDS as real, indexed columns."""
+
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DATA_DIR, DB_FILE)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.conn:
+            for collection, fields in INDEXED_FIELDS.items():
+                columns = "".join(f", {field} TEXT" for field in fields)
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {collection} "
+                    f"(key TEXT PRIMARY KEY{columns}, data TEXT NOT NULL)"
+                )
+                for field in fields:
+                    self.conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{collection}_{field} "
+                        f"ON {collection} ({field})"
+                    )
+            for collection in ("orders", "receipts"):
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{collection}_user_time "
+                    f"ON {collection} (system_user, timestamp)"
+                )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def _row_values(self, collection, key, value):
+        fields = INDEXED_FIELDS[collection]
+        row = [key] + [value.get(field) if isinstance(value, dict) else None for field in fields]
+        return row + [json.dumps(value)]
+
+    def load(self, collection):
+        rows = self.conn.execute(f"SELECT key, data FROM {collection}")
+        return {key: json.loads(data) for key, data in rows}
+
+    def get(self, collection, key):
+        row = self.conn.execute(
+            f"SELECT data FROM {collection} WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, collection, field, value):
+        if field not in INDEXED_FIELDS[collection]:
+            return {
+                key: record for key, record in self.load(collection).items()
+                if record.get(field) == value
+            }
+        rows = self.conn.execute(
+            f"SELECT key, data FROM {collection} WHERE {field} = ?", (value,)
+        )
+        return {key: json.loads(data) for key, data in rows}
+
+    def iter_records(self, collection):
+        """Stream (key, record) pairs straight from the table cursor."""
+        for key, data in self.conn.execute(f"SELECT key, data FROM {collection}"):
+            yield key, json.loads(data)
+
+    def iter_since(self, collection, timestamp):
+        """Stream (key, record) pairs stamped at or after `timestamp`, in time order."""
+        if "timestamp" not in INDEXED_FIELDS[collection]:
+            for key, record in self.iter_records(collection):
+                if record.get("timestamp", "") >= timestamp:
+                    yield key, record
+            return
+        rows = self.conn.execute(
+            f"SELECT key, data FROM {collection} WHERE timestamp >= ? ORDER BY timestamp, key",
+            (timestamp,)
+        )
+        for key, data in rows:
+            yield key, json.loads(data)
+
+    def transactions_between(self, start=None, end=None):
+        """Transactions dated start..end (YYYY-MM-DD, inclusive), via the timestamp index."""
+        rows = self.conn.execute(
+            "SELECT key, data FROM transactions WHERE timestamp >= ? AND timestamp < ?",
+            (start or "", (end or "9999-99-99") + "~")
+        )
+        return {key: json.loads(data) for key, data in rows}
+
+    def transaction_changes(self, token=None):
+        """See FlatFileStorage.transaction_changes; any change here means a reload."""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        current = (version, self.conn.total_changes)
+        return current, [] if token == current else None
+
+    def query_transactions(self, start=None, end=None, payment_method=None, order_type=None,
+                           item_code=None, limit=None, offset=0):
+        """transaction_query.query run as SQL on the indexed columns, oldest first."""
+        where = ["timestamp >= ?", "timestamp < ?"]
+        params = [start or "", (end or "9999-99-99") + "~"]
+        for column, value in (("payment_method", payment_method), ("type", order_type)):
+            if value:
+                # Matched without case; the stored spellings come from the (small) index
+                spellings = [
+                    stored for (stored,) in self.conn.execute(f"SELECT DISTINCT {column} FROM transactions")
+                    if (stored or "").lower() == value.lower()
+                ]
+                where.append(f"{column} IN ({', '.join('?' * len(spellings)) or 'NULL'})")
+                params += spellings
+        if item_code:
+            where.append("EXISTS (SELECT 1 FROM json_each(data, '$.items') WHERE json_extract(value, '$[0]') = ?)")
+            params.append(item_code)
+        rows = self.conn.execute(
+            f"SELECT key, data FROM transactions WHERE {' AND '.join(where)} "
+            "ORDER BY timestamp, key LIMIT ? OFFSET ?",
+            params + [-1 if limit is None else limit, offset]
+        )
+        return [(key, json.loads(data)) for key, data in rows]
+
+    def latest_for_user(self, collection, username, limit=None, offset=0):
+        """A user's orders or receipts as [(key, record)], newest first, via (system_user, timestamp)."""
+        rows = self.conn.execute(
+            f"SELECT key, data FROM {collection} WHERE system_user = ? "
+            "ORDER BY timestamp DESC, key DESC LIMIT ? OFFSET ?",
+            (username, -1 if limit is None else limit, offset)
+        )
+        return [(key, json.loads(data)) for key, data in rows]
+
+    def commit(self, changes, expected=None, previous=None):
+        """Apply changes in one transaction; see FlatFileStorage.commit for `expected`.
+
+        `previous` is accepted for the same interface and not needed here.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for (collection, key), version in (expected or {}).items():
+                if version_of(self.get(collection, key)) != version:
+                    note_conflict(self.path)
+                    raise ConflictError(collection, key)
+            for collection, key, value in changes:
+                if collection in VERSIONED_COLLECTIONS and value is not None:
+                    value[VERSION_FIELD] = (version_of(self.get(collection, key)) or 0) + 1
+                self._apply(collection, key, value)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def replace(self, collection, data):
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {collection}")
+            for key, value in data.items():
+                self._apply(collection, key, value)
+
+    def reserve_sequence(self, name, count=1, seed=None):
+        """Reserve `count` consecutive numbers of a named sequence; returns the first.
+
+        BEGIN IMMEDIATE takes the database write lock, so concurrent
+        processes never receive the same numbers.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()
+            last = row[0] if row else (seed() if seed else 0)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sequences (name, value) VALUES (?, ?)", (name, last + count)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return last + 1
+
+    def _apply(self, collection, key, value):
+        if value is None:
+            self.conn.execute(f"DELETE FROM {collection} WHERE key = ?", (key,))
+            return
+        row = self._row_values(collection, key, value)
+        placeholders = ", ".join("?" * len(row))
+        self.conn.execute(f"INSERT OR REPLACE INTO {collection} VALUES ({placeholders})", row)
+
+
+# ==============================================
+# BACKEND SELECTION
+# ==============================================
+
+BACKENDS = {
+    "flat": FlatFileStorage,
+    "sqlite": SQLiteStorage,
+}
+
+_storage = None
+
+
+def get_storage():
+    """Return the process-wide storage backend chosen by RESTAURANT_STORAGE."""
+    global _storage
+    if _storage is None:
+        backend = os.environ.get("RESTAURANT_STORAGE", "flat").lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown storage backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+        _storage = BACKENDS[backend]()
+    return _storage
+
+
+def set_storage(storage):
+    """Replace the process-wide backend (used by tools and migrations)."""
+    global _storage
+    _storage = storage
+
+
+def migrate(source, target):
+    """Copy every collection from one backend into another."""
+    for collection in COLLECTION_FILES:
+        data = source.load(collection)
+        target.replace(collection, data)
+        print(f"{collection}: {len(data)} records copied")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["migrate"]:
+        migrate(FlatFileStorage(), SQLiteStorage())
+    else:
+        print("Usage: python -m utils.storage migrate")
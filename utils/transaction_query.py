@@ -0,0 +1,158 @@
+"""
+transaction_query.py
+Indexed, filtered queries over completed transactions for the manager screens.
+
+TransactionIndex keeps the transactions in timestamp order (so a date range
+is two bisects) plus a set of positions per payment method, order type and
+item code. A query intersects the smallest of those sets with the date range,
+so "every Card transaction containing M1 between two dates" touches only the
+matching rows:
+
+    query(start="2025-01-01", end="2025-12-31", payment_method="Card", item_code="M1")
+
+On flat storage the index is built once and then kept current from the
+journal: each query adds only the transactions committed since the last one
+(by any terminal), and a checkout in this process adds its own straight away
+(see record). It is rebuilt only after the journal is compacted into the
+partitions. On SQLite the filters run as SQL against the indexed columns.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from utils.storage import get_storage
+
+
+class TransactionIndex:
+    def __init__(self, transactions):
+        self.transactions = {}
+        self.timestamps = []
+        self.order_ids = []
+        self.positions = {}  # order ID -> its position in timestamp order
+        self.removed = set()  # Positions of transactions deleted or replaced since the build
+        # Posting sets hold positions in timestamp order, so they intersect and sort as ints
+        self.by_payment_method = {}
+        self.by_type = {}
+        self.by_item = {}
+        ordered = sorted(
+            ((t.get('timestamp', ''), order_id) for order_id, t in transactions.items() if t is not None)
+        )
+        for _, order_id in ordered:
+            self._append(order_id, transactions[order_id])
+
+    def _postings(self, t):
+        yield self.by_payment_method.setdefault(t.get('payment_method', '').lower(), set())
+        yield self.by_type.setdefault(t.get('type', '').lower(), set())
+        for item_code, _ in t.get('items', []):
+            yield self.by_item.setdefault(item_code, set())
+
+    def _append(self, order_id, t):
+        position = len(self.order_ids)
+        self.transactions[order_id] = t
+        self.timestamps.append(t.get('timestamp', ''))
+        self.order_ids.append(order_id)
+        self.positions[order_id] = position
+        for postings in self._postings(t):
+            postings.add(position)
+
+    def add(self, order_id, t):
+        """Add, replace or (t is None) remove one transaction."""
+        if self.transactions.get(order_id) == t:
+            return
+        position = self.positions.pop(order_id, None)
+        if position is not None:
+            for postings in self._postings(self.transactions.pop(order_id)):
+                postings.discard(position)
+            self.removed.add(position)
+        if t is None:
+            return
+        if self.timestamps and t.get('timestamp', '') < self.timestamps[-1]:
+            # Out of timestamp order (a late or edited transaction): re-sort what is held
+            self.__init__(dict(self.transactions, **{order_id: t}))
+        else:
+            self._append(order_id, t)
+
+    def range(self, start=None, end=None):
+        """Positions [lo, hi) of the transactions dated start..end (YYYY-MM-DD, inclusive)."""
+        lo = bisect_left(self.timestamps, start) if start else 0
+        hi = bisect_right(self.timestamps, end + "~") if end else len(self.timestamps)
+        return lo, hi
+
+    def query(self, start=None, end=None, payment_method=None, order_type=None, item_code=None):
+        """Order IDs matching every given filter, oldest first."""
+        lo, hi = self.range(start, end)
+        filters = []
+        if payment_method:
+            filters.append(self.by_payment_method.get(payment_method.lower(), set()))
+        if order_type:
+            filters.append(self.by_type.get(order_type.lower(), set()))
+        if item_code:
+            filters.append(self.by_item.get(item_code, set()))
+        if not filters:
+            if not self.removed:
+                return self.order_ids[lo:hi]
+            return [self.order_ids[p] for p in range(lo, hi) if p not in self.removed]
+
+        filters.sort(key=len)
+        if len(filters[0]) < hi - lo:
+            positions = sorted(p for p in filters[0].intersection(*filters[1:]) if lo <= p < hi)
+        else:
+            positions = [p for p in range(lo, hi) if all(p in f for f in filters)]
+        return [self.order_ids[p] for p in positions]
+
+
+_index = None
+_token = None  # Where the index is up to in the flat-file journal (see transaction_changes)
+
+
+def get_transaction_index():
+    """Return the shared TransactionIndex, brought up to date with the transactions committed since."""
+    global _index, _token
+    storage = get_storage()
+    token, changes = storage.transaction_changes(_token)
+    if _index is None or changes is None:
+        _index = TransactionIndex(storage.load("transactions"))
+    else:
+        for order_id, t in changes:
+            _index.add(order_id, t)
+    _token = token
+    return _index
+
+
+def record(order_id, transaction):
+    """Add a transaction this process just committed to the index, if one is built."""
+    if _index is not None:
+        _index.add(order_id, transaction)
+
+
+def query(start=None, end=None, payment_method=None, order_type=None, item_code=None, limit=None, offset=0):
+    """[(order_id, transaction)] matching the filters, oldest first, paginated."""
+    storage = get_storage()
+    if storage.name == "sqlite":
+        return storage.query_transactions(start, end, payment_method, order_type, item_code, limit, offset)
+    index = get_transaction_index()
+    order_ids = index.query(start, end, payment_method, order_type, item_code)
+    page = order_ids[offset:None if limit is None else offset + limit]
+    return [(order_id, index.transactions[order_id]) for order_id in page]
+
+
+def summarize(results, item_code=None):
+    """Totals for query() results: count, sales, discounts, payment-method and type breakdowns."""
+    summary = {
+        "count": 0,
+        "total_sales": 0,
+        "total_discounts": 0,
+        "payment_methods": {},
+        "order_types": {},
+        "item_quantity": 0
+    }
+    for _, t in results:
+        summary["count"] += 1
+        summary["total_sales"] += t['total']
+        summary["total_discounts"] += sum(d.get('amount', 0) for d in t.get('discounts', []))
+        for key, field in (("payment_methods", 'payment_method'), ("order_types", 'type')):
+            bucket = summary[key].setdefault(t.get(field, ''), {"count": 0, "total": 0})
+            bucket["count"] += 1
+            bucket["total"] += t['total']
+        if item_code:
+            summary["item_quantity"] += sum(qty for code, qty in t.get('items', []) if code == item_code)
+    return summary
@@ -0,0 +1,174 @@
+"""
+user_index.py
+Secondary indexes over the JSON Lines collections (orders and receipts by
+system_user, reviews by user and by dish).
+
+data/indexes/<collection>/<field>/<value>.json lists the records with that
+value as [timestamp, key, offset] entries sorted by timestamp, where offset is
+the byte position of the record's latest line in the collection file. A
+customer's history is read from their own index file plus one seek per
+record, so it costs the same however many other customers the store holds.
+
+FlatFileStorage.commit keeps the indexes up to date as lines are appended. An
+indexed field is treated as fixed once a record is written, unless the commit
+changing it passes the record's previous version. If the collection
+file is rewritten (replace, or python -m utils.jsonl convert), the indexes are
+rebuilt from it on the next query. Builds and updates hold
+data/indexes/<collection>.lock, and a build is written to a scratch directory
+that is renamed into place, so other terminals never see half an index.
+"""
+
+import bisect
+import json
+import os
+import shutil
+from urllib.parse import quote
+
+from utils import jsonl
+from utils.locking import file_lock
+
+INDEX_DIR = os.path.join("data", "indexes")
+USER_FIELD = "system_user"
+
+# collection -> indexed fields; the first one is the collection's owner
+INDEXED_BY = {
+    "orders": (USER_FIELD,),
+    "receipts": (USER_FIELD,),
+    "reviews": ("user", "dish"),
+}
+
+
+def _index_dir(collection, field=None):
+    if field is None:
+        return os.path.join(INDEX_DIR, collection)
+    return os.path.join(INDEX_DIR, collection, field)
+
+
+def _value_path(collection, field, value, directory=None):
+    directory = directory or _index_dir(collection)
+    return os.path.join(directory, field, quote(str(value), safe="") + ".json")
+
+
+def _lock_path(collection):
+    return os.path.join(INDEX_DIR, collection + ".lock")
+
+
+def _read_value(collection, field, value):
+    try:
+        with open(_value_path(collection, field, value), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def _write_value(collection, field, value, entries, directory=None):
+    path = _value_path(collection, field, value, directory)
+    if not entries:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+# ==============================================
+# BUILDING AND MAINTENANCE
+# ==============================================
+
+def drop(collection):
+    shutil.rmtree(_index_dir(collection), ignore_errors=True)
+
+
+def build(collection, path):
+    """Recreate a collection's indexes with one pass over its file."""
+    with file_lock(_lock_path(collection)):
+        if not jsonl.is_jsonl(path):
+            jsonl.convert(path)
+        latest = {}
+        for offset, key, record in jsonl.iter_offsets(path):
+            latest[key] = (offset, record)
+
+        scratch = f"{_index_dir(collection)}.{os.getpid()}.building"
+        shutil.rmtree(scratch, ignore_errors=True)
+        for field in INDEXED_BY[collection]:
+            values = {}
+            for key, (offset, record) in latest.items():
+                if record is not None and record.get(field) is not None:
+                    values.setdefault(record[field], []).append([record.get("timestamp", ""), key, offset])
+            os.makedirs(os.path.join(scratch, field), exist_ok=True)
+            for value, entries in values.items():
+                _write_value(collection, field, value, sorted(entries), scratch)
+        drop(collection)
+        os.rename(scratch, _index_dir(collection))
+
+
+def _is_built(collection):
+    return all(os.path.isdir(_index_dir(collection, field)) for field in INDEXED_BY[collection])
+
+
+def ensure(collection, path):
+    if not _is_built(collection):
+        with file_lock(_lock_path(collection)):
+            if not _is_built(collection):  # Another terminal may have built it meanwhile
+                build(collection, path)
+
+
+def update(collection, changes, offsets, previous):
+    """Index appended lines: `changes` are (key, record) pairs written at `offsets`.
+
+    `previous` maps deleted keys, and updated keys whose indexed fields may
+    have changed, to the record they had, so their old entries can be found
+    and removed.
+    """
+    with file_lock(_lock_path(collection)):
+        if os.path.isdir(_index_dir(collection)):  # Otherwise built from the file on the next query
+            _update(collection, changes, offsets, previous)
+
+
+def _update(collection, changes, offsets, previous):
+    for field in INDEXED_BY[collection]:
+        values = {}
+        for (key, record), offset in zip(changes, offsets):
+            for owner, written in ((previous.get(key), False), (record, True)):
+                if owner is None or owner.get(field) is None:
+                    continue
+                value = owner[field]
+                if value not in values:
+                    values[value] = _read_value(collection, field, value)
+                entries = [entry for entry in values[value] if entry[1] != key]
+                if written:
+                    bisect.insort(entries, [record.get("timestamp", ""), key, offset])
+                values[value] = entries
+        for value, entries in values.items():
+            _write_value(collection, field, value, entries)
+
+
+# ==============================================
+# QUERIES
+# ==============================================
+
+def latest(collection, path, field, value, limit=None, offset=0):
+    """Return [(key, record)] whose `field` equals `value`, newest first, paginated."""
+    ensure(collection, path)
+    for attempt in range(2):
+        entries = _read_value(collection, field, value)[::-1]
+        page = entries[offset:None if limit is None else offset + limit]
+        results = []
+        for _, key, line_offset in page:
+            found = jsonl.read_at(path, line_offset)
+            if found is None or found[0] != key or found[1] is None:
+                break  # The file was rewritten under the index
+            results.append(found)
+        else:
+            return results
+        build(collection, path)
+    return results
+
+
+def count(collection, path, field, value):
+    ensure(collection, path)
+    return len(_read_value(collection, field, value))